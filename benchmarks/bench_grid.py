@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+Times the main ProGrid paths on demo datasets, without a display.
+
+Cases : render of virtualized and plain grids, data setup, customizator
+filters, search popup, single row updates and column resize. Each case
+runs in a fresh interpreter, building its own grid, and reports its best
+time, the widgets of the grid after it and memory :
+
+  peak_kb     peak of memory allocated by the case ( Python 3, tracemalloc )
+  max_rss_kb  peak resident memory of the interpreter, data and grid
+              included ( Unix, any Python )
+
+Usage :
+
+    python -m benchmarks.bench_grid [--sizes 1000,10000,100000] [--repeat 3]
+                                    [--output results.json]
+                                    [--compare baseline.json] [--threshold 0.2]
+
+Save a baseline with --output, then run with --compare : the exit status
+is 1 if any case got slower, or used more memory, beyond the threshold.
+"""
+from . import headless
+
+import argparse
+import gc
+import json
+import subprocess
+import sys
+
+from functools import partial
+from random import Random
+from timeit import default_timer
+
+try :
+    import tracemalloc
+except ImportError :
+    tracemalloc = None
+
+try :
+    import resource
+except ImportError :
+    resource = None
+
+from progrid.filters import compile_filter
+from progrid.progrid import ProGrid
+
+from .datasets import demo_rows
+from .results import load_results, print_comparison, save_results
+
+HEADERS = { 'name':'Name', 'surname':'Surname', 'birth':'Birth', 'sample':'Sample' }
+COLUMNS = [ 'surname', 'name', 'birth', 'sample' ]
+
+"""
+Filters as typed in the customizator.
+"""
+FILTERS = { 'surname':'ross', 'birth':'$VAL.endswith("1980")' }
+
+def build_grid( rows ) :
+    grid = ProGrid(
+        size        = ( 800, 600 ),
+        headers     = HEADERS,
+        columns     = COLUMNS,
+        data        = rows,
+        row_sorting = [ ['surname','asc'] ],
+        virtualized = True,
+    )
+    headless.settle()
+    return grid
+
+
+"""
+Cases get the grid and its rows, and return the function to time
+and the one restoring the grid ( or None ), which is not timed.
+"""
+
+def render( grid, rows ) :
+    def run() :
+        grid._pipeline.invalidate( 'source' )
+        grid._render()
+    return run, None
+
+"""
+Render of a grid building every row, not virtualized.
+Such grids refuse more rows than data_len_limit, so bigger sizes are skipped.
+"""
+def render_plain( grid, rows ) :
+    grid.virtualized = False
+    headless.settle()
+    def run() :
+        grid._pipeline.invalidate( 'source' )
+        grid._render()
+    return run, lambda : setattr( grid, 'virtualized', True )
+
+render_plain.max_rows = 1000
+
+"""
+Data setup replaces the store the grid shows, the grid is rendered again
+with it so following cases find the grid as it would be.
+"""
+def setup_data( grid, rows ) :
+    return grid._setup_data, partial( grid._invalidate, 'source' )
+
+def filters( grid, rows ) :
+    def run() :
+        grid.row_filters_names = dict( FILTERS )
+        grid.row_filters = dict( ( column, compile_filter( text ) ) for column, text in FILTERS.items() )
+    return run, lambda : setattr( grid, 'row_filters', {} )
+
+def search( grid, rows ) :
+    from progrid.search import ProGridSearchPopup
+    popup = ProGridSearchPopup( grid=grid, cols_to_filter=[ 'name', 'surname' ] )
+    popup.input_field.text = 'ross'
+    return popup.do_search, lambda : setattr( grid, 'row_filters', {} )
+
+def update_single_row( grid, rows ) :
+    rnd = Random( 1 )
+    changes = [ ( i, dict( rows[i], name=rnd.choice( ( 'Anna', 'Zeno' ) ) ) ) for i in rnd.sample( range( len( rows ) ), 100 ) ]
+    def run() :
+        for rowid, row in changes :
+            grid.update_single_row( rowid, row )
+    return run, None
+
+def column_resize( grid, rows ) :
+    def run() :
+        for width in range( 100, 300, 20 ) :
+            grid.on_column_resize( None, ( width, 0 ), 'name' )
+            headless.settle( 1 )
+    return run, lambda : grid._columns_layout.set_widths( {} )
+
+CASES = [ render, render_plain, setup_data, filters, search, update_single_row, column_resize ]
+
+"""
+Runs in the child interpreter : measures a case and prints its results.
+"""
+CHILD = '''
+from benchmarks import bench_grid
+print( __import__( 'json' ).dumps( bench_grid.run_case( %r, %d, %d ) ) )
+'''
+
+
+def count_widgets( widget ) :
+    return 1 + sum( count_widgets( child ) for child in widget.children )
+
+"""
+Peak resident memory of the process in KB, None where unknown.
+"""
+def max_rss_kb() :
+    if resource is None :
+        return None
+    rss = resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+"""
+Returns the measures of a case : best time of repeat runs, peak memory and widgets.
+"""
+def measure( case, grid, rows, repeat ) :
+
+    best = None
+    for i in range( repeat ) :
+        run, undo = case( grid, rows )
+        gc.collect()
+        start = default_timer()
+        run()
+        headless.settle()
+        elapsed = default_timer() - start
+        best = elapsed if best is None else min( best, elapsed )
+        widgets = count_widgets( grid )
+        if undo : undo()
+        headless.settle()
+
+    peak = None
+    if tracemalloc is not None :
+        run, undo = case( grid, rows )
+        gc.collect()
+        tracemalloc.start()
+        run()
+        headless.settle()
+        peak = tracemalloc.get_traced_memory()[1] // 1024
+        tracemalloc.stop()
+        if undo : undo()
+        headless.settle()
+
+    return { 'seconds':best, 'peak_kb':peak, 'max_rss_kb':max_rss_kb(), 'widgets':widgets }
+
+"""
+Builds a grid of n rows and measures the case with the given name.
+"""
+def run_case( name, n, repeat ) :
+    case = dict( ( case.__name__, case ) for case in CASES )[name]
+    rows = demo_rows( n )
+    return measure( case, build_grid( rows ), rows, repeat )
+
+def main( argv=None ) :
+
+    parser = argparse.ArgumentParser( description='ProGrid benchmarks' )
+    parser.add_argument( '--sizes',     default='1000,10000,100000', help='comma separated row counts' )
+    parser.add_argument( '--repeat',    default=3, type=int, help='runs per case, the best one is kept' )
+    parser.add_argument( '--cases',     default='', help='comma separated cases, all if empty' )
+    parser.add_argument( '--output',    help='file results are saved to' )
+    parser.add_argument( '--compare',   help='baseline results file' )
+    parser.add_argument( '--threshold', default=0.2, type=float, help='growth flagged as regression, 0.2 is 20%%' )
+    args = parser.parse_args( argv )
+
+    names = [ name for name in args.cases.split( ',' ) if name ]
+    cases = [ case for case in CASES if not names or case.__name__ in names ]
+
+    results = {}
+    for n in [ int( size ) for size in args.sizes.split( ',' ) ] :
+        for case in cases :
+            if n > getattr( case, 'max_rows', n ) :
+                continue
+            name = '%s/%d' % ( case.__name__, n )
+            output = subprocess.check_output( [ sys.executable, '-c', CHILD % ( case.__name__, n, args.repeat ) ] )
+            results[name] = r = json.loads( output.decode( 'utf-8' ).strip().splitlines()[-1] )
+            print( '%-28s %9.4fs %10s KB peak %10s KB rss %6d widgets' % (
+                name, r['seconds'], _kb( r['peak_kb'] ), _kb( r['max_rss_kb'] ), r['widgets']
+            ) )
+
+    if args.output :
+        save_results( args.output, results )
+    if args.compare :
+        if print_comparison( results, load_results( args.compare ), args.threshold ) :
+            return 1
+    return 0
+
+def _kb( value ) :
+    return value if value is not None else '-'
+
+if __name__ == '__main__' :
+    sys.exit( main() )
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Times importing progrid, each time in a fresh interpreter.
+
+Kivy itself is timed too, so the cost of progrid is the difference.
+Modules loaded by each import are counted, and the ones progrid should
+only load when used ( popups, kv files, pkg_resources, data sources,
+aggregates, view states, process pools ) are reported.
+
+Usage :
+
+    python -m benchmarks.bench_import [--repeat 5] [--output results.json]
+                                      [--compare baseline.json] [--threshold 0.2]
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+from .results import load_results, print_comparison, save_results
+
+"""
+Statements timed, by case name.
+"""
+CASES = [
+    ( 'kivy',          'import kivy.uix.boxlayout' ),
+    ( 'progrid',       'import progrid.progrid' ),
+    ( 'progrid_popup', 'import progrid.search' ),
+]
+
+"""
+Modules that importing progrid.progrid should not load.
+"""
+DEFERRED = [
+    'pdb',
+    'pkg_resources',
+    'kivy.adapters.dictadapter',
+    'kivy.uix.listview',
+    'material_ui.flatui.popups',
+    'numpy',
+    'sqlite3',
+    'progrid.aggregates',
+    'progrid.customizator',
+    'progrid.parallel',
+    'progrid.search',
+    'progrid.sources',
+    'progrid.viewstate',
+]
+
+"""
+Runs in the child interpreter : imports and prints seconds, modules and deferred modules loaded.
+"""
+CHILD = '''
+import sys
+from benchmarks import headless
+from timeit import default_timer
+before = set( sys.modules )
+start = default_timer()
+%s
+elapsed = default_timer() - start
+loaded = set( sys.modules ) - before
+print( __import__( 'json' ).dumps( [ elapsed, len( loaded ), sorted( m for m in %r if m in loaded ) ] ) )
+'''
+
+def measure( statement, repeat ) :
+    best, modules, deferred = None, 0, []
+    for i in range( repeat ) :
+        output = subprocess.check_output( [ sys.executable, '-c', CHILD % ( statement, DEFERRED ) ] )
+        elapsed, modules, deferred = json.loads( output.decode( 'utf-8' ).strip().splitlines()[-1] )
+        best = elapsed if best is None else min( best, elapsed )
+    return { 'seconds':best, 'modules':modules, 'deferred_loaded':deferred }
+
+def main( argv=None ) :
+
+    parser = argparse.ArgumentParser( description='progrid import time' )
+    parser.add_argument( '--repeat',    default=5, type=int, help='runs per case, the best one is kept' )
+    parser.add_argument( '--output',    help='file results are saved to' )
+    parser.add_argument( '--compare',   help='baseline results file' )
+    parser.add_argument( '--threshold', default=0.2, type=float, help='growth flagged as regression, 0.2 is 20%%' )
+    args = parser.parse_args( argv )
+
+    results = {}
+    for name, statement in CASES :
+        results['import/%s' % name] = r = measure( statement, args.repeat )
+        print( '%-24s %8.4fs %5d modules   deferred loaded: %s' % ( 'import/%s' % name, r['seconds'], r['modules'], ', '.join( r['deferred_loaded'] ) or '-' ) )
+
+    if args.output :
+        save_results( args.output, results )
+    if args.compare :
+        if print_comparison( results, load_results( args.compare ), args.threshold ) :
+            return 1
+    return 0
+
+if __name__ == '__main__' :
+    sys.exit( main() )
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Compares the precomputed multi-key sort with lambda based sorting.
+
+Two lambda sorts are timed, each against precomputed keys giving the same order :
+
+  baseline  the sort of the original grid, raw values of the first rule only
+  strptime  one lambda sort per rule, birth parsed on every key to sort dates as dates
+
+Usage :
+
+    python -m benchmarks.bench_sort [rows]
+"""
+import sys
+
+from datetime import datetime
+from timeit import default_timer
+
+from progrid.columnar import ColumnStore, RowStore
+from progrid.sorting import LazyOrder, sort_indexes
+
+from .datasets import demo_rows
+
+RULES = [ ['surname','asc'], ['name','asc'], ['birth','desc'] ]
+
+"""
+Birth dates are sorted as dates, not as text.
+"""
+def birth_key( row ) :
+    return datetime.strptime( row['birth'], '%d/%m/%Y' )
+
+"""
+Sorting as done by the original grid : a single lambda sort, by the first rule.
+"""
+def baseline_sort( rows, rules ) :
+    field, mode = rules[0]
+    return sorted( rows, key=lambda o: o[field], reverse=( mode != 'asc' ) )
+
+"""
+Lambda sorting in the order of every rule, one stable sort per rule.
+Not done by the original grid, which sorted by the first rule only.
+"""
+def strptime_sort( rows, rules ) :
+    result = list( rows )
+    for field, mode in reversed( rules ) :
+        key = birth_key if field == 'birth' else ( lambda o, field=field: o[field] )
+        result = sorted( result, key=key, reverse=( mode != 'asc' ) )
+    return result
+
+"""
+First rows of a lazy order, as shown by a virtualized grid.
+"""
+def first_page( indexes, keys, n=40 ) :
+    order = LazyOrder( indexes, keys )
+    return [ order[k] for k in range( n ) ]
+
+def timed( function, *args ) :
+    start = default_timer()
+    result = function( *args )
+    return default_timer() - start, result
+
+def main( n ) :
+
+    rows = demo_rows( n )
+    print( 'Rows: %d, rules: %s' % ( n, RULES ) )
+
+    for store_class in ( RowStore, ColumnStore ) :
+        store = store_class( rows ) if store_class is RowStore else ColumnStore.from_rows( rows )
+        store.set_types()
+        indexes = range( len(store) )
+
+        for name, lambda_sort, rules in ( ( 'baseline', baseline_sort, RULES[:1] ), ( 'strptime', strptime_sort, RULES ) ) :
+
+            t_lambda, expected = timed( lambda_sort, rows, rules )
+            t_first,  order    = timed( sort_indexes, store, indexes, rules )
+            t_cached, order    = timed( sort_indexes, store, indexes, rules )
+            t_page,   page     = timed( first_page, indexes, store.sort_keys( rules ) )
+
+            assert [ store.row(i) for i in order ] == expected
+            assert page == order[:len(page)]
+            print( '%-12s %-9s lambda %.3fs   first %.3fs   cached keys %.3fs   ( x%.1f )   lazy first page %.3fs' % ( 
+                store_class.__name__, name, t_lambda, t_first, t_cached, t_lambda / t_cached, t_page
+            ) )
+
+if __name__ == '__main__' :
+    main( int( sys.argv[1] ) if len( sys.argv ) > 1 else 100000 )
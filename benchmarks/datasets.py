@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+__all__ = [ 'demo_rows' ]
+
+from random import Random
+
+"""
+Datasets shaped like the ones built by progrid/demo.py.
+"""
+
+NAMES    = 'Federico', 'Mirco', 'Mario', 'Luigi', 'Martin', 'Laura'
+SURNAMES = 'Curzel', 'Rossi', 'Bianchi', 'Corona', 'Brambilla', 'Vettore'
+
+"""
+Returns n demo rows, always the same ones for a given seed.
+"""
+def demo_rows( n, seed=0 ) :
+    rnd = Random( seed )
+    births = [ '%0.2d/%0.2d/%0.4d'%( rnd.randint(1,31), rnd.randint(1,12), rnd.randint(1940,2000) ) for i in range(0,100) ]
+    return [ { 
+        'name'    : rnd.choice(NAMES), 
+        'surname' : rnd.choice(SURNAMES), 
+        'birth'   : rnd.choice(births), 
+        'sample'  : rnd.choice([True,False]),
+    } for i in range(0,n) ]
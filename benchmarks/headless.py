@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""
+Makes Kivy run without a display, import it before anything from Kivy.
+
+Widgets are built and laid out with the mock GL backend and no window
+is opened, so benchmarks run on servers and CI. Variables already set
+in the environment are kept, like KIVY_GL_BACKEND to measure real
+drawing ( under xvfb-run on Linux ).
+
+The clock does not wait for the next frame ( maxfps is 0 ), so the time
+spent in settle() is the time spent running callbacks, not sleeping.
+"""
+import os
+
+os.environ.setdefault( 'KIVY_GL_BACKEND',     'mock' )
+os.environ.setdefault( 'KIVY_NO_ARGS',        '1' )
+os.environ.setdefault( 'KIVY_NO_CONSOLELOG',  '1' )
+os.environ.setdefault( 'KIVY_NO_CONFIG',      '1' )
+os.environ.setdefault( 'KIVY_NO_FILELOG',     '1' )
+
+from kivy.config import Config
+
+Config.set( 'graphics', 'maxfps', '0' )
+
+"""
+Runs scheduled Kivy callbacks ( layouts, triggers ) until none is left.
+"""
+def settle( rounds=5 ) :
+    from kivy.clock import Clock
+    for i in range( rounds ) :
+        Clock.tick()
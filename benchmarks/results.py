@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+__all__ = [ 'compare', 'load_results', 'print_comparison', 'save_results' ]
+
+import json
+import platform
+import sys
+
+"""
+Benchmark results, saved as JSON and compared with a baseline.
+
+Results are a dictionary from case name to measures, like :
+
+    { 'render/10000' : { 'seconds':0.41, 'peak_kb':5120, 'max_rss_kb':81240, 'widgets':212 } }
+
+Only seconds and memory are compared, other measures are informative.
+"""
+
+"""
+Measures compared with the baseline, bigger is worse.
+"""
+COMPARED = ( 'seconds', 'peak_kb', 'max_rss_kb' )
+
+def save_results( path, results ) :
+    f = open( path, 'w' )
+    f.write( json.dumps( {
+        'python'   : sys.version.split()[0],
+        'platform' : platform.platform(),
+        'results'  : results,
+    }, sort_keys=True, indent=1 ) )
+    f.close()
+
+def load_results( path ) :
+    f = open( path )
+    content = json.loads( f.read() )
+    f.close()
+    return content['results']
+
+"""
+Returns the regressions of results against baseline, as ( case, measure, baseline, value ) tuples.
+A measure regressed if it grew by more than threshold ( 0.2 is 20% ).
+Cases missing in either side are ignored.
+"""
+def compare( results, baseline, threshold=0.2 ) :
+    regressions = []
+    for case in sorted( results.keys() ) :
+        if case not in baseline :
+            continue
+        for measure in COMPARED :
+            old, new = baseline[case].get( measure ), results[case].get( measure )
+            if old is None or new is None :
+                continue
+            if new > old * ( 1 + threshold ) :
+                regressions.append( ( case, measure, old, new ) )
+    return regressions
+
+def print_comparison( results, baseline, threshold=0.2 ) :
+    regressions = compare( results, baseline, threshold )
+    for case, measure, old, new in regressions :
+        print( 'REGRESSION %-28s %-8s %.4g -> %.4g ( +%.0f%% )' % ( case, measure, old, new, ( float( new ) / old - 1 ) * 100 if old else 0 ) )
+    if len( regressions ) == 0 :
+        print( 'No regressions over %.0f%%' % ( threshold * 100 ) )
+    return regressions
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+__all__ = [ 'SUMMARIES', 'summarize' ]
+
+from array import array
+
+try :
+    import numpy
+except ImportError :
+    numpy = None
+
+"""
+Column summaries, shown by the ProGrid footer.
+
+A summary is computed in a single pass over the values of a column.
+Int and float columns stored as typed arrays are summarized by NumPy,
+if installed, without copying them.
+"""
+
+"""
+Available summaries :
+
+  count     values that are not empty
+  sum       sum of numbers
+  mean      mean of numbers
+  min       lowest value
+  max       highest value
+  distinct  different values
+"""
+SUMMARIES = ( 'count', 'sum', 'mean', 'min', 'max', 'distinct' )
+
+
+"""
+Returns a dictionary with the asked summaries of the values at the given indexes.
+Summaries of no values are None, counts are 0.
+
+values
+    Column values, list or typed array ( see columnar.DataStore.typed() ).
+
+indexes
+    Indexes of the values to summarize, like the rows accepted by filters.
+    Each index must appear once.
+
+names
+    Summaries to compute, see SUMMARIES.
+"""
+def summarize( values, indexes, names ) :
+
+    unknown = [ name for name in names if name not in SUMMARIES ]
+    if len( unknown ) > 0 :
+        raise ValueError( 'Unknown summary %s, use one of %s' % ( ', '.join( unknown ), ', '.join( SUMMARIES ) ) )
+
+    if numpy is not None and isinstance( values, array ) and values.typecode in _NUMPY_TYPECODES :
+        return _summarize_numpy( values, indexes, names )
+    return _summarize_python( values, indexes, names )
+
+
+# Garbage used here and there
+
+"""
+Typecodes of the arrays NumPy can read without copying.
+"""
+_NUMPY_TYPECODES = ( 'l', 'd' )
+
+def _summarize_numpy( values, indexes, names ) :
+
+    dtype  = 'i%d' % values.itemsize if values.typecode == 'l' else 'f%d' % values.itemsize
+    column = numpy.frombuffer( values, dtype=dtype )
+    if len( indexes ) != len( values ) :
+        column = column[ numpy.fromiter( indexes, dtype=numpy.intp, count=len( indexes ) ) ]
+
+    n = len( column )
+    result = {}
+    for name in names :
+        if name == 'count' :
+            result[name] = n
+        elif n == 0 :
+            result[name] = None
+        elif name == 'sum' :
+            result[name] = column.sum().item()
+        elif name == 'mean' :
+            result[name] = column.mean().item()
+        elif name == 'min' :
+            result[name] = column.min().item()
+        elif name == 'max' :
+            result[name] = column.max().item()
+        elif name == 'distinct' :
+            result[name] = len( numpy.unique( column ) )
+    return result
+
+def _summarize_python( values, indexes, names ) :
+
+    count, numbers, total = 0, 0, 0
+    low, high = None, None
+    distinct = set() if 'distinct' in names else None
+
+    for i in indexes :
+        v = values[i]
+        if v is None or v == '' :
+            continue
+        count += 1
+        if isinstance( v, ( int, float ) ) and not isinstance( v, bool ) :
+            numbers += 1
+            total += v
+        try :
+            if low is None or v < low : low = v
+            if high is None or v > high : high = v
+        except TypeError :
+            pass
+        if distinct is not None :
+            try :
+                distinct.add( v )
+            except TypeError :
+                distinct.add( repr( v ) )
+
+    result = {
+        'count'    : count,
+        'sum'      : total if numbers > 0 else None,
+        'mean'     : float( total ) / numbers if numbers > 0 else None,
+        'min'      : low,
+        'max'      : high,
+        'distinct' : len( distinct ) if distinct is not None else None,
+    }
+    return dict( ( name, result[name] ) for name in names )
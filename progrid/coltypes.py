@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+__all__ = [
+    'BOOL', 'DATE_FORMATS', 'FLOAT', 'INT', 'TEXT',
+    'ColumnType', 'DateType', 'column_type', 'display_text', 'infer_type',
+]
+
+from datetime import date, datetime
+
+try :
+    text_types = ( str, unicode )
+    text_type  = unicode
+except NameError :
+    text_types = ( str, )
+    text_type  = str
+
+"""
+Column types used by ProGrid.
+
+A column type converts the values of a column to a native Python type,
+so numbers and dates are sorted as such, and formats them for display.
+Types not given by the user are inferred from a sample of the column.
+"""
+
+"""
+Date formats tried, in order, when inferring date columns.
+"""
+DATE_FORMATS = ( '%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y', '%d-%m-%Y', '%d.%m.%Y', '%Y/%m/%d' )
+
+
+"""
+Base column type, values are kept as text.
+"""
+class ColumnType( object ) :
+
+    """
+    Name of the type, like 'int' or 'date'.
+    """
+    name = 'text'
+
+    """
+    Python type of converted values.
+    """
+    kind = text_type
+
+    """
+    Returns the value converted to the native type, None if it can't be converted.
+    Empty cells stay None, so they sort first and don't read 'None'.
+    """
+    def convert( self, value ) :
+        if value is None :
+            return None
+        return value if isinstance( value, text_types ) else text_type( value )
+
+    """
+    Returns the text shown for a converted value.
+    """
+    def format( self, value ) :
+        return text_type( value )
+
+    def __repr__( self ) :
+        return '<ColumnType %s>' % self.name
+
+
+class _BoolType( ColumnType ) :
+
+    name = 'bool'
+    kind = bool
+
+    """
+    Only bools and 'true' or 'false' texts, numbers are not flags.
+    """
+    def convert( self, value ) :
+        if isinstance( value, bool ) :
+            return value
+        if isinstance( value, text_types ) :
+            return _BOOLS.get( value.strip().lower() )
+        return None
+
+class _IntType( ColumnType ) :
+
+    name = 'int'
+    kind = int
+
+    def convert( self, value ) :
+        if isinstance( value, bool ) :
+            return None
+        if isinstance( value, int ) :
+            return value
+        if isinstance( value, float ) :
+            return int( value ) if value.is_integer() else None
+        try :
+            return int( value )
+        except ( TypeError, ValueError ) :
+            return None
+
+class _FloatType( ColumnType ) :
+
+    name = 'float'
+    kind = float
+
+    """
+    Texts like 'nan' or 'inf' are not numbers, for sure not in a grid.
+    """
+    def convert( self, value ) :
+        if isinstance( value, bool ) :
+            return None
+        if isinstance( value, ( int, float ) ) :
+            return float( value )
+        try :
+            number = float( value )
+        except ( TypeError, ValueError ) :
+            return None
+        return number if number - number == 0 else None
+
+"""
+Dates, given as date objects or text in the given format.
+"""
+class DateType( ColumnType ) :
+
+    name = 'date'
+    kind = date
+
+    def __init__( self, format ) :
+        self.date_format = format
+
+    def convert( self, value ) :
+        if isinstance( value, date ) :
+            return value
+        if not isinstance( value, text_types ) :
+            return None
+        try :
+            return datetime.strptime( value.strip(), self.date_format ).date()
+        except ValueError :
+            return None
+
+    def format( self, value ) :
+        return text_type( value.strftime( self.date_format ) )
+
+    def __eq__( self, other ) :
+        return isinstance( other, DateType ) and other.date_format == self.date_format
+
+    def __ne__( self, other ) :
+        return not self == other
+
+    def __hash__( self ) :
+        return hash( self.date_format )
+
+    def __repr__( self ) :
+        return '<ColumnType date %s>' % self.date_format
+
+
+TEXT  = ColumnType()
+BOOL  = _BoolType()
+INT   = _IntType()
+FLOAT = _FloatType()
+
+
+"""
+Returns the column type for what the user put in ProGrid.coltypes :
+
+  - a ColumnType
+  - a Python type : bool, int, float, str, date or datetime
+  - a date format, like '%d/%m/%Y'
+"""
+def column_type( value ) :
+
+    if isinstance( value, ColumnType ) :
+        return value
+    if isinstance( value, text_types ) and '%' in value :
+        return DateType( value )
+    if value in _TYPES :
+        return _TYPES[value]
+    if value in ( date, datetime ) :
+        return DateType( DATE_FORMATS[0] )
+    raise ValueError( 'Unknown column type %r' % ( value, ) )
+
+"""
+Returns the type every value of the sample can be converted to.
+Empty values are ignored, columns with no values at all are text.
+"""
+def infer_type( sample ) :
+
+    values = [ v for v in sample if v is not None and v != '' ]
+    if len( values ) == 0 :
+        return TEXT
+
+    candidates = [ BOOL, INT, FLOAT ] + [ DateType( f ) for f in DATE_FORMATS ]
+    for candidate in candidates :
+        if all( candidate.convert( v ) is not None for v in values ) :
+            return candidate
+    return TEXT
+
+"""
+Returns the text shown for a value.
+Text is shown as it is, so dates and numbers typed by the user keep their format.
+Values that can't be converted are shown as they are too.
+"""
+def display_text( coltype, value ) :
+
+    if value is None :
+        return u''
+    if isinstance( value, text_types ) :
+        return value
+
+    converted = coltype.convert( value )
+    if converted is None :
+        return text_type( value )
+    return coltype.format( converted )
+
+
+# Garbage used here and there
+
+_BOOLS = { 'true':True, 'false':False }
+
+_TYPES = { bool:BOOL, int:INT, float:FLOAT }
+for _t in text_types :
+    _TYPES[_t] = TEXT
@@ -0,0 +1,539 @@
+# -*- coding: utf-8 -*-
+__all__ = [ 'ColumnStore', 'RowStore', 'RowsView', 'filter_indexes' ]
+
+import threading
+
+from array import array
+
+from .coltypes import TEXT, column_type, display_text, infer_type
+from .filters import TextFilter, normalize
+from .ngram import NGramIndex
+from .sorting import combine_ranks, rank_values
+
+"""
+Data stores used by ProGrid.
+
+Rows are addressed by their position in the data feed.
+Filtering and sorting produce lists of those positions ( permutations ),
+so row dictionaries are never copied nor modified.
+"""
+
+"""
+Typecodes of the columns stored as typed arrays.
+Bools are kept in lists, arrays would give them back as ints.
+"""
+TYPECODES = { int:'l', float:'d' }
+
+
+"""
+Base class of data stores.
+"""
+class DataStore( object ) :
+
+    """
+    Incremented whenever a row is replaced or added.
+    """
+    version = 0
+
+    def __init__( self ) :
+
+        #Held while rows change, threads reading the store meanwhile hold it too
+        self.lock = threading.RLock()
+
+        self._ranks = {}
+        self._normalized = {}
+        self._ngrams = {}
+        self._forced = {}
+        self._sample_size = 100
+        self._types = {}
+        self._typed = {}
+        self._display = {}
+
+    """
+    Number of rows.
+    """
+    def __len__( self ) :
+        raise NotImplementedError()
+
+    """
+    Names of the available columns.
+    """
+    def keys( self ) :
+        raise NotImplementedError()
+
+    """
+    Sequence of the values of a column, indexed by row.
+    """
+    def column( self, name ) :
+        raise NotImplementedError()
+
+    """
+    Single row as a dictionary.
+    """
+    def row( self, i ) :
+        raise NotImplementedError()
+
+    """
+    Replaces a single row.
+    """
+    def set_row( self, i, row ) :
+        raise NotImplementedError()
+
+    """
+    Adds a row at the end of the store.
+    """
+    def append( self, row ) :
+        raise NotImplementedError()
+
+    """
+    Removes the rows with the given indexes, following rows shift back.
+    """
+    def delete( self, indexes ) :
+        raise NotImplementedError()
+
+    """
+    Single value.
+    """
+    def value( self, i, name ) :
+        return self.column( name )[i]
+
+    """
+    Up to n values of a column, used to infer its type.
+    Values are picked evenly from the whole store.
+    """
+    def sample( self, name, n ) :
+        step = max( 1, len( self ) // max( 1, n ) )
+        return [ self.value( i, name ) for i in range( 0, len( self ), step )[:n] ]
+
+    """
+    Sets the column types, see coltypes module.
+
+    forced
+        Types of some columns, as accepted by coltypes.column_type().
+
+    sample_size
+        Values looked at when inferring the type of the other columns.
+
+    Caches depending on types are cleared only if types changed.
+    """
+    def set_types( self, forced=None, sample_size=100 ) :
+        forced = dict( ( name, column_type( t ) ) for name, t in ( forced or {} ).items() )
+        if forced == self._forced and sample_size == self._sample_size :
+            return
+        self._forced = forced
+        self._sample_size = sample_size
+        self._types.clear()
+        self._typed.clear()
+        self._display.clear()
+        self._ranks.clear()
+
+    """
+    Type of a column, inferred the first time it's asked for.
+    """
+    def column_type( self, name ) :
+        if name not in self._types :
+            coltype = self._forced.get( name )
+            if coltype is None :
+                coltype = infer_type( self.sample( name, int( self._sample_size ) ) )
+            self._types[name] = coltype
+        return self._types[name]
+
+    """
+    Values of a column converted to its type, None where they can't be.
+    Converted once, then kept up to date row by row.
+    """
+    def typed( self, name ) :
+        if name not in self._typed :
+            coltype, seen = self.column_type( name ), {}
+            values = [ _convert( coltype, seen, v ) for v in self.column( name ) ]
+            self._typed[name] = _pack( values, coltype.kind )
+        return self._typed[name]
+
+    """
+    Single value converted to the type of its column.
+    """
+    def typed_value( self, i, name ) :
+        if name in self._typed :
+            return self._typed[name][i]
+        return self.column_type( name ).convert( self.value( i, name ) )
+
+    """
+    Text shown for a value of a column, see coltypes.display_text().
+    Texts are cached by value, so rendering again does not format values again.
+    """
+    def display( self, name, value ) :
+        cache = self._display.get( name )
+        if cache is None or len( cache ) > _MAX_DISPLAY :
+            cache = self._display[name] = {}
+        try :
+            key = ( type( value ), value )
+            if key not in cache :
+                cache[key] = display_text( self.column_type( name ), value )
+            return cache[key]
+        except TypeError :
+            return display_text( self.column_type( name ), value )
+
+    """
+    Values of a column as used by filters, see filters.normalize().
+    Built the first time the column is filtered, then kept up to date row by row.
+    """
+    def normalized( self, name ) :
+        if name not in self._normalized :
+            self._normalized[name] = [ normalize( v ) for v in self.column( name ) ]
+        return self._normalized[name]
+
+    """
+    N-gram index of the normalized values of a column, see ngram.NGramIndex.
+    Built the first time the column is searched, then kept up to date row by row.
+    """
+    def ngrams( self, name ) :
+        if name not in self._ngrams :
+            self._ngrams[name] = NGramIndex( self.normalized( name ) )
+        return self._ngrams[name]
+
+    """
+    Precomputed sort keys of a column, see sorting.rank_values().
+    Cached until the store changes.
+    """
+    def ranks( self, name ) :
+        if name not in self._ranks :
+            self._ranks[name] = rank_values( self.typed( name ) )
+        return self._ranks[name]
+
+    """
+    Precomputed sort key of every row for the given rules, see sorting.combine_ranks().
+    Cached until the store changes.
+    """
+    def sort_keys( self, rules ) :
+        rules = tuple( ( name, mode ) for name, mode in rules )
+        if rules not in self._ranks :
+            self._ranks[rules] = combine_ranks( self, rules )
+        return self._ranks[rules]
+
+    """
+    Updates caches after row i has been replaced or added.
+    """
+    def _row_changed( self, i, row ) :
+        self.version += 1
+        self._ranks.clear()
+        for name in self._typed.keys() :
+            value = self.column_type( name ).convert( row.get( name ) )
+            self._typed[name] = _put( self._typed[name], i, value )
+        for name in self._normalized.keys() :
+            values = self._normalized[name]
+            value  = normalize( row.get( name ) )
+            old    = values[i] if i < len( values ) else None
+            if name in self._ngrams :
+                self._ngrams[name].update( i, old, value )
+            if old is not None :
+                values[i] = value
+            else :
+                values.append( value )
+
+    """
+    Updates caches after rows have been deleted.
+    N-gram indexes are dropped, they would need every row id to be shifted.
+    """
+    def _rows_deleted( self, deleted ) :
+        self.version += 1
+        self._ranks.clear()
+        self._ngrams.clear()
+        for name in self._normalized.keys() :
+            self._normalized[name] = _drop( self._normalized[name], deleted )
+        for name in self._typed.keys() :
+            self._typed[name] = _drop( self._typed[name], deleted )
+
+
+"""
+Store wrapping a list of dictionaries, like ProGrid.data.
+Columns are extracted lazily, the first time they are filtered or sorted.
+"""
+class RowStore( DataStore ) :
+
+    def __init__( self, rows ) :
+        super( RowStore, self ).__init__()
+        self.rows = rows
+        self._columns = {}
+
+    def __len__( self ) :
+        return len( self.rows )
+
+    def keys( self ) :
+        return list( self.rows[0].keys() ) if len( self.rows ) > 0 else []
+
+    def column( self, name ) :
+        if name not in self._columns :
+            self._columns[name] = [ row.get( name ) for row in self.rows ]
+        return self._columns[name]
+
+    def row( self, i ) :
+        return self.rows[i]
+
+    def value( self, i, name ) :
+        return self.rows[i].get( name )
+
+    def set_row( self, i, row ) :
+        self.rows[i] = row
+        for name in self._columns.keys() :
+            self._columns[name][i] = row.get( name )
+        self._row_changed( i, row )
+
+    def append( self, row ) :
+        self.rows.append( row )
+        for name in self._columns.keys() :
+            self._columns[name].append( row.get( name ) )
+        self._row_changed( len( self.rows ) - 1, row )
+
+    def delete( self, indexes ) :
+        deleted = set( indexes )
+        self.rows[:] = _drop( self.rows, deleted )
+        for name in self._columns.keys() :
+            self._columns[name] = _drop( self._columns[name], deleted )
+        self._rows_deleted( deleted )
+
+
+"""
+Column oriented store, one list or typed array per column.
+
+Int and float columns are packed into arrays, repeated strings are stored once.
+This takes a fraction of the memory of a list of dictionaries.
+
+Example :
+
+    store = ColumnStore.from_rows( rows )
+    grid  = ProGrid( store=store, ... )
+"""
+class ColumnStore( DataStore ) :
+
+    def __init__( self, columns, types=None ) :
+
+        super( ColumnStore, self ).__init__()
+        types = types or {}
+        self._columns = {}
+        self._len = None
+
+        for name in columns.keys() :
+            values = columns[name]
+            if self._len is None :
+                self._len = len( values )
+            elif len( values ) != self._len :
+                raise ValueError( 'Column %s has %d values, expected %d' % ( name, len(values), self._len ) )
+            self._columns[name] = _pack( values, types.get( name ) )
+
+        self._len = self._len or 0
+
+    """
+    Builds a store from a list of dictionaries.
+    Missing values are stored as None.
+    """
+    @classmethod
+    def from_rows( cls, rows, columns=None, types=None ) :
+
+        if columns is None :
+            columns = list( rows[0].keys() ) if len( rows ) > 0 else []
+
+        values = {}
+        for name in columns :
+            seen = {}
+            values[name] = [ _intern( seen, row.get( name ) ) for row in rows ]
+
+        return cls( values, types )
+
+    def __len__( self ) :
+        return self._len
+
+    def keys( self ) :
+        return list( self._columns.keys() )
+
+    """
+    Unknown columns are made of None values, like missing keys in RowStore.
+    """
+    def column( self, name ) :
+        if name not in self._columns :
+            return [ None ] * self._len
+        return self._columns[name]
+
+    def row( self, i ) :
+        return dict( ( name, self._columns[name][i] ) for name in self._columns.keys() )
+
+    def set_row( self, i, row ) :
+        for name in self._columns.keys() :
+            self._set_value( name, i, row.get( name ) )
+        self._row_changed( i, row )
+
+    def append( self, row ) :
+        for name in self._columns.keys() :
+            values = self._columns[name]
+            try :
+                values.append( row.get( name ) )
+            except TypeError :
+                self._columns[name] = values = list( values )
+                values.append( row.get( name ) )
+        self._len += 1
+        self._row_changed( self._len - 1, row )
+
+    def delete( self, indexes ) :
+        deleted = set( indexes )
+        for name in self._columns.keys() :
+            self._columns[name] = _drop( self._columns[name], deleted )
+        self._len -= len( [ i for i in deleted if 0 <= i < self._len ] )
+        self._rows_deleted( deleted )
+
+    """
+    Typed arrays fall back to lists when given a value of another type.
+    """
+    def _set_value( self, name, i, value ) :
+        try :
+            self._columns[name][i] = value
+        except TypeError :
+            self._columns[name] = list( self._columns[name] )
+            self._columns[name][i] = value
+
+
+"""
+Read only sequence of the rows of a store, in the given order.
+"""
+class RowsView( object ) :
+
+    def __init__( self, store, order ) :
+        self.store = store
+        self.order = order
+
+    def __len__( self ) :
+        return len( self.order )
+
+    def __getitem__( self, n ) :
+        return self.store.row( self.order[n] )
+
+    def __iter__( self ) :
+        for i in self.order :
+            yield self.store.row( i )
+
+
+"""
+Returns the indexes of the rows accepted by every filter.
+Filters are applied one column at a time, on the survivors of the previous one.
+Compiled filters ( see filters module ) select from the normalized column at once,
+comparisons getting the typed column too, any other callable is called on every value.
+
+If use_index is true, text filters first narrow rows using the n-gram index of the column.
+If stats is a dictionary, the values tested are added to stats['filter_calls'].
+If parallel is given ( see parallel.ParallelFilter ), compiled filters select through it.
+"""
+def filter_indexes( store, filters, indexes=None, use_index=False, stats=None, parallel=None ) :
+
+    for name in filters.keys() :
+        test = filters[name]
+
+        if use_index and test.__class__ is TextFilter :
+            candidates = store.ngrams( name ).candidates( test.needle )
+            if candidates is not None :
+                if indexes is None :
+                    indexes = sorted( candidates )
+                else :
+                    indexes = [ i for i in indexes if i in candidates ]
+
+        if indexes is None :
+            indexes = list( range( len(store) ) )
+
+        if stats is not None :
+            stats['filter_calls'] = stats.get( 'filter_calls', 0 ) + len( indexes )
+
+        if hasattr( test, 'select' ) :
+            typed = _typed_column( store, name, test )
+            if parallel is not None :
+                indexes = parallel.select( test, store.normalized( name ), indexes, typed )
+            else :
+                indexes = test.select( store.normalized( name ), indexes, typed )
+        else :
+            values  = store.column( name )
+            indexes = [ i for i in indexes if test( values[i] ) ]
+
+    return indexes if indexes is not None else _all_rows( len(store) )
+
+
+# Garbage used here and there
+
+"""
+Column type and typed values given to compiled filters comparing values, None for text columns.
+"""
+def _typed_column( store, name, test ) :
+    if getattr( test, 'kind', 'text' ) == 'text' :
+        return None
+    coltype = store.column_type( name )
+    if coltype.kind is TEXT.kind :
+        return None
+    return coltype, store.typed( name )
+
+"""
+Indexes of every row, without building a list where possible.
+"""
+try :
+    _all_rows = xrange
+except NameError :
+    _all_rows = range
+
+"""
+Packs values into a typed array, if possible.
+"""
+def _pack( values, coltype=None ) :
+
+    if coltype is None :
+        types = set( type(v) for v in values )
+        coltype = types.pop() if len( types ) == 1 else None
+
+    if coltype in TYPECODES.keys() :
+        try :
+            return array( TYPECODES[coltype], values )
+        except ( TypeError, OverflowError ) :
+            pass
+
+    return list( values )
+
+"""
+Sets or appends ( if i is the length ) a value, typed arrays fall back to lists.
+Returns the values, maybe a new list.
+"""
+def _put( values, i, value ) :
+    try :
+        if i < len( values ) :
+            values[i] = value
+        else :
+            values.append( value )
+        return values
+    except TypeError :
+        return _put( list( values ), i, value )
+
+"""
+Converts a value, conversions of equal values are done once.
+"""
+def _convert( coltype, seen, value ) :
+    try :
+        key = ( type( value ), value )
+        if key not in seen :
+            seen[key] = coltype.convert( value )
+        return seen[key]
+    except TypeError :
+        return coltype.convert( value )
+
+"""
+Max number of texts cached by DataStore.display() per column.
+"""
+_MAX_DISPLAY = 10000
+
+"""
+Returns a copy of values without the given indexes, of the same type.
+"""
+def _drop( values, deleted ) :
+    kept = [ v for i, v in enumerate( values ) if i not in deleted ]
+    return array( values.typecode, kept ) if isinstance( values, array ) else kept
+
+"""
+Returns the first seen instance of an equal value, so repeated strings are stored once.
+Keys include the type, otherwise True and 1 would be merged.
+"""
+def _intern( seen, value ) :
+    try :
+        return seen.setdefault( ( type(value), value ), value )
+    except TypeError :
+        return value
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+__all__ = [ 'ProGridCustomizator' ]
+
+from kivy.metrics import dp
+from kivy.properties import *
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.checkbox import CheckBox
+from kivy.uix.gridlayout import GridLayout
+from kivy.uix.label import Label
+from kivy.uix.scrollview import ScrollView
+
+from material_ui.flatui.flatui import FlatButton, FlatTextInput, FloatingAction
+from material_ui.flatui.popups import AlertPopup, FlatPopup
+
+from .filters import FilterError, compile_filter
+from .progrid import load_kv
+
+from pkg_resources import resource_filename
+
+"""
+Put this on your form to allow the user customize the ProGrid.
+
+Currently, three kind of filters are supported :
+
+  1) Simple text filter : 'ar' will match 'aron' and 'mario'.
+
+  2) Expressions starting with Python comparison operators.
+  For example, '> 14' or '== 0'
+
+  3) Expressions containing '$VAL'.
+  For example, '$VAL.startswith( "M" )'.
+
+Expressions are compiled by filters.compile_filter(), no eval is involved.
+"""
+class ProGridCustomizator( FloatingAction ) :
+    
+    """
+    String properties to be translated eventually.
+    """       
+    popup_title = StringProperty( 'Customize your grid' )     
+    hint_filter = StringProperty( 'No filter' )
+    cannot_use_expression_for_field = StringProperty( """
+Cannot use filter for field %s.
+Press on '?' for more information.
+""" )
+    filters_help = StringProperty( """
+Three kind of filters are supported :
+
+  1) Simple text filter, for example, 'ar' will match 'aron' and 'mario'.
+
+  2) Expressions starting comparison operators ( <, <=, >=, >, == and != ).
+  For example, '> 14' or '== 0'.
+
+  3) Expressions containing '$VAL'.
+  For example, '$VAL == "M"'.
+
+Please quote ( '' ) any text in your filters.""" )
+
+    """
+    Grid reference.
+    """
+    grid = ObjectProperty( None )
+
+    """
+    Popup reference.
+    """
+    popup = ObjectProperty( None )
+
+    def __init__( self, **kargs ) :
+        if not 'grid' in kargs.keys() : raise ValueError( 'Grid not set.' )
+        load_kv()
+        super( ProGridCustomizator, self ).__init__( 
+            icon=resource_filename( __name__, 'images/settings-32.png' ), **kargs 
+        )
+        self._help_popup = AlertPopup( text=self.filters_help )
+
+    """
+    Will exit customizer without commit changes.
+    """
+    def exit_customizer( self, *args ) :
+        self.popup.dismiss()
+
+    """
+    Will save changes, reaload the grid and dismiss popup.
+    """
+    def save_and_exit( self, *args ) :
+        self._filter_error_occur = False
+        self.grid.columns = self._get_columns()
+        self.grid.row_filters, self.grid.row_filters_names = self._get_row_filters()
+        if not self._filter_error_occur : self.exit_customizer()
+
+    """
+    Will return the filters to be applied on the grid content.
+    """
+    def _get_row_filters( self ) :
+        
+        filters = {}
+        filters_names = {}
+
+        for column in self._columns.keys() :
+ 
+            chk, lbl, fil = self._columns[ column ]
+            if len( fil.text.strip() ) > 0 :
+
+                expression = fil.text.strip()
+
+                try :
+                    filters[ column ] = compile_filter( expression )
+                    filters_names[ column ] = expression
+                except FilterError as e : 
+                    AlertPopup( text=self.cannot_use_expression_for_field % ( lbl.text.lower() ) ).open()
+                    self._filter_error_occur = True
+                    print( e )
+
+        return filters, filters_names
+            
+
+    """
+    Will return the ordered list of columns to be shown.
+    """
+    def _get_columns( self ) :
+
+        columns = []
+        for column in self._columns.keys() :            
+            chk, lbl, fil = self._columns[ column ]
+            if chk.active :
+                columns.append( column )
+        return sorted( columns, key=lambda o: self.grid.col_order.index(o) )
+
+    """
+    Show customization panel.
+    """
+    def customize( self ) :
+        self.popup = FlatPopup( 
+            size_hint=(.95,.7), \
+            title=self.popup_title, \
+            title_size=dp(20), \
+            title_color=[0,0,0,.8], \
+            content=self._build_content()
+        )
+        self.popup.open()
+
+    """
+    Will build popup content footer.
+    """
+    def _build_footer( self ) :
+
+        footer = BoxLayout( orientation='horizontal', spacing=dp(10), size_hint=(1,None), height=dp(35) )        
+        args = { 'size_hint':(.2,1), 'color':[0,.59,.53,1], 'color_down':[0,0,0,.7] }
+        
+        txt = '[ref=main][b]       ?       [/b][/ref]'
+        lbl = Label( text=txt, markup=True, color=[0,0,0,.8], font_size=dp(18) )
+        lbl.bind( on_ref_press=self._help_popup.open )
+
+        cancel_button = FlatButton( markup=True, text='Cancel', **args )
+        cancel_button.bind( on_press=self.exit_customizer )
+
+        ok_button = FlatButton( markup=True, text='[b]OK[/b]', **args )
+        ok_button.bind( on_press=self.save_and_exit )
+
+        footer.add_widget( lbl )
+        footer.add_widget( cancel_button )
+        footer.add_widget( ok_button )
+        return footer
+
+    """
+    Will build a single popup content row.
+    """
+    def _build_content_row( self, column ) :
+
+        row = BoxLayout( orientation='horizontal', size_hint=(1,None), height=dp(30) )
+        chk = CheckBox( active=( column in self.grid.columns ) )
+
+        fil = FlatTextInput( 
+            text=self.grid.row_filters_names[column] if column in self.grid.row_filters_names.keys() else '',\
+            hint_text=self.hint_filter, multiline=False, valign='middle' 
+        )
+        lbl = Label( 
+            text=self.grid.headers[column],\
+            color=[0,0,0,.8], halign='left', valign='middle' 
+        )
+        lbl.bind( size=lbl.setter('text_size') )
+   
+        row.add_widget( chk )
+        row.add_widget( lbl )
+        row.add_widget( fil )
+        return row, chk, lbl, fil 
+
+    """
+    Will build popup content.
+    """
+    def _build_content( self ) :
+
+        s = ScrollView()
+        x = BoxLayout( orientation='vertical' )#, padding=[dp(5),dp(5),dp(5),dp(10)] )
+        content = GridLayout( cols=1, size_hint=(1,None) )
+        content.height = 0
+
+        self._columns = {}
+        
+        for column in sorted( self.grid.headers.keys() ) :
+            
+            row, chk, lbl, fil = self._build_content_row( column ) 
+            content.add_widget( row )
+            content.height += row.height
+            self._columns[ column ] = chk, lbl, fil
+        
+        s.add_widget( content )
+        x.add_widget( s )
+        x.add_widget( self._build_footer() )
+
+        return x
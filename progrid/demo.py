@@ -1,3 +1,8 @@
+"""
+ProGrid demo, run it from the folder holding the progrid package :
+
+    python -m progrid.demo
+"""
 import sys
 
 from kivy.app import App
@@ -9,7 +14,7 @@ from kivy.uix.floatlayout import FloatLayout
 
 from random import choice, randint 
 
-from progrid import ProGrid, ProGridCustomizator
+from .progrid import ProGrid, ProGridCustomizator
 
 SIZE = [ Config.getint('graphics', 'width'), Config.getint('graphics', 'height') ]
 
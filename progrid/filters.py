@@ -0,0 +1,653 @@
+# -*- coding: utf-8 -*-
+__all__ = [ 'FilterError', 'TextFilter', 'ExpressionFilter', 'compile_filter', 'normalize' ]
+
+import ast
+import operator
+import re
+
+try :
+    text_types = ( str, unicode )
+    text_type  = unicode
+except NameError :
+    text_types = ( str, )
+    text_type  = str
+
+"""
+Filters used by ProGrid, ProGridCustomizator and ProGridSearchPopup.
+
+Filter expressions are parsed once into a tree of predicates.
+No eval is involved : only comparisons, boolean operators, arithmetic,
+a few string methods and builtins are allowed.
+
+Filters work on normalized values ( see normalize() ) and can be applied
+to a whole column at once through select(), or called on a single value
+like the old lambda filters. Given the typed values of the column too,
+'$VAL op constant' comparisons compare values converted to the column
+type ( see coltypes module ), so dates compare as dates.
+
+Three kind of expressions are supported :
+
+  1) Simple text filter : 'ar' will match 'aron' and 'mario'.
+
+  2) Expressions starting with Python comparison operators.
+  For example, '> 14' or '== 0'
+
+  3) Expressions containing '$VAL'.
+  For example, '$VAL.startswith( "M" )'.
+
+Most filters can be translated to SQL conditions too, see to_sql().
+"""
+
+"""
+Operators an expression can start with.
+"""
+COMPARATORS = '< <= >= > == != and or'.split(' ')
+
+"""
+Matches expressions starting with one of COMPARATORS.
+Words must be followed by a space, so 'orange' is a text filter.
+"""
+COMPARISON_START = re.compile( '|'.join(
+    re.escape( c ) + ( r'\s' if c.isalpha() else '' ) for c in sorted( COMPARATORS, key=len, reverse=True )
+) )
+
+"""
+Name $VAL is replaced with before parsing.
+"""
+VAL_NAME = '_progrid_val_'
+
+"""
+String methods and builtins allowed in expressions.
+"""
+METHODS = set([
+    'startswith', 'endswith', 'count', 'find', 'replace', 'split', 'strip', 'lstrip', 'rstrip',
+    'isdigit', 'isalpha', 'isalnum', 'isspace',
+])
+BUILTINS = { 'len':len, 'int':int, 'float':float, 'str':text_type, 'abs':abs, 'min':min, 'max':max, 'round':round }
+
+CONSTANTS = { 'True':True, 'False':False, 'None':None }
+
+OPERATORS = {
+    'Eq'    : operator.eq,
+    'NotEq' : operator.ne,
+    'Lt'    : operator.lt,
+    'LtE'   : operator.le,
+    'Gt'    : operator.gt,
+    'GtE'   : operator.ge,
+    'In'    : lambda a, b: a in b,
+    'NotIn' : lambda a, b: a not in b,
+    'Is'    : operator.is_,
+    'IsNot' : operator.is_not,
+    'Add'   : operator.add,
+    'Sub'   : operator.sub,
+    'Mult'  : operator.mul,
+    'Div'   : operator.truediv,
+    'FloorDiv' : operator.floordiv,
+    'Mod'   : operator.mod,
+    'USub'  : operator.neg,
+    'UAdd'  : operator.pos,
+}
+
+
+"""
+Raised when an expression can't be compiled.
+"""
+class FilterError( ValueError ) :
+    pass
+
+
+"""
+Base class of compiled filters.
+"""
+class Filter( object ) :
+
+    """
+    Text the filter was compiled from.
+    """
+    source = ''
+
+    """
+    Filter kind : 'text', 'comparison' or 'expression'.
+    """
+    kind = ''
+
+    """
+    Single value test, for compatibility with lambda filters.
+    """
+    def __call__( self, value ) :
+        return self.test( normalize( value ) )
+
+    """
+    Test on an already normalized value.
+    """
+    def test( self, value ) :
+        raise NotImplementedError()
+
+    """
+    Returns the indexes whose value passes the filter.
+    Values must be normalized.
+
+    typed
+        Column type and values of the column converted to it, or None.
+        Comparisons with a constant then compare converted values.
+    """
+    def select( self, values, indexes, typed=None ) :
+        test = self.test
+        return [ i for i in indexes if test( values[i] ) ]
+
+    """
+    Returns a SQL condition equivalent to the filter on the given ( quoted ) column,
+    with its parameters, or None if the filter can't be translated.
+
+    numeric
+        True if the column has numeric affinity, then numbers are compared as numbers.
+        Text and numbers can't be told apart in other columns, so such comparisons are not translated.
+
+    Text is normalized by SQL like normalize() does, only ASCII constants are translated
+    since SQLite lower() ignores other letters. Reals are formatted by SQLite, so
+    text filters on them may differ for values needing more than 15 digits.
+    """
+    def to_sql( self, column, numeric=False ) :
+        return None
+
+    def __repr__( self ) :
+        return '<%s %r>' % ( self.__class__.__name__, self.source )
+
+
+"""
+Matches values containing the given text, ignoring case.
+"""
+class TextFilter( Filter ) :
+
+    kind = 'text'
+
+    def __init__( self, text ) :
+        self.source = text
+        self.needle = normalize( text )
+
+    def test( self, value ) :
+        return self.needle in value
+
+    def select( self, values, indexes, typed=None ) :
+        needle = self.needle
+        return [ i for i in indexes if needle in values[i] ]
+
+    def to_sql( self, column, numeric=False ) :
+        if not _is_ascii( self.needle ) :
+            return None
+        return 'instr( %s, ? ) > 0' % _sql_normalized( column ), [ self.needle ]
+
+    def __reduce__( self ) :
+        return ( TextFilter, ( self.source, ) )
+
+
+"""
+Comparison or $VAL expression, compiled into a predicate tree.
+"""
+class ExpressionFilter( Filter ) :
+
+    def __init__( self, source, expression, kind='expression' ) :
+        self.source = source
+        self.kind   = kind
+        try :
+            tree = ast.parse( expression.replace( '$VAL', VAL_NAME ).strip(), mode='eval' )
+        except SyntaxError as e :
+            raise FilterError( 'Invalid expression %r: %s' % ( source, e ) )
+        self.root = _build( tree.body )
+
+    def test( self, value ) :
+        try :
+            return bool( self.root.evaluate( value ) )
+        except Exception :
+            return False
+
+    def select( self, values, indexes, typed=None ) :
+        return self.root.select( values, indexes, typed )
+
+    def to_sql( self, column, numeric=False ) :
+        return self.root.to_sql( column, numeric )
+
+    def __reduce__( self ) :
+        return ( compile_filter, ( self.source, ) )
+
+
+"""
+Compiles a filter typed by the user, see module docs for the supported kinds.
+Raises FilterError if the expression is not valid.
+"""
+def compile_filter( expression ) :
+
+    expression = expression.strip()
+
+    if COMPARISON_START.match( expression ) :
+        return ExpressionFilter( expression, '$VAL ' + expression, 'comparison' )
+    elif '$VAL' in expression :
+        return ExpressionFilter( expression, expression, 'expression' )
+    else :
+        return TextFilter( expression )
+
+"""
+Value used by filters : text, stripped and lower case.
+"""
+def normalize( v ) :
+    return text_type( v ).strip().lower()
+
+
+# Predicate tree
+
+"""
+Base node, select() falls back to testing a value at a time.
+to_sql() gives None, nodes translated to SQL override it.
+"""
+class _Node( object ) :
+
+    def evaluate( self, value ) :
+        raise NotImplementedError()
+
+    def to_sql( self, column, numeric ) :
+        return None
+
+    def select( self, values, indexes, typed=None ) :
+        evaluate = self.evaluate
+        result = []
+        for i in indexes :
+            try :
+                if evaluate( values[i] ) : result.append( i )
+            except Exception :
+                pass
+        return result
+
+class _Value( _Node ) :
+
+    def evaluate( self, value ) :
+        return value
+
+    def select( self, values, indexes, typed=None ) :
+        return [ i for i in indexes if values[i] ]
+
+    def to_sql( self, column, numeric ) :
+        return "%s <> ''" % _sql_normalized( column ), []
+
+class _Const( _Node ) :
+
+    def __init__( self, value ) :
+        self.value = value
+
+    def evaluate( self, value ) :
+        return self.value
+
+class _Compare( _Node ) :
+
+    def __init__( self, left, ops, comparators ) :
+        self.left = left
+        self.ops  = ops
+        self.comparators = comparators
+
+    def evaluate( self, value ) :
+        a = self.left.evaluate( value )
+        for op, node in zip( self.ops, self.comparators ) :
+            b = node.evaluate( value )
+            if not _compare( op, a, b ) : return False
+            a = b
+        return True
+
+    """
+    Single '$VAL op constant' comparisons avoid walking the tree for every value.
+    They compare typed values when given, if the constant converts to the column type.
+    """
+    def select( self, values, indexes, typed=None ) :
+        left, op, right = self.left, self.ops[0], self.comparators[0]
+        if isinstance( left, _Const ) and op in SWAPPED :
+            left, op, right = right, SWAPPED[op], left
+        if len( self.ops ) == 1 and isinstance( left, _Value ) and isinstance( right, _Const ) :
+            b = right.value
+            if typed is not None :
+                result = _select_typed( op, b, typed, indexes )
+                if result is not None : return result
+            return [ i for i in indexes if _compare( op, values[i], b ) ]
+        return _Node.select( self, values, indexes )
+
+    def to_sql( self, column, numeric ) :
+        left, terms = self.left, []
+        for op, right in zip( self.ops, self.comparators ) :
+            term = _sql_compare( op, left, right, column, numeric )
+            if term is None : return None
+            terms.append( term )
+            left = right
+        return _sql_join( 'AND', terms )
+
+class _And( _Node ) :
+
+    def __init__( self, nodes ) :
+        self.nodes = nodes
+
+    def evaluate( self, value ) :
+        result = True
+        for node in self.nodes :
+            result = node.evaluate( value )
+            if not result : return result
+        return result
+
+    def select( self, values, indexes, typed=None ) :
+        for node in self.nodes :
+            indexes = node.select( values, indexes, typed )
+        return indexes
+
+    def to_sql( self, column, numeric ) :
+        return _sql_join( 'AND', [ node.to_sql( column, numeric ) for node in self.nodes ] )
+
+class _Or( _Node ) :
+
+    def __init__( self, nodes ) :
+        self.nodes = nodes
+
+    def evaluate( self, value ) :
+        result = False
+        for node in self.nodes :
+            result = node.evaluate( value )
+            if result : return result
+        return result
+
+    def select( self, values, indexes, typed=None ) :
+        accepted = set()
+        for node in self.nodes :
+            accepted.update( node.select( values, indexes, typed ) )
+        return [ i for i in indexes if i in accepted ]
+
+    def to_sql( self, column, numeric ) :
+        return _sql_join( 'OR', [ node.to_sql( column, numeric ) for node in self.nodes ] )
+
+class _Not( _Node ) :
+
+    def __init__( self, node ) :
+        self.node = node
+
+    def evaluate( self, value ) :
+        return not self.node.evaluate( value )
+
+    def select( self, values, indexes, typed=None ) :
+        rejected = set( self.node.select( values, indexes, typed ) )
+        return [ i for i in indexes if i not in rejected ]
+
+    def to_sql( self, column, numeric ) :
+        term = self.node.to_sql( column, numeric )
+        return None if term is None else ( 'NOT ( %s )' % term[0], term[1] )
+
+class _Operation( _Node ) :
+
+    def __init__( self, op, nodes ) :
+        self.op    = op
+        self.nodes = nodes
+
+    def evaluate( self, value ) :
+        args = [ node.evaluate( value ) for node in self.nodes ]
+        if len( args ) == 2 and _is_number( args[0] ) != _is_number( args[1] ) :
+            args = [ _to_number( a ) for a in args ]
+        return self.op( *args )
+
+class _Method( _Node ) :
+
+    def __init__( self, target, name, args ) :
+        self.target = target
+        self.name   = name
+        self.args   = args
+
+    def evaluate( self, value ) :
+        target = self.target.evaluate( value )
+        return getattr( target, self.name )( *[ a.evaluate( value ) for a in self.args ] )
+
+    """
+    Only startswith() and endswith() of $VAL, with a text constant.
+    """
+    def to_sql( self, column, numeric ) :
+        if self.name not in ( 'startswith', 'endswith' ) or not isinstance( self.target, _Value ) :
+            return None
+        if len( self.args ) != 1 or not _is_ascii_const( self.args[0] ) :
+            return None
+        text = self.args[0].value
+        if len( text ) == 0 :
+            return '1', []
+        start = 1 if self.name == 'startswith' else -len( text )
+        return 'substr( %s, %d, %d ) = ?' % ( _sql_normalized( column ), start, len( text ) ), [ text ]
+
+class _Call( _Node ) :
+
+    def __init__( self, function, args ) :
+        self.function = function
+        self.args     = args
+
+    def evaluate( self, value ) :
+        return self.function( *[ a.evaluate( value ) for a in self.args ] )
+
+class _Subscript( _Node ) :
+
+    def __init__( self, target, index ) :
+        self.target = target
+        self.index  = index
+
+    def evaluate( self, value ) :
+        return self.target.evaluate( value )[ self.index.evaluate( value ) ]
+
+class _Slice( _Node ) :
+
+    def __init__( self, lower, upper, step ) :
+        self.parts = lower, upper, step
+
+    def evaluate( self, value ) :
+        return slice( *[ p.evaluate( value ) if p else None for p in self.parts ] )
+
+"""
+Turns an ast node into a predicate tree node.
+Text constants are normalized, like the values they are compared with.
+"""
+def _build( node ) :
+
+    kind = type( node ).__name__
+
+    if kind in ( 'Constant', 'Num', 'Str', 'NameConstant', 'Bytes' ) :
+        value = getattr( node, 'value', None ) if kind in ( 'Constant', 'NameConstant' ) else getattr( node, 'n', getattr( node, 's', None ) )
+        return _Const( normalize( value ) if isinstance( value, text_types ) else value )
+
+    if kind == 'Name' :
+        if node.id == VAL_NAME : return _Value()
+        if node.id in CONSTANTS : return _Const( CONSTANTS[node.id] )
+        raise FilterError( 'Unknown name %s' % node.id )
+
+    if kind in ( 'List', 'Tuple', 'Set' ) :
+        items = [ _build( n ) for n in node.elts ]
+        if not all( isinstance( n, _Const ) for n in items ) :
+            raise FilterError( 'Only constants are allowed in sequences' )
+        return _Const( tuple( n.value for n in items ) )
+
+    if kind == 'Compare' :
+        ops = [ _operator( op ) for op in node.ops ]
+        return _Compare( _build( node.left ), ops, [ _build( n ) for n in node.comparators ] )
+
+    if kind == 'BoolOp' :
+        nodes = [ _build( n ) for n in node.values ]
+        return _And( nodes ) if type( node.op ).__name__ == 'And' else _Or( nodes )
+
+    if kind == 'UnaryOp' :
+        if type( node.op ).__name__ == 'Not' : return _Not( _build( node.operand ) )
+        return _Operation( _operator( node.op ), [ _build( node.operand ) ] )
+
+    if kind == 'BinOp' :
+        return _Operation( _operator( node.op ), [ _build( node.left ), _build( node.right ) ] )
+
+    if kind == 'Call' :
+        args = [ _build( n ) for n in node.args ]
+        if getattr( node, 'keywords', None ) :
+            raise FilterError( 'Keyword arguments are not allowed' )
+        func = node.func
+        if type( func ).__name__ == 'Attribute' and func.attr in METHODS :
+            return _Method( _build( func.value ), func.attr, args )
+        if type( func ).__name__ == 'Name' and func.id in BUILTINS :
+            return _Call( BUILTINS[func.id], args )
+        raise FilterError( 'Function not allowed' )
+
+    if kind == 'Subscript' :
+        index = node.slice
+        if type( index ).__name__ == 'Index' : index = index.value
+        return _Subscript( _build( node.value ), _build( index ) )
+
+    if kind == 'Slice' :
+        return _Slice( *[ _build( n ) if n is not None else None for n in ( node.lower, node.upper, node.step ) ] )
+
+    raise FilterError( '%s is not allowed in filters' % kind )
+
+def _operator( op ) :
+    name = type( op ).__name__
+    if name not in OPERATORS :
+        raise FilterError( 'Operator %s is not allowed' % name )
+    return OPERATORS[name]
+
+
+# SQL translation
+
+"""
+SQL operators of the comparisons that can be translated.
+"""
+SQL_OPERATORS = {
+    operator.eq : '=',
+    operator.ne : '<>',
+    operator.lt : '<',
+    operator.le : '<=',
+    operator.gt : '>',
+    operator.ge : '>=',
+}
+
+"""
+Operator to use when swapping operands, '3 < $VAL' is '$VAL > 3'.
+"""
+SWAPPED = {
+    operator.eq : operator.eq,
+    operator.ne : operator.ne,
+    operator.lt : operator.gt,
+    operator.le : operator.ge,
+    operator.gt : operator.lt,
+    operator.ge : operator.le,
+}
+
+"""
+Same as normalize(), in SQL.
+"""
+def _sql_normalized( column ) :
+    return "lower( trim( COALESCE( CAST( %s AS TEXT ), 'none' ), char( 32, 9, 10, 11, 12, 13 ) ) )" % column
+
+"""
+Translates a single comparison, with the same semantic of _compare().
+The other operand must be a constant.
+"""
+def _sql_compare( op, a, b, column, numeric ) :
+
+    if isinstance( a, _Const ) and not isinstance( b, _Const ) and op in SWAPPED :
+        a, b, op = b, a, SWAPPED[op]
+
+    if not isinstance( b, _Const ) :
+        return None
+    value = b.value
+
+    if isinstance( a, _Value ) :
+        expr, kind = _sql_normalized( column ), 'text'
+    elif isinstance( a, _Call ) and a.function is len and len( a.args ) == 1 and isinstance( a.args[0], _Value ) :
+        expr, kind = 'length( %s )' % _sql_normalized( column ), 'number'
+    else :
+        return None
+
+    if op in ( OPERATORS['In'], OPERATORS['NotIn'] ) :
+        if kind != 'text' or not isinstance( value, tuple ) or len( value ) == 0 :
+            return None
+        if not all( isinstance( v, text_types ) and _is_ascii( v ) for v in value ) :
+            return None
+        negate = 'NOT ' if op is OPERATORS['NotIn'] else ''
+        return '%s %sIN ( %s )' % ( expr, negate, ', '.join( '?' * len( value ) ) ), list( value )
+
+    if op not in SQL_OPERATORS :
+        return None
+    sql = SQL_OPERATORS[op]
+
+    if kind == 'text' and _is_ascii_const( b ) :
+        return '%s %s ?' % ( expr, sql ), [ value ]
+
+    if not _is_number( value ) :
+        return None
+
+    if kind == 'number' :
+        return '%s %s ?' % ( expr, sql ), [ value ]
+
+    #Text that is not a number only differs from numbers
+    if not numeric :
+        return None
+    if op is operator.ne :
+        return "( typeof( %s ) NOT IN ( 'integer', 'real' ) OR %s <> ? )" % ( column, column ), [ value ]
+    return "( typeof( %s ) IN ( 'integer', 'real' ) AND %s %s ? )" % ( column, column, sql ), [ value ]
+
+"""
+Joins conditions with AND or OR, None if any of them is None.
+"""
+def _sql_join( joiner, terms ) :
+    if any( term is None for term in terms ) :
+        return None
+    if len( terms ) == 1 :
+        return terms[0]
+    params = []
+    for term in terms : params.extend( term[1] )
+    return ( ' %s ' % joiner ).join( '( %s )' % term[0] for term in terms ), params
+
+def _is_ascii_const( node ) :
+    return isinstance( node, _Const ) and isinstance( node.value, text_types ) and _is_ascii( node.value )
+
+def _is_ascii( text ) :
+    return all( ord( c ) < 128 for c in text )
+
+
+# Garbage used here and there
+
+"""
+Compares text with numbers as numbers, text that is not a number only differs from them.
+Text is compared with bools as text, so 'true' == True.
+"""
+def _compare( op, a, b ) :
+    try :
+        if isinstance( a, text_types ) or isinstance( b, text_types ) :
+            if _is_number( a ) != _is_number( b ) :
+                na, nb = _to_number( a ), _to_number( b )
+                if na is None or nb is None :
+                    return op is operator.ne
+                return op( na, nb )
+            if isinstance( a, bool ) or isinstance( b, bool ) :
+                return op( normalize( a ), normalize( b ) )
+        return op( a, b )
+    except Exception :
+        return False
+
+"""
+Selects with a comparison of typed values, None if the constant can't be converted
+to the column type. Values that can't be converted only differ from the constant.
+Text columns are left to _compare(), which compares numbers in text as numbers.
+"""
+def _select_typed( op, b, typed, indexes ) :
+
+    coltype, values = typed
+    if coltype.kind is text_type or op not in SQL_OPERATORS :
+        return None
+    b = coltype.convert( b )
+    if b is None :
+        return None
+
+    if op is operator.ne :
+        return [ i for i in indexes if values[i] is None or values[i] != b ]
+    return [ i for i in indexes if values[i] is not None and op( values[i], b ) ]
+
+def _is_number( v ) :
+    return isinstance( v, ( int, float ) ) and not isinstance( v, bool )
+
+def _to_number( v ) :
+    if _is_number( v ) : return v
+    try :
+        return int( v )
+    except ( TypeError, ValueError ) :
+        try :
+            return float( v )
+        except ( TypeError, ValueError ) :
+            return None
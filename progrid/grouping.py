@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+__all__ = [ 'AGGREGATES', 'Group', 'GroupIndex' ]
+
+"""
+Rows grouping.
+
+Rows are grouped by the values of one or more columns, each column being
+a level : grouping by [ 'surname', 'name' ] gives a group per surname,
+containing a group per name.
+
+Group membership and aggregates are computed once into a GroupIndex,
+a dictionary from group key to Group, then updated row by row.
+The grid sorts rows by the grouping columns first, so the rows of
+a group are always next to each other.
+"""
+
+"""
+Aggregates available for every column.
+"""
+AGGREGATES = ( 'count', 'sum', 'min', 'max', 'avg' )
+
+
+"""
+Group of rows sharing the same values of the grouping columns, up to its level.
+"""
+class Group( object ) :
+
+    def __init__( self, key, level, column, label ) :
+
+        #Values of the grouping columns, as many as level+1
+        self.key = key
+        self.level = level
+
+        #Grouping column of this level, and its value as shown to the user
+        self.column = column
+        self.label = label
+
+        #Rows of the group, and running aggregates of every aggregated column
+        self.rows = set()
+        self.stats = {}
+
+    def __len__( self ) :
+        return len( self.rows )
+
+    def __repr__( self ) :
+        return '<Group %r ( %d rows )>' % ( self.key, len( self.rows ) )
+
+
+"""
+Hash index of the groups of the given rows.
+
+store
+    Data store, see columnar.DataStore.
+
+rows
+    Rows to group, usually the ones accepted by filters.
+
+columns
+    Grouping columns.
+
+aggregated
+    Columns whose aggregates are computed.
+"""
+class GroupIndex( object ) :
+
+    def __init__( self, store, rows, columns, aggregated=() ) :
+
+        self.store = store
+        self.rows = rows
+        self.version = store.version
+        self.columns = list( columns )
+        self.aggregated = list( aggregated )
+
+        self.groups = {}
+        self._keys = {}
+        self._values = {}
+
+        for i in rows :
+            self._add( i )
+
+    """
+    True if the index describes the given rows of the store, as it is now.
+    """
+    def is_current( self, store, rows, columns, aggregated ) :
+        return store is self.store and store.version == self.version and rows is self.rows \
+            and list( columns ) == self.columns and list( aggregated ) == self.aggregated
+
+    """
+    Updates the index after rows changed in the store.
+    removed and inserted are the rows that left and entered the grouped rows,
+    as given by pipeline.ViewPipeline.update_rows(). Rows moved are in both.
+    """
+    def update( self, changed, removed, inserted, rows ) :
+
+        inserted = set( inserted )
+        for i in changed :
+            shown = ( i in self._keys and i not in removed ) or i in inserted
+            if i in self._keys :
+                self._remove( i )
+            if shown :
+                self._add( i )
+
+        self.rows = rows
+        self.version = self.store.version
+
+    """
+    Returns the value of an aggregate of a column in a group, None if the group has no values.
+    """
+    def aggregate( self, group, column, name ) :
+
+        if name == 'count' :
+            return len( group.rows )
+
+        stats = group.stats[column]
+        if stats.stale :
+            position = self.aggregated.index( column )
+            stats.reset()
+            for i in group.rows :
+                stats.add( self._values[i][position] )
+        return stats.value( name )
+
+    """
+    Returns the lines shown by the grid : a Group for every group header,
+    and the row index for every row, following the given order.
+    Rows and subgroups of collapsed groups are skipped.
+
+    order
+        Grouped rows, sorted by the grouping columns first.
+
+    collapsed
+        Keys of the collapsed groups.
+    """
+    def lines( self, order, collapsed=() ) :
+
+        levels = len( self.columns )
+        result, previous = [], ()
+
+        for i in order :
+            key = self._keys[i]
+
+            first = 0
+            while first < len( previous ) and previous[first] == key[first] :
+                first += 1
+
+            hidden = False
+            for level in range( levels ) :
+                if level >= first and not hidden :
+                    result.append( self.groups[ key[:level+1] ] )
+                if key[:level+1] in collapsed :
+                    hidden = True
+
+            if not hidden :
+                result.append( i )
+            previous = key
+
+        return result
+
+    def _add( self, i ) :
+
+        store  = self.store
+        key    = tuple( _hashable( store.typed_value( i, c ) ) for c in self.columns )
+        values = tuple( store.typed_value( i, c ) for c in self.aggregated )
+        self._keys[i]   = key
+        self._values[i] = values
+
+        for level, column in enumerate( self.columns ) :
+            group = self.groups.get( key[:level+1] )
+            if group is None :
+                label = store.display( column, store.value( i, column ) )
+                group = self.groups[ key[:level+1] ] = Group( key[:level+1], level, column, label )
+                for name in self.aggregated :
+                    group.stats[name] = _Stats()
+            group.rows.add( i )
+            for name, value in zip( self.aggregated, values ) :
+                group.stats[name].add( value )
+
+    def _remove( self, i ) :
+
+        key    = self._keys.pop( i )
+        values = self._values.pop( i )
+
+        for level in range( len( self.columns ) ) :
+            group = self.groups[ key[:level+1] ]
+            group.rows.discard( i )
+            if len( group.rows ) == 0 :
+                del self.groups[ key[:level+1] ]
+                continue
+            for name, value in zip( self.aggregated, values ) :
+                group.stats[name].remove( value )
+
+
+# Garbage used here and there
+
+"""
+Running aggregates of a column in a group.
+Sum and count are updated on removal, min and max are computed again
+when the removed value was one of them.
+"""
+class _Stats( object ) :
+
+    __slots__ = ( 'n', 'total', 'low', 'high', 'stale' )
+
+    def __init__( self ) :
+        self.reset()
+
+    def reset( self ) :
+        self.n = 0
+        self.total = 0
+        self.low = None
+        self.high = None
+        self.stale = False
+
+    def add( self, v ) :
+        if v is None :
+            return
+        if _is_number( v ) :
+            self.n += 1
+            self.total += v
+        try :
+            if self.low is None or v < self.low : self.low = v
+            if self.high is None or v > self.high : self.high = v
+        except TypeError :
+            pass
+
+    def remove( self, v ) :
+        if v is None :
+            return
+        if _is_number( v ) :
+            self.n -= 1
+            self.total -= v
+        if v == self.low or v == self.high :
+            self.stale = True
+
+    def value( self, name ) :
+        if name == 'sum' :
+            return self.total if self.n > 0 else None
+        if name == 'avg' :
+            return float( self.total ) / self.n if self.n > 0 else None
+        if name == 'min' :
+            return self.low
+        if name == 'max' :
+            return self.high
+        raise ValueError( 'Unknown aggregate %s, use one of %s' % ( name, ', '.join( AGGREGATES ) ) )
+
+def _is_number( v ) :
+    return isinstance( v, ( int, float ) ) and not isinstance( v, bool )
+
+def _hashable( v ) :
+    try :
+        hash( v )
+        return v
+    except TypeError :
+        return repr( v )
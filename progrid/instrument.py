@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+__all__ = [ 'Instrument', 'NO_STAGE' ]
+
+from collections import deque
+from timeit import default_timer
+
+"""
+Opt-in instrumentation of ProGrid hot paths.
+
+Set an Instrument as ProGrid.instrument to know where render time goes :
+
+    instrument = Instrument( callback=lambda kind, name, value: log( kind, name, value ) )
+    grid.instrument = instrument
+    ...
+    print( instrument.summary() )
+
+Stages timed, in seconds :
+
+  source          data setup ( ProGrid._setup_data )
+  filter          filtering, on row indexes
+  sort            sorting, on row indexes
+  render          whole render stage, the following ones included
+  build_coltypes  column types
+  gen_header      header cells
+  gen_footer      footer cells
+  gen_rows        rows built or refilled, per render, batch or scroll
+  layout          rows laid out after a column resize
+
+Counters :
+
+  widgets_created    widgets built for rows, group headers, header and footer
+  widgets_destroyed  widgets dropped from the grid
+  rows_recycled      row widgets refilled instead of built
+  filter_calls       values tested by filters
+
+With no instrument set the grid only checks for None at each point.
+"""
+
+
+"""
+Collects stage timings and counters.
+
+window
+    Timings kept per stage, for the rolling summary.
+
+callback
+    Called with ( 'stage', name, seconds ) after each timed stage,
+    and with ( 'count', name, n ) for each counter increment.
+    Filtering and sorting run on the render thread if async_render is on,
+    so may their callbacks.
+"""
+class Instrument( object ) :
+
+    def __init__( self, window=100, callback=None ) :
+        self.window   = window
+        self.callback = callback
+        self.counters = {}
+        self._timings = {}
+
+    """
+    Records the duration of a stage.
+    """
+    def timing( self, name, seconds ) :
+        if name not in self._timings :
+            self._timings[name] = deque( maxlen=self.window )
+        self._timings[name].append( seconds )
+        if self.callback : self.callback( 'stage', name, seconds )
+
+    """
+    Increments a counter.
+    """
+    def count( self, name, n=1 ) :
+        self.counters[name] = self.counters.get( name, 0 ) + n
+        if self.callback : self.callback( 'count', name, n )
+
+    """
+    Context manager timing the block as the given stage.
+    """
+    def stage( self, name ) :
+        return _Stage( self, name )
+
+    """
+    Rolling summary : for each stage the last, mean, max and total seconds
+    of the last timings kept ( see window ), and every counter.
+    """
+    def summary( self ) :
+        stages = {}
+        for name, timings in list( self._timings.items() ) :
+            timings = list( timings )
+            if len( timings ) > 0 :
+                stages[name] = {
+                    'runs'  : len( timings ),
+                    'last'  : timings[-1],
+                    'mean'  : sum( timings ) / len( timings ),
+                    'max'   : max( timings ),
+                    'total' : sum( timings ),
+                }
+        return { 'stages':stages, 'counters':dict( self.counters ) }
+
+    def reset( self ) :
+        self.counters = {}
+        self._timings = {}
+
+
+# Garbage used here and there
+
+class _Stage( object ) :
+
+    def __init__( self, instrument, name ) :
+        self.instrument = instrument
+        self.name = name
+
+    def __enter__( self ) :
+        self.start = default_timer()
+        return self
+
+    def __exit__( self, *args ) :
+        self.instrument.timing( self.name, default_timer() - self.start )
+        return False
+
+"""
+Stage doing nothing, used when instrumentation is off.
+"""
+class _NoStage( object ) :
+
+    def __enter__( self ) :
+        return self
+
+    def __exit__( self, *args ) :
+        return False
+
+NO_STAGE = _NoStage()
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+__all__ = [ 'ColumnLayout' ]
+
+"""
+Widths of the grid columns, shared by header, rows and footer.
+
+Cells are placed by reading this model when their row is laid out,
+so resizing a column only changes the model : rows being shown are laid
+out again, the others when they get shown.
+"""
+class ColumnLayout( object ) :
+
+    def __init__( self ) :
+
+        self.columns = []
+
+        #Incremented whenever widths change, rows laid out with an older version are stale
+        self.version = 0
+
+        self._hints  = {}
+        self._widths = {}
+        self._cache  = None
+
+    """
+    Sets the columns and their relative sizes, like ProGrid.col_sizes.
+    Columns resized by the user keep their width.
+    """
+    def set_columns( self, columns, hints ) :
+        columns = list( columns )
+        hints   = dict( ( c, hints.get( c, 1 ) ) for c in columns )
+        if columns != self.columns or hints != self._hints :
+            self.columns = columns
+            self._hints  = hints
+            self._changed()
+
+    """
+    Fixes the width of a column, in pixels.
+    """
+    def resize( self, column, width ) :
+        width = max( 0, width )
+        if self._widths.get( column ) != width :
+            self._widths[column] = width
+            self._changed()
+
+    """
+    Returns the widths fixed by resize(), by column.
+    """
+    def widths( self ) :
+        return dict( self._widths )
+
+    """
+    Replaces every width fixed by resize(), other columns follow their hints.
+    """
+    def set_widths( self, widths ) :
+        widths = dict( ( c, max( 0, w ) ) for c, w in widths.items() )
+        if widths != self._widths :
+            self._widths = widths
+            self._changed()
+
+    """
+    Returns the x offset and the width of every column, for the given available width.
+    Columns not resized share the width left by the resized ones, following their hints.
+    """
+    def positions( self, width, spacing=0 ) :
+
+        key = ( self.version, width, spacing )
+        if self._cache is not None and self._cache[0] == key :
+            return self._cache[1]
+
+        fixed = sum( self._widths[c] for c in self.columns if c in self._widths )
+        hints = sum( self._hints[c] for c in self.columns if c not in self._widths ) or 1
+        free  = max( 0, width - fixed - spacing * max( 0, len( self.columns ) - 1 ) )
+
+        result, x = [], 0
+        for c in self.columns :
+            w = self._widths[c] if c in self._widths else free * self._hints[c] / float( hints )
+            result.append( ( x, w ) )
+            x += w + spacing
+
+        self._cache = ( key, result )
+        return result
+
+    def _changed( self ) :
+        self.version += 1
+        self._cache = None
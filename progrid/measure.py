@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+__all__ = [ 'TextMeasurer', 'stratified_sample' ]
+
+"""
+Text measurements, used to fit columns to their content.
+
+Texts are measured with the Kivy core text provider, without building
+any widget. Measurements are cached by font, size and text, so the
+same values in many rows ( or many renders ) are measured once.
+"""
+
+
+"""
+Measures text widths, caching them.
+
+max_size
+    Measurements kept, the cache is emptied when full.
+"""
+class TextMeasurer( object ) :
+
+    def __init__( self, max_size=20000 ) :
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._cache = {}
+        self._labels = {}
+
+    """
+    Returns the width of the text, in pixels.
+    An empty font name means the default font.
+    """
+    def width( self, text, font_name='', font_size=15 ) :
+
+        key = ( font_name, font_size, text )
+        if key in self._cache :
+            self.hits += 1
+            return self._cache[key]
+
+        self.misses += 1
+        if len( self._cache ) >= self.max_size :
+            self._cache.clear()
+
+        width = self._get_label( font_name, font_size ).get_extents( text )[0]
+        self._cache[key] = width
+        return width
+
+    """
+    Core labels are only used to measure, one per font and size.
+    """
+    def _get_label( self, font_name, font_size ) :
+        key = ( font_name, font_size )
+        if key not in self._labels :
+            from kivy.core.text import Label as CoreLabel
+            kargs = { 'font_size':font_size }
+            if font_name : kargs['font_name'] = font_name
+            self._labels[key] = CoreLabel( **kargs )
+        return self._labels[key]
+
+
+"""
+Returns up to k indexes out of n, one from the middle of each of k equal strata.
+Every part of the data is represented, unlike taking the first k rows.
+"""
+def stratified_sample( n, k ) :
+    if n <= k :
+        return list( range( n ) )
+    size = float( n ) / k
+    return [ int( s * size + size / 2 ) for s in range( k ) ]
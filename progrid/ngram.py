@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+__all__ = [ 'NGramIndex' ]
+
+"""
+Inverted n-gram index, used to speed up substring search.
+
+Each n characters long substring of the indexed values points to the
+set of rows containing it. Rows containing a text must contain all
+of its n-grams, so intersecting those sets gives a small set of
+candidates to be verified with a plain 'in' test.
+"""
+class NGramIndex( object ) :
+
+    """
+    values
+        Normalized values, indexed by row.
+    """
+    def __init__( self, values, n=3 ) :
+        self.n = n
+        self._postings = {}
+        for i, value in enumerate( values ) :
+            self._add( i, value )
+
+    """
+    Returns the set of rows that may contain the text.
+    Returns None if the text is too short to be looked up, any row may contain it.
+    """
+    def candidates( self, text ) :
+
+        grams = _grams( text, self.n )
+        if len( grams ) == 0 :
+            return None
+
+        postings = [ self._postings.get( g, _EMPTY ) for g in grams ]
+        postings.sort( key=len )
+
+        result = set( postings[0] )
+        for rows in postings[1:] :
+            if len( result ) == 0 : break
+            result.intersection_update( rows )
+        return result
+
+    """
+    Updates the index after the value of row i changed.
+    Old value is None for new rows.
+    """
+    def update( self, i, old, new ) :
+        if old is not None :
+            for g in _grams( old, self.n ) :
+                rows = self._postings.get( g )
+                if rows is not None :
+                    rows.discard( i )
+                    if len( rows ) == 0 : del self._postings[g]
+        self._add( i, new )
+
+    def _add( self, i, value ) :
+        for g in _grams( value, self.n ) :
+            rows = self._postings.get( g )
+            if rows is None :
+                rows = self._postings[g] = set()
+            rows.add( i )
+
+
+# Garbage used here and there
+
+_EMPTY = frozenset()
+
+def _grams( text, n ) :
+    return set( text[k:k+n] for k in range( len(text) - n + 1 ) )
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+__all__ = [ 'ParallelFilter', 'shutdown' ]
+
+import pickle
+
+"""
+Filtering on a pool of processes, for $VAL expressions doing real work per value.
+
+Rows are split in chunks, each chunk is filtered by a worker process
+and surviving rows are merged back in their original order. Compiled
+filters are pickled as their source text and compiled again by workers
+( see filters module ), so any expression typed by the user can be sent.
+
+Small inputs, cheap filters ( text and comparisons ) and filters that
+can't be pickled ( like lambdas ) are filtered serially, as are all
+filters on single CPU machines or where processes can't be started :
+results are the same.
+
+The pool is shared by every grid and started the first time it's needed.
+"""
+
+
+"""
+Selects rows with filters, in parallel when worth it.
+
+min_rows
+    Rows below which filtering is serial, sending values to workers costs more.
+
+processes
+    Worker processes, defaults to the number of CPUs.
+    Only the first ParallelFilter using the pool sets it.
+"""
+class ParallelFilter( object ) :
+
+    def __init__( self, min_rows=20000, processes=None ) :
+        self.min_rows  = min_rows
+        self.processes = processes
+
+    """
+    Same as test.select( values, indexes, typed ).
+    """
+    def select( self, test, values, indexes, typed=None ) :
+
+        if len( indexes ) < self.min_rows or getattr( test, 'kind', None ) != 'expression' or not _picklable( test ) :
+            return test.select( values, indexes, typed )
+
+        pool = _get_pool( self.processes )
+        if pool is None :
+            return test.select( values, indexes, typed )
+
+        chunks = _chunks( list( indexes ), _processes( pool ) * 4 )
+        tasks  = [ ( test, [ values[i] for i in chunk ], chunk, _typed_chunk( typed, chunk ) ) for chunk in chunks ]
+        result = []
+        for part in pool.map( _select_chunk, tasks ) :
+            result.extend( part )
+        return result
+
+
+"""
+Stops the worker processes, the pool starts again if needed.
+"""
+def shutdown() :
+    global _pool
+    if _pool is not None :
+        _pool.terminate()
+        _pool = None
+
+
+# Garbage used here and there
+
+_pool = None
+_no_pool = False
+
+"""
+Returns the shared pool, None if a single process would run
+or if processes can't be started on this platform.
+"""
+def _get_pool( processes ) :
+    global _pool, _no_pool
+    if _pool is None and not _no_pool :
+        try :
+            from multiprocessing import Pool, cpu_count
+            processes = processes or cpu_count()
+            if processes < 2 :
+                _no_pool = True
+            else :
+                _pool = Pool( processes )
+        except ( ImportError, NotImplementedError, OSError ) :
+            _no_pool = True
+    return _pool
+
+def _processes( pool ) :
+    return getattr( pool, '_processes', None ) or 1
+
+def _picklable( test ) :
+    try :
+        pickle.dumps( test, pickle.HIGHEST_PROTOCOL )
+        return True
+    except Exception :
+        return False
+
+"""
+Splits items in n chunks of about the same size, in order.
+"""
+def _chunks( items, n ) :
+    size = max( 1, -( -len( items ) // n ) )
+    return [ items[i:i+size] for i in range( 0, len( items ), size ) ]
+
+"""
+Runs in a worker : filters the values of a chunk, returns the indexes of the survivors.
+"""
+def _select_chunk( task ) :
+    test, values, indexes, typed = task
+    return [ indexes[p] for p in test.select( values, range( len( values ) ), typed ) ]
+
+"""
+Typed values of a chunk, see filters.Filter.select().
+"""
+def _typed_chunk( typed, chunk ) :
+    if typed is None :
+        return None
+    coltype, values = typed
+    return coltype, [ values[i] for i in chunk ]
@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+__all__ = [ 'ViewPipeline', 'STAGES' ]
+
+from timeit import default_timer
+
+from .columnar import filter_indexes
+from .sorting import LazyOrder, row_key, sort_indexes
+
+"""
+Stages of the pipeline, in order.
+
+    source -> filter -> sort -> render
+
+Invalidating a stage invalidates the following ones too.
+"""
+STAGES = ( 'source', 'filter', 'sort', 'render' )
+
+"""
+Rows from which sorting is lazy, if enabled : below it sorting all at once is as fast.
+"""
+LAZY_MIN_ROWS = 10000
+
+
+"""
+Staged computation of the rows shown by ProGrid.
+
+Every stage caches its output and is recomputed only if invalidated :
+
+  - changing the sort does not re-filter
+  - changing the columns does not re-filter nor re-sort
+  - changing the filters reuses the sort order of the whole store
+
+Source and render stages are provided by the grid when calling run().
+"""
+class ViewPipeline( object ) :
+
+    def __init__( self ) :
+
+        #Inputs, set by the grid
+        self.filters = {}
+        self.sorting = []
+        self.use_index = False
+        self.instrument = None
+        self.parallel = None
+        self.lazy_sort = False
+
+        #Outputs of the stages
+        self.store    = None
+        self.filtered = []
+        self.ordered  = []
+
+        #Seconds spent by each stage during the last run
+        self.timings = {}
+
+        self._sorted_all = None
+        self._primed = None
+        self._dirty = set( STAGES )
+
+    """
+    Marks a stage, and the following ones, to be recomputed.
+    """
+    def invalidate( self, stage ) :
+        if stage in ( 'source', 'sort' ) :
+            self._sorted_all = None
+        for s in STAGES[ STAGES.index( stage ): ] :
+            self._dirty.add( s )
+
+    """
+    Called when rows have been replaced in the store, caches stay valid.
+    Filters and sort order must be recomputed.
+    """
+    def rows_changed( self ) :
+        self._sorted_all = None
+        self.invalidate( 'filter' )
+
+    """
+    True if no stage needs to be recomputed.
+    """
+    def is_clean( self ) :
+        return len( self._dirty ) == 0
+
+    """
+    Updates filter and sort outputs after rows have been replaced or added to the store,
+    without running the whole stages again.
+
+    Rows still matching filters stay where they are, unless their sort key changed.
+    Returns the set of rows removed from the ordered view and the list of rows inserted into it,
+    rows moved by the update are in both.
+    """
+    def update_rows( self, changed ) :
+
+        changed  = set( changed )
+        passing  = set( filter_indexes( self.store, self.filters, sorted( changed ) ) )
+        position = dict( ( i, g ) for g, i in enumerate( self.ordered ) )
+
+        removed, inserted = set(), []
+        for i in sorted( changed ) :
+            g = position.get( i )
+            if g is None :
+                if i in passing : inserted.append( i )
+            elif i not in passing :
+                removed.add( i )
+            elif not self._in_place( g, i, changed ) :
+                removed.add( i )
+                inserted.append( i )
+
+        if len( removed ) > 0 or len( inserted ) > 0 :
+            dropped = removed - set( inserted )
+            added   = [ i for i in inserted if i not in position ]
+            self.filtered = _merge( [ i for i in self.filtered if i not in dropped ], added, _identity )
+            if len( self.sorting ) > 0 :
+                inserted.sort( key=self._row_key )
+                self.ordered = _merge( [ i for i in self.ordered if i not in removed ], inserted, self._row_key )
+            else :
+                self.ordered = self.filtered
+
+        if self._sorted_all is not None :
+            moved = sorted( changed, key=self._row_key )
+            self._sorted_all = _merge( [ i for i in self._sorted_all if i not in changed ], moved, self._row_key )
+
+        self._primed = None
+        return removed, inserted
+
+    """
+    Updates filter and sort outputs after rows have been deleted from the store.
+    Returns, for every old row index, the new one ( -1 for deleted rows ).
+    """
+    def delete_rows( self, deleted, size ) :
+
+        deleted = set( deleted )
+        remap, n = [], 0
+        for i in range( size ) :
+            if i in deleted :
+                remap.append( -1 )
+            else :
+                remap.append( n )
+                n += 1
+
+        shift = lambda order: [ remap[i] for i in order if i not in deleted ]
+        same  = self.ordered is self.filtered
+        self.filtered = shift( self.filtered )
+        self.ordered  = self.filtered if same else shift( self.ordered )
+        if self._sorted_all is not None :
+            self._sorted_all = shift( self._sorted_all )
+
+        self._primed = None
+        return remap
+
+    """
+    True if the changed row at position g is still between its neighbours.
+    Rows next to other changed rows are always moved, to be safe.
+    """
+    def _in_place( self, g, i, changed ) :
+
+        if len( self.sorting ) == 0 :
+            return True
+
+        key = self._row_key( i )
+        if g > 0 :
+            prev = self.ordered[g-1]
+            if prev in changed or not self._row_key( prev ) < key : return False
+        if g+1 < len( self.ordered ) :
+            succ = self.ordered[g+1]
+            if succ in changed or not key < self._row_key( succ ) : return False
+        return True
+
+    def _row_key( self, i ) :
+        return row_key( self.store, i, self.sorting )
+
+    """
+    Sets the output of the filter stage, computed elsewhere.
+    It's used by the next run only if store and filters are still the same.
+    """
+    def prime_filter( self, store, filters, indexes ) :
+        self._primed = ( store, store.version, dict( filters ), indexes )
+        self.invalidate( 'filter' )
+
+    """
+    True if the stage will be recomputed by the next run.
+    """
+    def is_dirty( self, stage ) :
+        return stage in self._dirty
+
+    """
+    Recomputes the invalidated stages.
+
+    source
+        Callable returning the data store.
+
+    render
+        Callable receiving the ordered row indexes.
+    """
+    def run( self, source, render ) :
+        self.prepare( source )
+        self.render( render )
+
+    """
+    Source, filter and sort stages.
+    Can run on a background thread, as long as runs don't overlap.
+    """
+    def prepare( self, source ) :
+        self.timings = {}
+        self._run_stage( 'source', self._source, source )
+        self._run_stage( 'filter', self._filter )
+        self._run_stage( 'sort',   self._sort )
+
+    """
+    Render stage.
+    """
+    def render( self, render ) :
+        self._run_stage( 'render', render, self.ordered )
+
+    """
+    Stages are marked clean before running, 
+    so invalidations happening meanwhile are not lost.
+    """
+    def _run_stage( self, stage, function, *args ) :
+        if stage in self._dirty :
+            self._dirty.discard( stage )
+            start = default_timer()
+            try :
+                function( *args )
+            except Exception :
+                self._dirty.add( stage )
+                raise
+            self.timings[stage] = default_timer() - start
+            if self.instrument is not None :
+                self.instrument.timing( stage, self.timings[stage] )
+
+    def _source( self, source ) :
+        self.store = source()
+
+    def _filter( self ) :
+        primed, self._primed = self._primed, None
+        if primed is not None :
+            store, version, filters, indexes = primed
+            if store is self.store and version == store.version and filters == dict( self.filters ) :
+                self.filtered = indexes
+                return
+        stats = {} if self.instrument is not None else None
+        self.filtered = filter_indexes( self.store, self.filters, use_index=self.use_index, stats=stats, parallel=self.parallel )
+        if stats :
+            self.instrument.count( 'filter_calls', stats['filter_calls'] )
+
+    """
+    The whole store is sorted once per sort rules.
+    The sorted view is then built by picking filtered rows in that order.
+
+    With lazy_sort, big views not yet sorted are ordered as they're read
+    instead, see sorting.LazyOrder : the first rows shown don't wait for the others.
+    """
+    def _sort( self ) :
+
+        if len( self.sorting ) == 0 :
+            self.ordered = self.filtered
+            return
+
+        if self.lazy_sort and self._sorted_all is None and len( self.filtered ) >= LAZY_MIN_ROWS :
+            self.ordered = LazyOrder( self.filtered, self.store.sort_keys( self.sorting ) )
+            return
+
+        n = len( self.store )
+        if self._sorted_all is None :
+            self._sorted_all = sort_indexes( self.store, range( n ), self.sorting )
+
+        if len( self.filtered ) == n :
+            self.ordered = list( self._sorted_all )
+        else :
+            accepted = bytearray( n )
+            for i in self.filtered : accepted[i] = 1
+            self.ordered = [ i for i in self._sorted_all if accepted[i] ]
+
+
+# Garbage used here and there
+
+def _identity( i ) :
+    return i
+
+"""
+Inserts the items of b into a, both sorted by key.
+Items of b are placed with a binary search, so key is called O( len(b) log len(a) ) times.
+"""
+def _merge( a, b, key ) :
+
+    if len( b ) == 0 :
+        return a
+
+    result, start = [], 0
+    for item in b :
+        k, lo, hi = key( item ), start, len( a )
+        while lo < hi :
+            mid = ( lo + hi ) // 2
+            if key( a[mid] ) < k :
+                lo = mid + 1
+            else :
+                hi = mid
+        result.extend( a[start:lo] )
+        result.append( item )
+        start = lo
+
+    result.extend( a[start:] )
+    return result
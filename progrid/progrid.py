@@ -1,42 +1,87 @@
 # -*- coding: utf-8 -*-
 __all__ = [ 'ProGrid', 'ProGridCustomizator', 'ProGridSearchPopup' ]
 
+import importlib
 import json
-import pdb
 import sys
 
 from functools import partial
-from kivy.adapters.dictadapter import DictAdapter
-from kivy.adapters.listadapter import ListAdapter
+from types import ModuleType
 from kivy.clock import Clock
-from kivy.graphics import Color, Rectangle
+from kivy.factory import Factory
+from kivy.graphics import Color, Line, Rectangle
 from kivy.lang import Builder
 from kivy.metrics import dp, sp
 from kivy.properties import *
-from kivy.uix.button import Button
 from kivy.uix.checkbox import CheckBox
 from kivy.uix.label import Label
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.gridlayout import GridLayout
-from kivy.uix.floatlayout import FloatLayout
-from kivy.uix.listview import ListItemButton, ListView
-from kivy.uix.selectableview import SelectableView
-from kivy.uix.scrollview import ScrollView
-from kivy.uix.stacklayout import StackLayout
-from kivy.uix.textinput import TextInput
-
-from material_ui.flatui.flatui import FlatButton, FlatTextInput, FloatingAction
+from kivy.uix.relativelayout import RelativeLayout
+from kivy.uix.widget import Widget
+
 from material_ui.flatui.labels import BindedLabel, ResizeableLabel
 from material_ui.flatui.layouts import ColorBoxLayout
-from material_ui.flatui.popups import AlertPopup, AskTextPopup, FlatPopup
 
-#KV Lang files
-from pkg_resources import resource_filename
-path = resource_filename( __name__, 'progrid.kv' )
-Builder.load_file( path )
+from .columnar import RowStore, RowsView
+from .filters import compile_filter
+from .grouping import Group, GroupIndex
+from .instrument import NO_STAGE
+from .layout import ColumnLayout
+from .measure import TextMeasurer, stratified_sample
+from .pipeline import ViewPipeline
+from .texcache import TextureCache
+
+"""
+Loads the KV Lang rules of the grid, once, before the first grid is built.
+Importing the module does not read any file.
+"""
+_kv_loaded = False
 
-#Icons
-icon_settings_32 = resource_filename( __name__, 'images/settings-32.png' )
+def load_kv() :
+    global _kv_loaded
+    if not _kv_loaded :
+        from pkg_resources import resource_filename
+        Builder.load_file( resource_filename( __name__, 'progrid.kv' ) )
+        _kv_loaded = True
+
+"""
+The customizator and the search popup live in their own modules, with the
+material_ui popups they need : their classes are imported the first time
+they're asked from this module, or used by KV Lang rules through the Factory.
+"""
+_LAZY = {
+    'ProGridCustomizator' : 'customizator',
+    'ProGridSearchPopup'  : 'search',
+}
+
+_PACKAGE = __name__.rpartition( '.' )[0]
+
+for _name in _LAZY.keys() :
+    Factory.register( _name, module='%s.%s' % ( _PACKAGE, _LAZY[_name] ) )
+
+"""
+This module, importing the classes of _LAZY when they're asked for.
+Python 2 modules can't change class : a stand-in takes the place of the
+module in sys.modules, reading other names from it.
+"""
+class _LazyModule( ModuleType ) :
+
+    def __getattr__( self, name ) :
+        if name in _LAZY :
+            value = getattr( importlib.import_module( '%s.%s' % ( _PACKAGE, _LAZY[name] ) ), name )
+            setattr( self, name, value )
+            return value
+        if '_module' in self.__dict__ :
+            return getattr( self.__dict__['_module'], name )
+        raise AttributeError( 'module %r has no attribute %r' % ( self.__name__, name ) )
+
+try :
+    sys.modules[__name__].__class__ = _LazyModule
+except TypeError :
+    _lazy = _LazyModule( __name__ )
+    _lazy._module = sys.modules[__name__]
+    sys.modules[__name__] = _lazy
 
 """
 Inspired by DevExpress CxGrid...
@@ -45,6 +90,8 @@ Inspired by DevExpress CxGrid...
 
     - Rows filtering
     - Rows sorting
+    - Rows grouping, with aggregates
+    - Columns fitting their content
     - Columns filtering 
     - Columns sorting
     - Allows end-user to customize the view    
@@ -53,14 +100,10 @@ Inspired by DevExpress CxGrid...
 
     - Allow end-user to sort rows
     - Allow end-user to sort columns
-    - Rows grouping
 
 -- Issues --
 
     - Still damn slow
-    - Rows grouping not yet implemented
-    - Not saving user configuration
-    - Columns all have the same width by default
 
 """
 class ProGrid( BoxLayout ) :
@@ -70,6 +113,33 @@ class ProGrid( BoxLayout ) :
     """
     data = ListProperty( [] )
 
+    """
+    Column oriented data, see columnar.ColumnStore.
+    If set, it's used instead of data.
+    Filtering and sorting never copy rows, so this saves a lot of memory on big feeds.
+    """
+    store = ObjectProperty( None )
+
+    """
+    Data source read lazily while scrolling, see sources.DataSource.
+    If set, it's used instead of data and store, and the grid is virtualized.
+    Sources able to filter and sort by themselves are asked to, 
+    so rows are never all loaded in memory.
+    """
+    source = ObjectProperty( None )
+
+    """
+    Rows fetched at once from source.
+    """
+    page_size = NumericProperty( 200 )
+
+    """
+    How each filter of row_filters has been applied by the last render :
+    'source' if the data source did it ( like SQLiteSource, with SQL ),
+    'python' if the grid did it.
+    """
+    filter_paths = DictProperty( {} )
+
     """
     Label for any column.
     """
@@ -101,8 +171,8 @@ class ProGrid( BoxLayout ) :
     records_readonly = BooleanProperty( True )
 
     """
-    List of sort rules to use.
-    Only one rule is accepted in the current implementation.
+    List of sort rules to use, each one 'asc' or 'desc'.
+    Rows equal for the first rule are sorted by the second one, and so on.
 
     Example :
 
@@ -113,11 +183,39 @@ class ProGrid( BoxLayout ) :
     Rossi   Mario       01/04/2014
     """
     row_sorting = ListProperty( [] )
+
+    """
+    Columns rows are grouped by, each one is a level of groups.
+    Groups are shown as headers, tap one to collapse or expand it.
+    Rows are sorted by these columns first, following row_sorting if it includes them.
+
+    Example :
+
+    [ 'surname', 'name' ]
+    """
+    row_grouping = ListProperty( [] )
+
+    """
+    Aggregates shown in group headers, by column, see grouping.AGGREGATES.
+    Rows count is always shown.
+
+    Example :
+
+    { 'age':['min','max','avg'], 'salary':['sum'] }
+    """
+    group_aggregates = DictProperty( {} )
+
+    """
+    Keys of the collapsed groups, see grouping.Group.
+    Rows of collapsed groups are not built at all.
+    """
+    collapsed_groups = ListProperty( [] )
     
     """
     There still are performance issues...
     If you feed more than this amount of rows, a TooMuchDataException will be thrown.
     If you need to bypass this limit, just update this value.
+    The limit is not checked if the grid is virtualized or reads from a source.
     Default is 2000.
     """
     data_len_limit = NumericProperty( 1000 )
@@ -129,10 +227,48 @@ class ProGrid( BoxLayout ) :
     col_sizes = DictProperty( {} ) 
 
     """
-    Use this to force cast on every column.
+    If enabled, col_sizes is computed at every render from the width of
+    headers and of the texts of a sample of rows.
+    """
+    auto_size_columns = BooleanProperty( False )
+
+    """
+    Rows measured by auto_size_columns, picked evenly from the rows shown.
+    """
+    auto_size_sample = NumericProperty( 100 )
+
+    """
+    Textures of cell texts kept for reuse, 0 disables the cache.
+    When enabled, cells draw a texture rendered once per text and style
+    instead of laying out their own text : repeated values cost neither
+    text layout nor texture upload. See texcache module.
+    """
+    texture_cache_size = NumericProperty( 0 )
+
+    """
+    How content rows are drawn :
+
+      widgets  a widget per cell, three for bool cells
+      canvas   a single widget per row drawing its cells as canvas
+               instructions, with texts from the texture cache
+               ( of 1000 textures if texture_cache_size is not set )
+
+    Touches behave the same, bool cells are hit-tested by the row.
+    """
+    row_renderer = OptionProperty( 'widgets', options=['widgets','canvas'] )
+
+    """
+    Use this to force the type of some columns, others are inferred from data.
+    Values can be bool, int, float, str, date or a date format like '%d/%m/%Y'.
+    Numbers and dates are sorted as such, see coltypes module.
     """ 
     coltypes = DictProperty( {} ) 
 
+    """
+    Values looked at when inferring the type of a column.
+    """
+    type_sample_size = NumericProperty( 100 )
+
     """
     Text displayed if no data is provided.
     """ 
@@ -143,10 +279,79 @@ class ProGrid( BoxLayout ) :
     """
     force_filtering = BooleanProperty( False )
 
+    """
+    If enabled, only rows intersecting the visible area are built.
+    Rows are recycled while scrolling, so rendering cost depends on
+    the height of the grid, not on the amount of data.
+    """
+    virtualized = BooleanProperty( False )
+
+    """
+    Rows built above and below the visible area when virtualized.
+    """
+    overscan = NumericProperty( 3 )
+
+    """
+    If enabled, text filters ( like the ones set by ProGridSearchPopup ) look up 
+    an n-gram index of the column before checking values, so searching does not scan every row.
+    Indexes are built the first time a column is searched.
+    """
+    search_index = BooleanProperty( False )
+
+    """
+    If enabled, filtering and sorting run on a background thread and rows are built 
+    a batch per frame, so the app does not freeze on big feeds.
+    A render still in progress is cancelled if data changes.
+    """
+    async_render = BooleanProperty( False )
+
+    """
+    Rows built per frame by asynchronous renders.
+    """
+    render_batch_size = NumericProperty( 50 )
+
+    """
+    Progress of the current render, from 0 to 1.
+    """
+    render_progress = NumericProperty( 1 )
+
+    """
+    Seconds spent by each stage ( source, filter, sort, render ) during the last render.
+    Stages not recomputed because their inputs did not change are missing.
+    """
+    stage_timings = DictProperty( {} )
+
+    """
+    Instrument collecting stage timings and counters, see instrument.Instrument.
+    None disables instrumentation.
+    """
+    instrument = ObjectProperty( None )
+
+    """
+    If enabled, $VAL expression filters over at least parallel_min_rows rows
+    are evaluated on a pool of processes, see parallel module.
+    Filtering falls back to serial where processes are not available.
+    """
+    parallel_filtering = BooleanProperty( False )
+
+    """
+    Rows below which filtering stays serial, see parallel_filtering.
+    """
+    parallel_min_rows = NumericProperty( 20000 )
+
+    """
+    If enabled, big sorted grids order their rows as they're shown :
+    the first and last rows are picked without sorting the others,
+    which are sorted once the user scrolls to them. See sorting.LazyOrder.
+    Virtualized grids benefit, others show every row anyway.
+    """
+    lazy_sorting = BooleanProperty( True )
+
     """
     Content properties...
     """
     content           = ObjectProperty( None )
+    scroll            = ObjectProperty( None )
     selection_color   = ListProperty( [ .6, .6, 1, 1 ] )
     content_font_name = StringProperty( '' ) 
     content_font_size = NumericProperty( dp(15) )
@@ -171,6 +376,17 @@ class ProGrid( BoxLayout ) :
     footer_align  = OptionProperty( 'left', options=['left','center','right'] ) 
     footer_background_color = ListProperty( [ .93, .93, .93, 1 ] )
 
+    """
+    Summaries shown in the footer, by column, see aggregates.SUMMARIES.
+    They are computed on the rows accepted by filters.
+    If empty, footer_text is shown instead.
+
+    Example :
+
+    { 'age':['min','max','mean'], 'name':['distinct'] }
+    """
+    footer_aggregates = DictProperty( {} )
+
     """
     Footer label properties
     """ 
@@ -199,7 +415,8 @@ class ProGrid( BoxLayout ) :
     """
     Private stuffs...
     """
-    _data         = ListProperty( [] )
+    _data         = ObjectProperty( [] )
+    _order        = ObjectProperty( [] )
     _rows         = ListProperty( [] ) 
     _coltypes     = DictProperty( {} )
     _avoid_update = BooleanProperty( False )
@@ -207,27 +424,69 @@ class ProGrid( BoxLayout ) :
 
     def __init__( self, **kargs ) :
 
+        load_kv()
+
         if 'ini_file' in kargs.keys() :
             try :
                 f = open( kargs['ini_file'] )
                 content = '\n'.join( f.readlines() )
                 f.close()
                 json_args = _fixkeys( json.loads(content) )
+                if 'row_filters' in json_args :
+                    json_args['row_filters'] = dict( ( c, compile_filter( e ) ) for c, e in json_args['row_filters'].items() )
                 json_args.update( kargs )
                 kargs = json_args
             except : 
                 print( 'Settings file %s is invalid' % kargs['ini_file'] )
 
         super( ProGrid, self ).__init__( **kargs )
-        self.___grid = {}
+        self._columns_layout = ColumnLayout()
+        self._row_store = None
+        self._source_query = None
+        self._source_types = None
+        self._data_sync = False
+        self._sizes_sync = False
+        self._render_generation = 0
+        self._preparing = 0
+        self._pending_changes = []
+        self._pipeline = ViewPipeline()
+        self._row_pool = []
+        self._header_pool = []
+        self._visible_rows = {}
+        self._groups = None
+        self._lines = None
+        self._summaries = {}
+        self._summaries_of = None
+        self._texture_cache = None
+        self._trigger_viewport = Clock.create_trigger( self._update_viewport )
+        self._trigger_load = Clock.create_trigger( self._load_more )
+        self._trigger_columns = Clock.create_trigger( self._apply_column_layout )
 
         #Bindings...
-        self.bind( data              = self._re_render  )
-        self.bind( columns           = self._re_render )
-        self.bind( row_filters       = self._re_render )
-        self.bind( row_sorting       = self._re_render )
-        self.bind( data_len_limit    = self._re_render )
+        self.bind( data              = self._on_data )
+        self.bind( store             = partial( self._invalidate, 'source' ) )
+        self.bind( source            = self._on_source )
+        self.bind( coltypes          = partial( self._invalidate, 'source' ) )
+        self.bind( type_sample_size  = partial( self._invalidate, 'source' ) )
+        self.bind( row_filters       = partial( self._invalidate, 'filter' ) )
+        self.bind( row_sorting       = partial( self._invalidate, 'sort'   ) )
+        self.bind( row_grouping      = partial( self._invalidate, 'sort'   ) )
+        self.bind( group_aggregates  = partial( self._invalidate, 'render' ) )
+        self.bind( footer_aggregates = partial( self._invalidate, 'render' ) )
+        self.bind( auto_size_columns = partial( self._invalidate, 'render' ) )
+        self.bind( texture_cache_size = partial( self._invalidate, 'render' ) )
+        self.bind( row_renderer      = partial( self._invalidate, 'render' ) )
+        self.bind( collapsed_groups  = partial( self._invalidate, 'render' ) )
+        self.bind( columns           = partial( self._invalidate, 'render' ) )
+        self.bind( col_sizes         = self._on_col_sizes )
+        self.bind( data_len_limit    = partial( self._invalidate, 'render' ) )
+        self.bind( virtualized       = partial( self._invalidate, 'render' ) )
         self.bind( content_font_size = lambda o,v: self.setter('row_height')(o,v*2) )
+        self.scroll.bind( scroll_y   = self._trigger_viewport )
+        self.scroll.bind( height     = self._trigger_viewport )
+
+        if self.source is not None :
+            self.virtualized = True
 
         #Binding occurs after init, so we need to force first setup
         self._render( self.data )
@@ -235,6 +494,41 @@ class ProGrid( BoxLayout ) :
     def _re_render( self, *args ) :
         return None if self._avoid_update else self._render()
 
+    """
+    Called whenever data changes.
+    Rows replaced by the grid itself are already synced with the store and its caches.
+    """
+    def _on_data( self, *args ) :
+        if not self._data_sync :
+            self._invalidate( 'source' )
+
+    """
+    Called whenever col_sizes changes.
+    Sizes set by the grid itself while rendering are already applied.
+    """
+    def _on_col_sizes( self, *args ) :
+        if not self._sizes_sync :
+            self._invalidate( 'render' )
+
+    """
+    Called whenever source changes.
+    Sources are always read lazily, so virtualization is turned on.
+    """
+    def _on_source( self, *args ) :
+        self._source_types = None
+        if self.source is not None :
+            self._avoid_update = True
+            self.virtualized = True
+            self._avoid_update = False
+        self._invalidate( 'source' )
+
+    """
+    Marks a pipeline stage to be recomputed, then re-renders.
+    """
+    def _invalidate( self, stage, *args ) :
+        self._pipeline.invalidate( stage )
+        self._re_render()
+
     """
     Return a json string containing settings.
    
@@ -256,7 +550,7 @@ class ProGrid( BoxLayout ) :
             'data_len_limit',
             'text_no_data',
         ]
-        to_export = exportables
+        to_export = list( exportables )
         
         metadata = [
             'headers',
@@ -268,6 +562,8 @@ class ProGrid( BoxLayout ) :
             'row_filters',
             'row_filters_names',
             'row_sorting',
+            'row_grouping',
+            'collapsed_groups',
         ]
         
         aspect = [
@@ -298,9 +594,13 @@ class ProGrid( BoxLayout ) :
         if export_filters  : to_export += filters
         if export_aspect   : to_export += aspect
 
+        from .viewstate import filter_sources
+
         values = {}
         for key in to_export : 
             values[key] = self.__getattribute__(key)
+        if 'row_filters' in values :
+            values['row_filters'] = filter_sources( self.row_filters, self.row_filters_names )
         return json.dumps( values )
 
     """
@@ -311,43 +611,445 @@ class ProGrid( BoxLayout ) :
         f = open( path, 'w' )
         f.write( self.json_settings( **kargs ) )
         f.close() 
+
+    """
+    Returns the view settings of the grid, see viewstate.ViewState.
+    Filters set as plain functions are kept only if row_filters_names has their text.
+    """
+    def get_view_state( self ) :
+        from .viewstate import ViewState, filter_sources
+        return ViewState(
+            columns          = list( self.columns ),
+            col_order        = list( self.col_order ),
+            col_sizes        = dict( self.col_sizes ),
+            col_widths       = self._columns_layout.widths(),
+            row_sorting      = [ list( rule ) for rule in self.row_sorting ],
+            row_filters      = filter_sources( self.row_filters, self.row_filters_names ),
+            row_grouping     = list( self.row_grouping ),
+            collapsed_groups = [ tuple( key ) for key in self.collapsed_groups ],
+            scroll_y         = self.scroll.scroll_y,
+        )
+
+    """
+    Applies view settings, then renders once.
+    Filters are compiled first : if one is not valid FilterError is raised
+    and the grid is left as it was.
+    """
+    def set_view_state( self, state ) :
+
+        values  = state.values
+        filters = state.filters()
+
+        self._avoid_update = True
+        try :
+            for key in ( 'columns', 'col_order', 'col_sizes', 'row_sorting', 'row_grouping', 'collapsed_groups' ) :
+                if key in values :
+                    setattr( self, key, values[key] )
+            if 'row_filters' in values :
+                self.row_filters_names = dict( values['row_filters'] )
+                self.row_filters = filters
+            if 'col_widths' in values :
+                self._columns_layout.set_widths( values['col_widths'] )
+        finally :
+            self._avoid_update = False
+
+        self._render()
+        if 'col_widths' in values :
+            self._trigger_columns()
+        if 'scroll_y' in values :
+            self.scroll.scroll_y = values['scroll_y']
+
+    """
+    Saves view settings to the given file path, see viewstate.ViewStateStore.
+    """
+    def save_view_state( self, path ) :
+        from .viewstate import ViewStateStore
+        ViewStateStore( path ).save( self.get_view_state() )
+
+    """
+    Applies view settings saved to the given file path.
+    Returns False if there's no such file.
+    """
+    def load_view_state( self, path ) :
+        from .viewstate import ViewStateStore
+        state = ViewStateStore( path ).load()
+        if state is None :
+            return False
+        self.set_view_state( state )
+        return True
     
     """
     Will re-render the grid.
+    Only the pipeline stages whose inputs changed are recomputed.
     """
     def _render( self, *args ) :
 
-        if len( self.data ) > self.data_len_limit : 
-            self._raise_too_much_data( len( self.data ) )
+        self._render_generation += 1
+        filters, sorting = self.row_filters, self._grouped_sorting()
+
+        if self.source is not None :
+            query, filters, sorting = self.source.query( filters, sorting, self._query_types( filters, sorting ) )
+            if query is not self._source_query :
+                self._source_query = query
+                self._pipeline.invalidate( 'source' )
+
+        self.filter_paths = dict(
+            ( name, 'python' if name in filters else 'source' ) for name in self.row_filters.keys()
+        )
+        self._pipeline.filters = filters
+        self._pipeline.sorting = sorting
+        self._pipeline.use_index = self.search_index
+        self._pipeline.instrument = self.instrument
+        self._pipeline.lazy_sort = self.lazy_sorting
+        self._pipeline.parallel = None
+        if self.parallel_filtering :
+            from .parallel import ParallelFilter
+            self._pipeline.parallel = ParallelFilter( int( self.parallel_min_rows ) )
+
+        if self.async_render :
+            self.render_progress = 0
+            self._preparing += 1
+            _get_render_pool().apply_async( self._prepare_async, ( self._render_generation, ) )
+        else :
+            self._pipeline.run( source=self._setup_data, render=self._render_rows )
+            self.stage_timings = self._pipeline.timings
+
+    """
+    Types of the columns a source is asked to filter or sort, see sources.DataSource.query().
+    Inferred from the source itself, like the store would.
+    """
+    def _query_types( self, filters, sorting ) :
+        if self._source_types is None :
+            from .sources import SourceStore
+            self._source_types = SourceStore( self.source, self.page_size )
+        store = self._source_types
+        store.set_types( dict( self.coltypes ), int( self.type_sample_size ) )
+        names = set( filters.keys() ) | set( name for name, mode in sorting )
+        return dict( ( name, store.column_type( name ) ) for name in names )
+
+    """
+    Sort rules, with grouping columns first.
+    """
+    def _grouped_sorting( self ) :
+        if len( self.row_grouping ) == 0 :
+            return self.row_sorting
+        modes = dict( ( name, mode ) for name, mode in self.row_sorting )
+        first = [ [ name, modes.get( name, 'asc' ) ] for name in self.row_grouping ]
+        return first + [ rule for rule in self.row_sorting if rule[0] not in self.row_grouping ]
 
-        self._setup_data( self.data )
-        self._build_coltypes()
+    """
+    Runs on the render thread, will prepare data unless a newer render started.
+    Errors are raised again on the main thread.
+    """
+    def _prepare_async( self, generation ) :
+        error = None
+        if generation == self._render_generation :
+            try :
+                self._pipeline.prepare( source=self._setup_data )
+            except Exception as e :
+                error = e
+        Clock.schedule_once( partial( self._finish_async, generation, error ) )
+
+    """
+    Runs on the main thread once data is ready.
+    Rows changed meanwhile are applied once no preparation is left.
+    """
+    def _finish_async( self, generation, error, *args ) :
+        self._preparing -= 1
+        if error is None and generation == self._render_generation :
+            self._pipeline.render( render=self._render_rows )
+            self.stage_timings = self._pipeline.timings
+        if self._preparing == 0 :
+            pending, self._pending_changes = self._pending_changes, []
+            for change in pending :
+                change()
+        if error is not None :
+            raise error
+
+    """
+    Queues a change of rows if data is being prepared on the render thread,
+    which reads the store and fills its caches. Returns True if queued.
+    """
+    def _defer_change( self, method, *args ) :
+        if self._preparing == 0 :
+            return False
+        self._pending_changes.append( partial( method, *args ) )
+        return True
+
+    """
+    Render stage, will build header, footer and rows for the given row indexes.
+    """
+    def _render_rows( self, order ) :
+
+        store = self._pipeline.store
+
+        if len(self.col_order) == 0 :
+            self.col_order = self.columns
+
+        #Data used by customizator
+        self._all_columns = store.keys()
+
+        if len( store ) > self.data_len_limit and not self.virtualized and self.source is None : 
+            self._raise_too_much_data( len( store ) )
+
+        try :
+            self.remove_widget( self._no_data_label )
+        except : pass
+
+        if self._show_no_data() :
+            self._no_data_label = Label( text=self.text_no_data, color=self.text_color )
+            self.add_widget( self._no_data_label )
+            order = []
+
+        with self._stage( 'build_coltypes' ) :
+            self._build_coltypes()
+        self._lines = None
+        if len( self.row_grouping ) > 0 :
+            self._lines = self._group_lines( store, order )
+            order = [ None if isinstance( line, Group ) else line for line in self._lines ]
+
+        self._order = order
+        self._data  = RowsView( store, order )
         
-        for col in self.columns : 
-            self.___grid[col] = []
-            if col not in self.col_sizes.keys() : self.col_sizes[col] = 1
+        self._sizes_sync = True
+        try :
+            for col in self.columns : 
+                if col not in self.col_sizes.keys() : self.col_sizes[col] = 1
+            if self.auto_size_columns :
+                self._fit_columns( store, order )
+        finally :
+            self._sizes_sync = False
+        self._columns_layout.set_columns( self.columns, self.col_sizes )
 
         #Header & footer
-        self._gen_header()
-        self._gen_footer()
+        with self._stage( 'gen_header' ) :
+            self._gen_header()
+        with self._stage( 'gen_footer' ) :
+            self._gen_footer()
 
         #Content
+        self._setup_content()
+        self._count_tree( 'widgets_destroyed', self.content.children )
         self.content.clear_widgets()
         self.content.height = 0
         self._rows = []
 
-        for n, line in enumerate( self._data ) :            
-            row = self._gen_row( line, n )
-            self._rows.append( row )
-            self.content.add_widget( row )
-            self.content.height += row.height
-        
+        if self.virtualized :
+            self._render_virtual()
+        elif self.async_render :
+            self._gen_rows_batch( self._render_generation, 0 )
+        else :
+            with self._stage( 'gen_rows' ) :
+                for n in range( len( self._data ) ) :            
+                    self._add_row( n )
+
+    """
+    Returns a context manager timing the block as the given stage, if instrumented.
+    """
+    def _stage( self, name ) :
+        return self.instrument.stage( name ) if self.instrument is not None else NO_STAGE
+
+    """
+    Adds n to the given counter, if instrumented.
+    """
+    def _count( self, counter, n=1 ) :
+        if self.instrument is not None :
+            self.instrument.count( counter, n )
+
+    """
+    Adds the widgets of the given trees to the given counter, if instrumented.
+    """
+    def _count_tree( self, counter, widgets ) :
+        if self.instrument is not None :
+            self.instrument.count( counter, sum( _widgets_in( w ) for w in widgets ) )
+
+    """
+    Returns the lines of a grouped grid : groups and row indexes, see grouping.GroupIndex.lines().
+    The group index is built again only if rows changed without being patched.
+    """
+    def _group_lines( self, store, order ) :
+        rows = self._pipeline.filtered
+        aggregated = sorted( self.group_aggregates.keys() )
+        if self._groups is None or not self._groups.is_current( store, rows, self.row_grouping, aggregated ) :
+            self._groups = GroupIndex( store, rows, self.row_grouping, aggregated )
+        return self._groups.lines( order, set( tuple( key ) for key in self.collapsed_groups ) )
+
+    """
+    Will collapse the group with the given key, or expand it if collapsed.
+    """
+    def toggle_group( self, key ) :
+        key = tuple( key )
+        collapsed = [ tuple( k ) for k in self.collapsed_groups ]
+        if key in collapsed :
+            collapsed.remove( key )
+        else :
+            collapsed.append( key )
+        self.collapsed_groups = collapsed
+
+    """
+    Will collapse every group of the first level.
+    """
+    def collapse_all( self ) :
+        if self._groups is not None :
+            self.collapsed_groups = [ g.key for g in self._groups.groups.values() if g.level == 0 ]
+
+    """
+    Will expand every group.
+    """
+    def expand_all( self ) :
+        self.collapsed_groups = []
+
+    """
+    Will build and add a single line to the content.
+    """
+    def _add_row( self, n ) :
+        row = self._gen_line( n )
+        self._rows.append( row )
+        self.content.add_widget( row )
+        self.content.height += row.height
+
+    """
+    Will build a batch of rows, then schedule the next one on the next frame.
+    Stops if a newer render started.
+    """
+    def _gen_rows_batch( self, generation, start, *args ) :
+
+        if generation != self._render_generation :
+            return
+
+        stop = min( len( self._data ), start + max( 1, int( self.render_batch_size ) ) )
+        with self._stage( 'gen_rows' ) :
+            for n in range( start, stop ) :
+                self._add_row( n )
+
+        if stop < len( self._data ) :
+            self.render_progress = float( stop ) / len( self._data )
+            Clock.schedule_once( partial( self._gen_rows_batch, generation, stop ) )
+        else :
+            self.render_progress = 1
+
+    """
+    Will put the right content layout inside the scroll view.
+    Virtualized grids need rows placed by hand, others use a GridLayout.
+    """
+    def _setup_content( self ) :
+        if isinstance( self.content, VirtualContent ) == self.virtualized : 
+            return
+        self.scroll.clear_widgets()
+        if self.virtualized :
+            self.content = VirtualContent( size_hint=(1,None) )
+        else :
+            self.content = GridLayout( cols=1, size_hint=(1,None), spacing=dp(1) )
+        self.scroll.add_widget( self.content )
+
+    """
+    Will size the content for every row, then build the visible ones.
+    """
+    def _render_virtual( self ) :
+        self.render_progress = 1
+        self._count_tree( 'widgets_destroyed', self._row_pool + self._header_pool )
+        self._row_pool = []
+        self._header_pool = []
+        self._visible_rows = {}
+        n = len( self._data )
+        self.content.height = max( 0, n*self.row_height + (n-1)*self.content.spacing )
+        self._update_viewport()
+
+    """
+    Will build, recycle or drop rows so that only the ones intersecting
+    the visible area (plus overscan) are part of the content.
+    """
+    def _update_viewport( self, *args ) :
+        if not self.virtualized or not isinstance( self.content, VirtualContent ) : 
+            return self._layout_shown_rows()
+
+        first, last = self._visible_range()
+
+        with self._stage( 'gen_rows' ) :
+            for n in list( self._visible_rows.keys() ) :
+                if n < first or n > last :
+                    row = self._visible_rows.pop( n )
+                    self.content.remove_widget( row )
+                    pool = self._header_pool if isinstance( row, GroupHeader ) else self._row_pool
+                    pool.append( row )
+
+            for n in range( first, last+1 ) :
+                if n not in self._visible_rows :
+                    row = self._gen_line( n, recycle=True )
+                    row.y = self._row_y( n )
+                    self.content.add_widget( row )
+                    self._visible_rows[n] = row
+
+        self._layout_shown_rows()
+        if last == len( self._data ) - 1 and self._can_load_more() :
+            self._trigger_load()
+
+    """
+    Sources still growing are asked for more rows when the last one is shown.
+    """
+    def _can_load_more( self ) :
+        return self.source is not None and self._pipeline.is_clean() and self.render_progress == 1 \
+            and self._pipeline.store is self.get_store() and self.get_store().can_load_more()
+
+    """
+    Will read the next page of source.
+    The scroll position is kept, so the user is not moved to the end again.
+    """
+    def _load_more( self, *args ) :
+
+        if not self._can_load_more() :
+            return
+
+        store  = self.get_store()
+        first  = len( store )
+        hidden = max( 0, self.content.height - self.scroll.height )
+        top    = ( 1 - self.scroll.scroll_y ) * hidden
+
+        with store.lock :
+            count = store.load_more( int( self.page_size ) )
+        if count == 0 :
+            return
+        self._patch_rows( set( range( first, len( store ) ) ) )
+
+        hidden = max( 0, self.content.height - self.scroll.height )
+        if hidden > 0 :
+            self.scroll.scroll_y = 1 - min( 1, top / hidden )
+
+    """
+    Returns first and last index of the rows to be shown.
+    """
+    def _visible_range( self ) :
+        spacing  = self.content.spacing
+        spacing  = spacing[-1] if isinstance( spacing, list ) else spacing
+        stride   = self.row_height + spacing
+        viewport = self.scroll.height
+        hidden   = max( 0, self.content.height - viewport )
+        top      = ( 1 - self.scroll.scroll_y ) * hidden
+        first    = int( top // stride ) - int( self.overscan )
+        last     = int( (top+viewport) // stride ) + int( self.overscan )
+        return max( 0, first ), min( len(self._data)-1, last )
+
+    """
+    Returns the y of the given row, relative to the content.
+    """
+    def _row_y( self, n ) :
+        return self.content.height - (n+1)*self.row_height - n*self.content.spacing
+
+    """
+    Sets row_filters, with the rows they match already computed.
+    Used when filtering is done elsewhere, like in a background thread.
+    Rows are ignored if the store changed meanwhile.
+    """
+    def set_filtered_rows( self, filters, store, indexes ) :
+        self._pipeline.prime_filter( store, filters, indexes )
+        self.row_filters = filters
+
     """
     Called whenever a row is selected.
     """
     def on_row_select( self, gridrow ) :
         if self.on_select : 
-            datarow = self._data[gridrow]['_progrid_order']
+            datarow = self._order[gridrow]
             self.on_select( gridrow, datarow, self._data[gridrow] )
         
     """
@@ -355,7 +1057,7 @@ class ProGrid( BoxLayout ) :
     """
     def on_row_double_tap( self, gridrow ) :
         if self.on_double_tap : 
-            datarow = self._data[gridrow]['_progrid_order']
+            datarow = self._order[gridrow]
             self.on_double_tap( gridrow, datarow, self._data[gridrow] )
         
     """
@@ -363,14 +1065,16 @@ class ProGrid( BoxLayout ) :
     """
     def on_row_long_press( self, gridrow ) :
         if self.on_long_press : 
-            datarow = self._data[gridrow]['_progrid_order']
+            datarow = self._order[gridrow]
             self.on_long_press( gridrow, datarow, self._data[gridrow] )
 
     """
     Will add columns names to header.
     """
     def _gen_header( self ) :
+        self._count_tree( 'widgets_destroyed', self.header.children )
         self.header.clear_widgets()
+        self.header.cells = []
         args = self._build_header_args()
         first_col = True
 
@@ -384,13 +1088,22 @@ class ProGrid( BoxLayout ) :
             first_col = False
 
             self.header.add_widget( lbl )
-            self.___grid[column].append( lbl )
+            self.header.cells.append( lbl )
+
+        self._count_tree( 'widgets_created', self.header.children )
 
     """
     Will prepare footer layout.
     This view will allow to quickly remove filters.
     """
     def _gen_footer( self ) :
+        self._count_tree( 'widgets_destroyed', self.footer.children )
+        self.footer.clear_widgets()
+        self.footer.cells = []
+        if len( self.footer_aggregates ) > 0 :
+            self._gen_summary_footer()
+            return self._count_tree( 'widgets_created', self.footer.children )
+
         lbl = BindedLabel(
             text      = self.footer_text,
             halign    = self.footer_text_halign,
@@ -400,78 +1113,235 @@ class ProGrid( BoxLayout ) :
         if self.footer_text_font_name and self._show_no_data() : 
             lbl.font_name = self.footer_text_font_name
             self.footer.add_widget( lbl )
+        self._count_tree( 'widgets_created', self.footer.children )
+
+    """
+    Will show the summaries of footer_aggregates, a label per column 
+    aligned with headers.
+    """
+    def _gen_summary_footer( self ) :
+
+        store = self._pipeline.store
+        first_col = True
+
+        for column in self.columns :
+
+            names = self.footer_aggregates.get( column, [] )
+            parts = []
+            for name, value in zip( names, self._column_summary( column, names ) ) :
+                if value is not None and name not in ( 'count', 'distinct' ) :
+                    value = store.display( column, round( value, 2 ) if name == 'mean' else value )
+                parts.append( u'%s %s' % ( name, value if value is not None else u'-' ) )
+
+            text = u'  '.join( parts )
+            text = u' '+text if first_col else text
+            first_col = False
+
+            lbl = BindedLabel(
+                size_hint = ( self.col_sizes[column], 1 ),
+                text      = text.encode( 'utf-8' ),
+                halign    = self.footer_align,
+                color     = self.footer_text_color,
+                font_size = self.footer_text_font_size,
+            )
+            self.footer.add_widget( lbl )
+            self.footer.cells.append( lbl )
+
+    """
+    Returns the values of the given summaries of a column, see aggregates.summarize().
+    Summaries are cached until the store or the rows accepted by filters change.
+    """
+    def _column_summary( self, column, names ) :
+
+        store = self._pipeline.store
+        rows  = [] if self._show_no_data() else self._pipeline.filtered
+        current = self._summaries_of
+        if current is None or current[0] is not store or current[1] != store.version or current[2] is not rows :
+            self._summaries = {}
+            self._summaries_of = ( store, store.version, rows )
+
+        key = ( column, tuple( names ) )
+        if key not in self._summaries :
+            from .aggregates import summarize
+            summary = summarize( store.typed( column ), rows, names )
+            self._summaries[key] = [ summary[name] for name in names ]
+        return self._summaries[key]
+
+    """
+    Will generate the widget of line n : a group header or a row.
+    Recycled widgets are used if asked.
+    """
+    def _gen_line( self, n, recycle=False ) :
+        group = self._lines[n] if self._lines is not None else None
+        if isinstance( group, Group ) :
+            if recycle and self._header_pool :
+                header = self._header_pool.pop()
+                self._count( 'rows_recycled' )
+            else :
+                header = self._build_group_header()
+            self._fill_group_header( header, group )
+            return header
+        if recycle and self._row_pool :
+            row = self._row_pool.pop()
+            self._count( 'rows_recycled' )
+            self._fill_row( row, self._data[n], n )
+            return row
+        return self._gen_row( self._data[n], n )
+
+    """
+    Will build an empty group header.
+    """
+    def _build_group_header( self ) :
+        args = self._build_row_args()
+        args.pop( 'fill_color', None )
+        args['halign'] = 'left'
+        h = GroupHeader( 
+            height           = self.row_height,
+            size_hint_y      = None if self.virtualized else 1,
+            grid             = self,
+            background_color = self.header_background_color,
+        )
+        h.label = BindedLabel( **args )
+        h.add_widget( h.label )
+        self._count_tree( 'widgets_created', [ h ] )
+        return h
+
+    """
+    Will show a group in a header built by _build_group_header().
+    """
+    def _fill_group_header( self, header, group ) :
+
+        store  = self._pipeline.store
+        name   = self.headers.get( group.column, group.column )
+        marker = u'+' if group.key in set( tuple( k ) for k in self.collapsed_groups ) else u'-'
+        text   = u'%s  %s: %s  ( %d )' % ( marker, name, group.label, len( group ) )
+
+        for column in sorted( self.group_aggregates.keys() ) :
+            for aggregate in self.group_aggregates[column] :
+                value = self._groups.aggregate( group, column, aggregate )
+                if aggregate != 'count' and value is not None :
+                    value = store.display( column, value )
+                text += u'    %s %s: %s' % ( self.headers.get( column, column ), aggregate, value )
+
+        header.group = group
+        header.padding = [ self.padding_h + dp(20) * group.level, self.padding_v ]
+        header.label.text = text.encode( 'utf-8' )
 
     """
     Will generate a single row.
     """
     def _gen_row( self, line, n ) :
+        b = self._build_row()
+        self._fill_row( b, line, n )
+        return b
+
+    """
+    Will build an empty row, with a cell widget for each column.
+    """
+    def _build_row( self ) :
+
+        if self.row_renderer == 'canvas' :
+            b = CanvasRow(
+                height           = self.row_height, 
+                size_hint_y      = None if self.virtualized else 1,
+                grid             = self, 
+                padding          = [self.padding_h, self.padding_v],
+                background_color = self.content_background_color,
+                cache            = self._get_texture_cache(),
+                checks           = [ self._coltypes[c].kind is bool for c in self.columns ],
+                **self._build_row_args()
+            )
+            self._count_tree( 'widgets_created', [ b ] )
+            return b
 
         b = RowLayout( 
             height           = self.row_height, 
+            size_hint_y      = None if self.virtualized else 1,
             orientation      = 'horizontal', 
-            rowid            = n, 
             grid             = self, 
             padding          = [self.padding_h, self.padding_v],
             background_color = self.content_background_color,
         )
+        b.cells = []
         args = self._build_row_args()
+        cache = self._get_texture_cache()
         
-        first_col = True
         for column in self.columns :
 
-            val = self._coltypes[column]( 
-                line[column] if column in line.keys() else '' 
-            )
-
-            if self._coltypes[column] == bool :
+            if self._coltypes[column].kind is bool :
                 w = BoxLayout()
-                c = CheckBox( active=val, size_hint=(None,1), width=sp(32), **args )
+                w.checkbox = CheckBox( size_hint=(None,1), width=sp(32), **args )
                 s = BoxLayout( size_hint=(self.col_sizes[column],1), **args )
-                w.add_widget( c )
+                w.add_widget( w.checkbox )
                 w.add_widget( s )
+            elif cache is not None :
+                w = CachedLabel( size_hint=(self.col_sizes[column],1), cache=cache, **args )
             else : 
-                text = val if val not in ['None', u'None'] else u''
-                text = text.encode( 'utf-8' )
-                w = BindedLabel( text=text, size_hint=(self.col_sizes[column],1), **args )
+                w = BindedLabel( size_hint=(self.col_sizes[column],1), **args )
 
             b.add_widget( w )
-            first_col = False
-            self.___grid[column].append( w )
+            b.cells.append( w )
 
+        self._count_tree( 'widgets_created', [ b ] )
         return b
 
     """
-    Will filter and order data rows.
+    Will show the given data line in a row built by _build_row().
+    Rows are refilled this way when recycled.
     """
-    def _setup_data( self, data ) :
-        
-        if len(self.col_order) == 0 :
-            self.col_order = self.columns
-
-        for i in range( len(self.data) ) :
-            self.data[i]['_progrid_order'] = i
+    def _fill_row( self, row, line, n ) :
 
-        self._data = []
+        row.rowid = n
+        store = self._data.store
 
-        try :
-            self.remove_widget( self._no_data_label )
-        except : pass
+        if isinstance( row, CanvasRow ) :
+            values = []
+            for column in self.columns :
+                val = line[column] if column in line.keys() else None
+                if self._coltypes[column].kind is bool :
+                    values.append( self._coltypes[column].convert( val ) is True )
+                else :
+                    values.append( store.display( column, val ) )
+            row.values = values
+            return
 
-        if self._show_no_data() :
-            self._no_data_label = Label( text=self.text_no_data, color=self.text_color )
-            self.add_widget( self._no_data_label )
-        else :
-            #Data used by customizator
-            self._all_columns = self.data[0].keys()           
+        for column, w in zip( self.columns, row.cells ) :
 
-            #Filtering
-            self._data = filter( self._validate_line, data )
+            val = line[column] if column in line.keys() else None
 
-            #Sorting
-            if len( self.row_sorting ) > 0 :
-                field, mode = self.row_sorting[0]
-                reverse = False if mode == 'asc' else True
-                self._data = sorted( self._data, key=lambda o: o[field], reverse=reverse )
+            if self._coltypes[column].kind is bool :
+                w.checkbox.active = self._coltypes[column].convert( val ) is True
+            elif isinstance( w, CachedLabel ) :
+                w.text = store.display( column, val )
+            else : 
+                w.text = store.display( column, val ).encode( 'utf-8' )
+
+    """
+    Returns the store data is read from, see columnar.DataStore.
+    Threads reading it while the grid may change rows must hold store.lock.
+    """
+    def get_store( self ) :
+        if self.source is not None :
+            if self._row_store is None :
+                from .sources import SourceStore
+                self._row_store = SourceStore( self._source_query or self.source, self.page_size )
+            return self._row_store
+        if self.store is not None :
+            return self.store
+        if self._row_store is None :
+            self._row_store = RowStore( self.data )
+        return self._row_store
+
+    """
+    Source stage, returns the store rows will be read from.
+    Filtering and sorting are done by the pipeline, on row indexes.
+    May run on the render thread, see async_render.
+    """
+    def _setup_data( self ) :
+        self._row_store = None
+        store = self.get_store()
+        store.set_types( dict( self.coltypes ), int( self.type_sample_size ) )
+        return store
          
     """
     If true the no-data-text is shown.
@@ -479,18 +1349,9 @@ class ProGrid( BoxLayout ) :
     def _show_no_data( self ) :
         no_filters     = len(self.row_filters) == 0
         filters_not_ok = self.force_filtering and no_filters
-        no_data        = len( self.data ) == 0
+        no_data        = len( self.get_store() ) == 0
         return filters_not_ok or no_data
 
-    """
-    Will apply given filters.
-    """    
-    def _validate_line( self, line ) :
-        for k in self.row_filters.keys() :
-            if not self.row_filters[k]( line[k] ) :
-                return False
-        return True
-
     """
     Called whenever the data limit is surpassed.
     """
@@ -524,6 +1385,28 @@ Be aware of performance issues.
         grid        = {'grid'       :self}
         return self._build_dict( v_align, h_align, font_name, font_size, color, root_layout, hover_color, grid )
 
+    """
+    Returns the texture cache of content cells, None if disabled.
+    The cache is kept across renders, so are its textures.
+    """
+    def _get_texture_cache( self ) :
+        size = int( self.texture_cache_size )
+        if size <= 0 and self.row_renderer == 'canvas' :
+            size = _CANVAS_TEXTURES
+        if size <= 0 :
+            self._texture_cache = None
+        elif self._texture_cache is None or self._texture_cache.max_size != size :
+            self._texture_cache = TextureCache( size )
+        return self._texture_cache
+
+    """
+    Hits, misses and size of the texture cache, None if disabled.
+    See texture_cache_size.
+    """
+    def texture_cache_stats( self ) :
+        cache = self._get_texture_cache()
+        return cache.stats() if cache is not None else None
+
     """
     Args passed down to content labels.
     """
@@ -536,305 +1419,248 @@ Be aware of performance issues.
         b_color   = {'fill_color':self.content_background_color } if self.content_background_color else {}
         return self._build_dict( v_align, h_align, font_name, font_size, color, b_color )
 
+    """
+    Will set col_sizes to the width needed by each column : 
+    the widest of its header and of its values in a sample of the given rows.
+    """
+    def _fit_columns( self, store, order ) :
+
+        measurer = _get_measurer()
+        sample   = [ order[k] for k in stratified_sample( len( order ), int( self.auto_size_sample ) ) ]
+        sample   = [ i for i in sample if i is not None ]
+        padding  = 2 * self.padding_h + dp(10)
+
+        for column in self.columns :
+            width = measurer.width( u' ' + self.headers.get( column, column ), self.header_font_name, self.header_font_size )
+            if self._coltypes[column].kind is bool :
+                width = max( width, sp(32) )
+            else :
+                for i in sample :
+                    text = store.display( column, store.value( i, column ) )
+                    width = max( width, measurer.width( text, self.content_font_name, self.content_font_size ) )
+            self.col_sizes[column] = width + padding
+
     """
     Called whenever a column is resized.
+    Only the column layout changes here, rows are laid out once per frame.
     """
     def on_column_resize( self, oldsize, newsize, column ) :
-        print( oldsize, newsize, column )
-        newwidth = newsize[0]
-        for widget in self.___grid[column] :
-            widget.width = newwidth
-            widget.size_hint[0] = None
+        self._columns_layout.resize( column, newsize[0] )
+        self._trigger_columns()
 
     """
-    Associates to each column the correct data type.
-    Uses the first row of data.
+    Will lay out header, footer and the rows being shown with the current column widths.
+    Other rows are laid out when they get shown, see _update_viewport().
     """
-    def _build_coltypes( self ) :
-    
-        columns = ( set(self.headers.keys()) - set(self.coltypes) )
-        self._coltypes = self.coltypes
+    def _apply_column_layout( self, *args ) :
+        with self._stage( 'layout' ) :
+            self.header.do_layout()
+            self.footer.do_layout()
+            self._layout_shown_rows()
 
-        if not self._show_no_data() and len(self._data) > 0 : 
-            line = self._data[0]
-        else : 
-            line = dict( [ (c,'') for c in columns ] )
+    """
+    Returns the row widgets intersecting the visible area.
+    """
+    def _shown_rows( self ) :
+        if self.virtualized :
+            return list( self._visible_rows.values() )
+        first, last = self._visible_range()
+        return self._rows[ first:last+1 ]
 
-        for column in columns :
+    """
+    Will lay out shown rows built or laid out before the last column resize.
+    """
+    def _layout_shown_rows( self ) :
+        version = self._columns_layout.version
+        for row in self._shown_rows() :
+            if getattr( row, 'layout_version', version ) != version :
+                row.do_layout()
 
-            obj = line[column] if column in line.keys() else ''
-            if isinstance( obj, bool ) : 
-                self._coltypes[column] = bool
-            else : 
-                self._coltypes[column] = str
+    """
+    Associates to each column the correct data type.
+    Types not forced by coltypes are inferred by the store, from a sample of data.
+    """
+    def _build_coltypes( self ) :
+    
+        store   = self._pipeline.store
+        columns = set( self.headers.keys() ) | set( self.columns )
+        self._coltypes = dict( ( column, store.column_type( column ) ) for column in columns )
                      
     """
     Will update a single row of the grid.
+    rowid is the index of the row in data.
     """
     def update_single_row( self, rowid, data ) :
-        if len( self._data ) > 0 :
-            self._avoid_update = True
-            self.data[rowid] = data
-            self.content.remove_widget( self._rows[rowid] )
-            self._rows[rowid] = self._gen_row( data, rowid )
-            self.content.add_widget( self._rows[rowid], len(self.content.children) )
-            self._avoid_update = False
+        self.update_rows( { rowid: data } )
 
-
-"""
-Put this on your form to allow the user customize the ProGrid.
-
-Currently, three kind of filters are supported :
-
-  1) Simple text filter : 'ar' will match 'aron' and 'mario'.
-
-  2) Expressions starting with Python comparison operators.
-  Those are checked and evalued using eval.
-  For example, '> 14' or '== 0'
-
-  3) Expressions containing '$VAL'.
-  Those are checked and evalued using eval.
-  For example, '$VAL.startswith( "M" )'.
-"""
-class ProGridCustomizator( FloatingAction ) :
-    
     """
-    String properties to be translated eventually.
-    """       
-    popup_title = StringProperty( 'Customize your grid' )     
-    hint_filter = StringProperty( 'No filter' )
-    cannot_use_expression_for_field = StringProperty( """
-Cannot use filter for field %s.
-Press on '?' for more information.
-""" )
-    filters_help = StringProperty( """
-Three kind of filters are supported :
-
-  1) Simple text filter, for example, 'ar' will match 'aron' and 'mario'.
-
-  2) Expressions starting comparison operators ( <, <=, =>, >, == and != ).
-  For example, '> 14' or '== 0'.
-
-  3) Expressions containing '$VAL'.
-  For example, '$VAL == "M"'.
+    Will replace many rows at once.
+    rows is a dictionary, from the index of the row in data to the new row.
 
-Please quote ( '' ) any text in your filters.""" )
-
-    """
-    Grid reference.
+    Cells are updated in place, rows are moved only if they stopped 
+    ( or started ) matching filters or if their sort key changed.
+    While an asynchronous render prepares data, changes are applied once it's done.
     """
-    grid = ObjectProperty( None )
+    def update_rows( self, rows ) :
+        if self._defer_change( self.update_rows, dict( rows ) ) :
+            return
+        store = self.get_store()
+        self._data_sync = True
+        with store.lock :
+            for rowid in rows.keys() :
+                store.set_row( rowid, rows[rowid] )
+        self._data_sync = False
+        self._patch_rows( set( rows.keys() ) )
 
     """
-    Popup reference.
+    Will add rows at the end of data.
+    They are shown where filters and sorting place them.
     """
-    popup = ObjectProperty( None )
-
-    def __init__( self, **kargs ) :
-        if not 'grid' in kargs.keys() : raise ValueError( 'Grid not set.' )
-        super( ProGridCustomizator, self ).__init__( 
-            icon=icon_settings_32, **kargs 
-        )
-        self._help_popup = AlertPopup( text=self.filters_help )
+    def insert_rows( self, rows ) :
+        if self._defer_change( self.insert_rows, list( rows ) ) :
+            return
+        store = self.get_store()
+        first = len( store )
+        self._data_sync = True
+        with store.lock :
+            for row in rows :
+                store.append( row )
+        self._data_sync = False
+        self._patch_rows( set( range( first, len( store ) ) ) )
 
     """
-    Will exit customizer without commit changes.
+    Will delete rows, given their indexes in data.
+    Following rows shift back, like when deleting from a list.
     """
-    def exit_customizer( self, *args ) :
-        self.popup.dismiss()
+    def delete_rows( self, rowids ) :
 
-    """
-    Will save changes, reaload the grid and dismiss popup.
-    """
-    def save_and_exit( self, *args ) :
-        self._filter_error_occur = False
-        self.grid.columns = self._get_columns()
-        self.grid.row_filters, self.grid.row_filters_names = self._get_row_filters()
-        if not self._filter_error_occur : self.exit_customizer()
+        if self._defer_change( self.delete_rows, set( rowids ) ) :
+            return
 
-    """
-    Will return the filters to be applied on the grid content.
-    """
-    def _get_row_filters( self ) :
-        
-        filters = {}
-        filters_names = {}
-        comparators = '< <= => > == != and or'.split(' ')
-        startswith = lambda v: expression.startswith(v)
-
-        for column in self._columns.keys() :
- 
-            chk, lbl, fil = self._columns[ column ]
-            if len( fil.text.strip() ) > 0 :
-
-                expression = fil.text.strip()
-
-                if len( list( filter(startswith, comparators) ) ) > 0 :
-                    foo = 'lambda VAL: %s' % ( '_format_val(VAL) ' + expression )
-                elif '$VAL' in expression :                 
-                    foo = 'lambda VAL: %s' % ( expression.replace('$VAL','_format_val(VAL)') )
-                else :
-                    foo = "lambda VAL: _format_val(VAL) == _format_val('''" + expression + "''')"
+        store   = self.get_store()
+        deleted = set( rowids )
+        size    = len( store )
+        patch   = self._can_patch()
 
-                try :
-                    filters[ column ] = eval( foo )
-                    filters_names[ column ] = expression
-                except Exception as e : 
-                    AlertPopup( text=self.cannot_use_expression_for_field % ( lbl.text.lower() ) ).open()
-                    self._filter_error_occur = True
-                    print( e )
+        self._data_sync = True
+        with store.lock :
+            store.delete( deleted )
+        self._data_sync = False
 
-        return filters, filters_names
-            
+        if not patch :
+            self._pipeline.rows_changed()
+            return self._re_render()
 
-    """
-    Will return the ordered list of columns to be shown.
-    """
-    def _get_columns( self ) :
+        remap = self._pipeline.delete_rows( deleted, size )
+        if self._lines is not None :
+            return self._relayout()
 
-        columns = []
-        for column in self._columns.keys() :            
-            chk, lbl, fil = self._columns[ column ]
-            if chk.active :
-                columns.append( column )
-        return sorted( columns, key=lambda o: self.grid.col_order.index(o) )
+        widgets, spare = {}, []
+        for i, row in zip( self._order, self._rows ) :
+            if i in deleted :
+                self._remove_row( row, spare )
+            else :
+                widgets[ remap[i] ] = row
+        self._sync_rows( widgets, spare, set(), True )
 
     """
-    Show customization panel.
+    True if changes to the store can be applied to the current rows,
+    instead of rendering again.
     """
-    def customize( self ) :
-        self.popup = FlatPopup( 
-            size_hint=(.95,.7), \
-            title=self.popup_title, \
-            title_size=dp(20), \
-            title_color=[0,0,0,.8], \
-            content=self._build_content()
-        )
-        self.popup.open()
+    def _can_patch( self ) :
+        return self._pipeline.is_clean() and self.render_progress == 1 \
+            and self._pipeline.store is self.get_store() and not self._show_no_data()
 
     """
-    Will build popup content footer.
+    Will apply to the grid rows replaced or added to the store.
     """
-    def _build_footer( self ) :
-
-        footer = BoxLayout( orientation='horizontal', spacing=dp(10), size_hint=(1,None), height=dp(35) )        
-        args = { 'size_hint':(.2,1), 'color':[0,.59,.53,1], 'color_down':[0,0,0,.7] }
-        
-        txt = '[ref=main][b]       ?       [/b][/ref]'
-        lbl = Label( text=txt, markup=True, color=[0,0,0,.8], font_size=dp(18) )
-        lbl.bind( on_ref_press=self._help_popup.open )
+    def _patch_rows( self, changed ) :
 
-        cancel_button = FlatButton( markup=True, text='Cancel', **args )
-        cancel_button.bind( on_press=self.exit_customizer )
+        if not self._can_patch() :
+            self._pipeline.rows_changed()
+            return self._re_render()
 
-        ok_button = FlatButton( markup=True, text='[b]OK[/b]', **args )
-        ok_button.bind( on_press=self.save_and_exit )
+        if self._lines is not None :
+            removed, inserted = self._pipeline.update_rows( changed )
+            self._groups.update( changed, removed, inserted, self._pipeline.filtered )
+            return self._relayout()
 
-        footer.add_widget( lbl )
-        footer.add_widget( cancel_button )
-        footer.add_widget( ok_button )
-        return footer
+        widgets = dict( zip( self._order, self._rows ) )
+        removed, inserted = self._pipeline.update_rows( changed )
+        spare = []
+        for i in removed :
+            if i in widgets :
+                self._remove_row( widgets.pop( i ), spare )
+        self._sync_rows( widgets, spare, changed, len( removed ) > 0 or len( inserted ) > 0 )
 
     """
-    Will build a single popup content row.
+    Grouped grids build their lines again, groups are already up to date.
     """
-    def _build_content_row( self, column ) :
+    def _relayout( self ) :
+        self._pipeline.invalidate( 'render' )
+        self._re_render()
 
-        row = BoxLayout( orientation='horizontal', size_hint=(1,None), height=dp(30) )
-        chk = CheckBox( active=( column in self.grid.columns ) )
-
-        fil = FlatTextInput( 
-            text=self.grid.row_filters_names[column] if column in self.grid.row_filters_names.keys() else '',\
-            hint_text=self.hint_filter, multiline=False, valign='middle' 
-        )
-        lbl = Label( 
-            text=self.grid.headers[column],\
-            color=[0,0,0,.8], halign='left', valign='middle' 
-        )
-        lbl.bind( size=lbl.setter('text_size') )
-   
-        row.add_widget( chk )
-        row.add_widget( lbl )
-        row.add_widget( fil )
-        return row, chk, lbl, fil 
+    def _remove_row( self, row, spare ) :
+        self.content.remove_widget( row )
+        self.content.height -= row.height
+        spare.append( row )
 
     """
-    Will build popup content.
-    """
-    def _build_content( self ) :
+    Will match rows to the new order of the pipeline.
 
-        s = ScrollView()
-        x = BoxLayout( orientation='vertical' )#, padding=[dp(5),dp(5),dp(5),dp(10)] )
-        content = GridLayout( cols=1, size_hint=(1,None) )
-        content.height = 0
+    widgets
+        Rows still in the content, by index in data.
 
-        self._columns = {}
-        
-        for column in sorted( self.grid.headers.keys() ) :
-            
-            row, chk, lbl, fil = self._build_content_row( column ) 
-            content.add_widget( row )
-            content.height += row.height
-            self._columns[ column ] = chk, lbl, fil
-        
-        s.add_widget( content )
-        x.add_widget( s )
-        x.add_widget( self._build_footer() )
-
-        return x
+    spare
+        Rows removed from the content, they are reused for new rows.
 
-"""
-Popup you can use to filter grid records.
-"""
-class ProGridSearchPopup( AskTextPopup ) :
-
-    """
-    Pointer to the grid, mandatory.
+    changed
+        Rows to be filled again.
     """
-    grid = ObjectProperty( None )
+    def _sync_rows( self, widgets, spare, changed, reordered ) :
 
-    """
-    Columns used for matching, filter will be applied to every column!
-    Filtering is done using 'like', so be careful.
-    """
-    cols_to_filter = ListProperty( [] )
+        self._order = self._pipeline.ordered
+        self._data  = RowsView( self._pipeline.store, self._order )
+        if len( self.footer_aggregates ) > 0 :
+            self._gen_footer()
 
-    """
-    Called just before the update of grid filters.
-    """
-    on_search = ObjectProperty( None )
+        if self.virtualized :
+            return self._sync_virtual( changed, reordered )
+
+        rows = []
+        for n, i in enumerate( self._order ) :
+            row = widgets.get( i )
+            if row is None :
+                row = spare.pop() if len( spare ) > 0 else self._build_row()
+                self._fill_row( row, self._data[n], n )
+                self.content.add_widget( row, len( self.content.children ) - n )
+                self.content.height += row.height
+            elif i in changed :
+                self._fill_row( row, self._data[n], n )
+            elif row.rowid != n :
+                row.rowid = n
+            rows.append( row )
+        self._rows = rows
 
     """
-    Called just after the update of grid filters.
-    """
-    after_search = ObjectProperty( None )
-    
-    """
-    Others of less interest.
+    Virtualized grids only fill again visible rows.
     """
-    search_text = StringProperty( 'SEARCH' )
-
-    def __init__( self, **kargs ) :
-
-        kargs['ok_button_on_press'] = self.do_search
+    def _sync_virtual( self, changed, reordered ) :
 
-        if not 'grid' in kargs.keys() : raise ValueError( 'Grid not set.' )        
-        super( ProGridSearchPopup, self ).__init__( **kargs )
-        if len(self.cols_to_filter) == 0 :
-            raise ValueError( 'Need to indicate at least one column to filter' )
+        if not reordered :
+            for n in self._visible_rows.keys() :
+                if self._order[n] in changed :
+                    self._fill_row( self._visible_rows[n], self._data[n], n )
+            return
 
-    def do_search( self, *args ) :
-        if self.on_search : self.on_search()
-        v = self.input_field.text.strip().lower()
-        foo = "lambda VAL: '''%s'''.lower().strip() in _format_val(VAL)" % v
-        filters = {}
-        for column in self.cols_to_filter : filters[column] = eval(foo)
-        self.grid.row_filters = filters
-        self.do_after_search()
+        for row in self._visible_rows.values() :
+            self.content.remove_widget( row )
+            self._row_pool.append( row )
+        self._visible_rows = {}
 
-    def do_after_search( self ) :
-        if self.after_search : self.after_search()
-        self.dismiss()
+        n = len( self._order )
+        self.content.height = max( 0, n*self.row_height + (n-1)*self.content.spacing )
+        self._update_viewport()
 
 
 """
@@ -849,8 +1675,21 @@ class ColumnHeader( ResizeableLabel ) :
         self.on_new_size = self.grid.on_column_resize
 
 
+"""
+Header and footer layout, cells are placed following the grid column layout.
+"""
+class ColumnsBox( BoxLayout ) :
+
+    grid = ObjectProperty( None )
+
+    def do_layout( self, *args ) :
+        if not _layout_cells( self ) :
+            super( ColumnsBox, self ).do_layout( *args )
+
+
 """
 Row layout, with tap, double tap and long press callback.
+Cells are placed following the grid column layout.
 """
 class RowLayout( ColorBoxLayout ) :
     
@@ -859,6 +1698,10 @@ class RowLayout( ColorBoxLayout ) :
 
     def __init__( self, **kargs ) :
         super( RowLayout, self ).__init__( **kargs )
+
+    def do_layout( self, *args ) :
+        if not _layout_cells( self ) :
+            super( RowLayout, self ).do_layout( *args )
         
     def _create_clock( self, touch ) :
         Clock.schedule_once( self.on_long_press, .5 )
@@ -889,12 +1732,259 @@ class RowLayout( ColorBoxLayout ) :
         return self.grid.records_readonly
 
 
+"""
+Group header, tap it to collapse or expand the group.
+"""
+class GroupHeader( ColorBoxLayout ) :
+
+    group = ObjectProperty( None )
+    grid  = ObjectProperty( None )
+
+    def on_touch_up( self, touch ) :
+        if self.collide_point( *touch.pos ) and self.group is not None :
+            if self.grid : self.grid.toggle_group( self.group.key )
+            return True
+        return False
+
+
+"""
+Content cell drawing the texture of its text from a texture cache,
+cells showing the same text in the same style share one texture.
+Texts wider than the cell are cut.
+The texture is looked up when text or style change, moving or resizing
+the cell only places it again.
+"""
+class CachedLabel( Widget ) :
+
+    text       = StringProperty( '' )
+    cache      = ObjectProperty( None )
+    font_name  = StringProperty( '' )
+    font_size  = NumericProperty( sp(15) )
+    color      = ListProperty( [1,1,1,1] )
+    fill_color = ListProperty( [0,0,0,0] )
+    halign     = OptionProperty( 'left',   options=['left','center','right','justify'] )
+    valign     = OptionProperty( 'middle', options=['top','middle','bottom'] )
+
+    def __init__( self, **kargs ) :
+        super( CachedLabel, self ).__init__( **kargs )
+        with self.canvas.before :
+            self._fill = Color( *self.fill_color )
+            self._back = Rectangle( pos=self.pos, size=self.size )
+        with self.canvas :
+            Color( 1, 1, 1, 1 )
+            self._rect = Rectangle( size=(0,0) )
+        self._texture = None
+        self.bind( text=self._update_texture, cache=self._update_texture, font_name=self._update_texture )
+        self.bind( font_size=self._update_texture, color=self._update_texture, halign=self._update_texture )
+        self.bind( pos=self._redraw, size=self._redraw, fill_color=self._redraw, valign=self._redraw )
+        self._update_texture()
+
+    def _update_texture( self, *args ) :
+        self._texture = self.cache.get( self.text, self.font_name, self.font_size, self.color, self.halign ) if self.cache else None
+        self._redraw()
+
+    def _redraw( self, *args ) :
+        self._fill.rgba = self.fill_color
+        self._back.pos  = self.pos
+        self._back.size = self.size
+        _place_texture( self._rect, self._texture, self.pos, self.size, self.halign, self.valign )
+
+
+"""
+Row drawing its cells as canvas instructions, see ProGrid.row_renderer.
+Behaves like RowLayout without any child widget : texts are textures
+from the cache, bool cells are drawn check boxes.
+"""
+class CanvasRow( RowLayout ) :
+
+    cache      = ObjectProperty( None )
+    font_name  = StringProperty( '' )
+    font_size  = NumericProperty( sp(15) )
+    color      = ListProperty( [1,1,1,1] )
+    fill_color = ListProperty( [0,0,0,0] )
+    halign     = OptionProperty( 'left',   options=['left','center','right','justify'] )
+    valign     = OptionProperty( 'middle', options=['top','middle','bottom'] )
+
+    """
+    True for the columns shown as check boxes.
+    """
+    checks = ListProperty( [] )
+
+    """
+    Value of each cell : text, or True / False for check boxes.
+    """
+    values = ListProperty( [] )
+
+    def __init__( self, **kargs ) :
+        super( CanvasRow, self ).__init__( **kargs )
+        self._boxes = []
+        with self.canvas :
+            self._fill = Color( *self.fill_color )
+            self._backs = [ Rectangle() for c in self.checks ]
+            Color( 1, 1, 1, 1 )
+            self._texts = [ Rectangle( size=(0,0) ) for c in self.checks ]
+            self._check_color = Color( *self.color )
+            self._frames = [ Line( width=1 ) if c else None for c in self.checks ]
+            self._marks  = [ Rectangle( size=(0,0) ) if c else None for c in self.checks ]
+        self.bind( values=self._redraw )
+
+    """
+    Returns the index of the cell at window x, None if out of cells.
+    """
+    def cell_at( self, x ) :
+        for i, ( left, width ) in enumerate( self._boxes ) :
+            if left <= x < left + width :
+                return i
+        return None
+
+    def do_layout( self, *args ) :
+
+        left, top, right, bottom = self.padding
+        model = getattr( self.grid, '_columns_layout', None )
+        if model is not None and len( model.columns ) == len( self.checks ) :
+            positions = model.positions( self.width - left - right, self.spacing )
+            self.layout_version = model.version
+        else :
+            width = ( self.width - left - right ) / float( max( 1, len( self.checks ) ) )
+            positions = [ ( i * width, width ) for i in range( len( self.checks ) ) ]
+
+        self._boxes  = [ ( self.x + left + x, width ) for x, width in positions ]
+        self._bottom = self.y + bottom
+        self._height = self.height - top - bottom
+        self._redraw()
+
+    def _redraw( self, *args ) :
+
+        if len( self._boxes ) != len( self.checks ) :
+            return
+
+        self._fill.rgba = self.fill_color
+        self._check_color.rgba = self.color
+
+        for i, ( x, width ) in enumerate( self._boxes ) :
+
+            self._backs[i].pos  = ( x, self._bottom )
+            self._backs[i].size = ( width, self._height )
+            value = self.values[i] if i < len( self.values ) else None
+
+            if self.checks[i] :
+                side = min( sp(16), self._height )
+                bx   = x + ( sp(32) - side ) / 2.
+                by   = self._bottom + ( self._height - side ) / 2.
+                self._frames[i].rectangle = ( bx, by, side, side )
+                self._marks[i].pos  = ( bx + side / 4., by + side / 4. )
+                self._marks[i].size = ( side / 2., side / 2. ) if value is True else ( 0, 0 )
+            else :
+                texture = self.cache.get( value, self.font_name, self.font_size, self.color, self.halign ) if value else None
+                _place_texture( self._texts[i], texture, ( x, self._bottom ), ( width, self._height ), self.halign, self.valign )
+
+    """
+    Check boxes can be toggled if records are not read only, as in RowLayout.
+    """
+    def on_touch_down( self, touch ) :
+        result = super( CanvasRow, self ).on_touch_down( touch )
+        if self.grid.records_readonly or touch.is_double_tap or not self.collide_point( *touch.pos ) :
+            return result
+        i = self.cell_at( touch.x )
+        if i is None or not self.checks[i] or touch.x >= self._boxes[i][0] + sp(32) :
+            return result
+        values = list( self.values )
+        values[i] = values[i] is not True
+        self.values = values
+        return True
+
+
+"""
+Content of virtualized grids, rows are placed by the grid itself.
+"""
+class VirtualContent( RelativeLayout ) :
+
+    spacing = NumericProperty( dp(1) )
+
+
 # Garbage used here and there
 
 """
-Used by filters...
+Single background thread used by asynchronous renders, one data preparation at a time.
+"""
+_render_pool = None
+
+def _get_render_pool() :
+    global _render_pool
+    if _render_pool is None :
+        from multiprocessing.pool import ThreadPool
+        _render_pool = ThreadPool( 1 )
+    return _render_pool
+
+"""
+Text measurements shared by every grid, see measure.TextMeasurer.
+"""
+_measurer = None
+
+def _get_measurer() :
+    global _measurer
+    if _measurer is None :
+        _measurer = TextMeasurer()
+    return _measurer
+
+"""
+Textures cached for canvas rows if ProGrid.texture_cache_size is not set.
+"""
+_CANVAS_TEXTURES = 1000
+
+"""
+Places the cells of a row, header or footer with the widths of the grid column layout.
+Returns False if the box has no cell for every column, then it lays out by itself.
+"""
+def _layout_cells( box ) :
+
+    cells = getattr( box, 'cells', None )
+    model = getattr( box.grid, '_columns_layout', None )
+    if model is None or not cells or len( cells ) != len( model.columns ) :
+        return False
+
+    left, top, right, bottom = box.padding
+    height = box.height - top - bottom
+
+    for cell, ( x, width ) in zip( cells, model.positions( box.width - left - right, box.spacing ) ) :
+        cell.pos  = ( box.x + left + x, box.y + bottom )
+        cell.size = ( width, height )
+
+    box.layout_version = model.version
+    return True
+
+"""
+Sets a rectangle to show the texture in the given box, aligned as asked.
+Textures wider than the box are cut, None clears the rectangle.
+"""
+def _place_texture( rect, texture, pos, size, halign, valign ) :
+
+    if texture is None :
+        rect.texture = None
+        rect.size = (0,0)
+        return
+
+    w, h = texture.size
+    if w > size[0] :
+        w = max( 0, int( size[0] ) )
+        texture = texture.get_region( 0, 0, w, h )
+
+    if   halign == 'center' : x = pos[0] + ( size[0] - w ) / 2.
+    elif halign == 'right'  : x = pos[0] + size[0] - w
+    else                    : x = pos[0]
+    if   valign == 'top'    : y = pos[1] + size[1] - h
+    elif valign == 'bottom' : y = pos[1]
+    else                    : y = pos[1] + ( size[1] - h ) / 2.
+
+    rect.texture = texture
+    rect.pos  = ( int( x ), int( y ) )
+    rect.size = ( w, h )
+
+"""
+Returns the number of widgets in the tree of the given one, itself included.
 """
-def _format_val( v ) : return unicode(v).strip().lower()
+def _widgets_in( widget ) :
+    return 1 + sum( _widgets_in( child ) for child in widget.children )
 
 """
 Fixes unicode keys...
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+__all__ = [ 'ProGridSearchPopup' ]
+
+import threading
+
+from functools import partial
+from kivy.clock import Clock
+from kivy.properties import *
+
+from material_ui.flatui.popups import AskTextPopup
+
+from .columnar import filter_indexes
+from .filters import TextFilter
+
+"""
+Popup you can use to filter grid records.
+"""
+class ProGridSearchPopup( AskTextPopup ) :
+
+    """
+    Pointer to the grid, mandatory.
+    """
+    grid = ObjectProperty( None )
+
+    """
+    Columns used for matching, filter will be applied to every column!
+    Filtering is done using 'like', so be careful.
+    Enable search_index on the grid to search big grids faster.
+    """
+    cols_to_filter = ListProperty( [] )
+
+    """
+    Called just before the update of grid filters.
+    """
+    on_search = ObjectProperty( None )
+
+    """
+    Called just after the update of grid filters.
+    """
+    after_search = ObjectProperty( None )
+    
+    """
+    If enabled, the grid is filtered while the user types.
+    Rows are matched on a background thread, a new keystroke cancels the running search.
+    """
+    live_search = BooleanProperty( False )
+
+    """
+    Seconds to wait after the last keystroke before searching.
+    """
+    search_delay = NumericProperty( .3 )
+
+    """
+    Rows matched by the background thread between two checks for cancellation.
+    """
+    search_chunk_size = NumericProperty( 5000 )
+
+    """
+    Others of less interest.
+    """
+    search_text = StringProperty( 'SEARCH' )
+
+    def __init__( self, **kargs ) :
+
+        kargs['ok_button_on_press'] = self.do_search
+
+        if not 'grid' in kargs.keys() : raise ValueError( 'Grid not set.' )        
+        super( ProGridSearchPopup, self ).__init__( **kargs )
+        if len(self.cols_to_filter) == 0 :
+            raise ValueError( 'Need to indicate at least one column to filter' )
+
+        self._search_generation = 0
+        self.input_field.bind( text=self._on_search_text )
+
+    def do_search( self, *args ) :
+        self._search_generation += 1
+        if self.on_search : self.on_search()
+        self.grid.row_filters = self._build_filters()
+        self.do_after_search()
+
+    def do_after_search( self ) :
+        if self.after_search : self.after_search()
+        self.dismiss()
+
+    """
+    Will return the filters matching the typed text.
+    """
+    def _build_filters( self ) :
+        search = TextFilter( self.input_field.text )
+        filters = {}
+        for column in self.cols_to_filter : filters[column] = search
+        return filters
+
+    """
+    Debounces keystrokes, search starts once the user stops typing.
+    """
+    def _on_search_text( self, *args ) :
+        if self.live_search :
+            Clock.unschedule( self._start_live_search )
+            Clock.schedule_once( self._start_live_search, self.search_delay )
+
+    """
+    Will start matching rows on a background thread, cancelling the running search.
+    """
+    def _start_live_search( self, *args ) :
+
+        self._search_generation += 1
+
+        if len( self.input_field.text.strip() ) == 0 :
+            self.grid.row_filters = {}
+            return
+
+        args = ( self._search_generation, self._build_filters(), self.grid.get_store(), self.grid.search_index )
+        worker = threading.Thread( target=self._match_rows, args=args )
+        worker.daemon = True
+        worker.start()
+
+    """
+    Runs on the background thread.
+    Rows are matched in chunks, stopping as soon as a newer search starts.
+    Each chunk holds the store lock : rows changed by the grid meanwhile wait
+    for it, so store caches built here are never patched half way.
+    """
+    def _match_rows( self, generation, filters, store, use_index ) :
+
+        if use_index :
+            with store.lock :
+                result = filter_indexes( store, filters, use_index=True )
+        else :
+            n = len( store )
+            chunk = max( 1, int( self.search_chunk_size ) )
+            result = []
+            for start in range( 0, n, chunk ) :
+                if generation != self._search_generation : return
+                with store.lock :
+                    result += filter_indexes( store, filters, list( range( start, min( n, start+chunk ) ) ) )
+
+        if generation == self._search_generation :
+            Clock.schedule_once( partial( self._apply_live_search, generation, filters, store, result ) )
+
+    """
+    Runs on the main thread, results of stale searches are dropped.
+    """
+    def _apply_live_search( self, generation, filters, store, result, *args ) :
+        if generation == self._search_generation :
+            if self.on_search : self.on_search()
+            self.grid.set_filtered_rows( filters, store, result )
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+__all__ = [ 'LazyOrder', 'combine_ranks', 'rank_values', 'row_key', 'sort_indexes' ]
+
+import heapq
+
+from array import array
+
+"""
+Multi-key sorting of row indexes.
+
+Every column is turned once into dense ranks ( equal values, equal rank ),
+cached by the store until its data changes. Sorting by many rules then
+means combining those ranks into a single integer key per row, with
+descending rules inverted, and doing one stable sort on it.
+"""
+
+
+"""
+Returns the dense rank of each value.
+None comes first, like in Python 2 sorting.
+Values of mixed types are ordered by _safe_key(), like row_key() does.
+"""
+def rank_values( values ) :
+
+    try :
+        distinct = set( values )
+    except TypeError :
+        return _rank_unhashable( values )
+
+    try :
+        if len( set( type(v) for v in distinct ) ) > 1 :
+            raise TypeError()
+        ordered = sorted( distinct )
+    except TypeError :
+        ordered = sorted( distinct, key=_safe_key )
+
+    position = dict( ( v, r ) for r, v in enumerate( ordered ) )
+    return array( 'l', [ position[v] for v in values ] )
+
+"""
+Returns the given indexes ordered by the sort rules.
+
+Example :
+
+    sort_indexes( store, indexes, [ ['surname','asc'], ['birth','desc'] ] )
+
+Rows with equal keys keep their relative order.
+"""
+def sort_indexes( store, indexes, rules ) :
+
+    if len( rules ) == 0 :
+        return list( indexes )
+
+    return sorted( indexes, key=store.sort_keys( rules ).__getitem__ )
+
+"""
+Indexes ordered by their sort keys, ordered only as far as they're read.
+
+The first rows are picked with a partial heap selection, so showing the
+top of a big grid doesn't sort all of it. The last rows are picked the
+same way, in reverse, so jumping to the end is cheap too. Reading the
+middle ( or iterating ) sorts everything once, see complete().
+Order is the same as sort_indexes() : rows with equal keys keep their
+relative order.
+
+indexes
+    Indexes to order, ascending like the output of filter_indexes().
+
+keys
+    Sort key of every row of the store, see DataStore.sort_keys().
+
+page
+    Rows picked by the first partial selection at either end,
+    later ones pick twice as many as the previous.
+"""
+class LazyOrder( object ) :
+
+    def __init__( self, indexes, keys, page=100 ) :
+        self.page  = page
+        self._indexes = indexes
+        self._keys = keys
+        self._head = []
+        self._tail = []
+        self._full = None
+
+    """
+    True once every row is ordered.
+    """
+    def is_complete( self ) :
+        return self._full is not None
+
+    """
+    Orders every row, returns the ordered list.
+    """
+    def complete( self ) :
+        if self._full is None :
+            self._full = sorted( self._indexes, key=self._keys.__getitem__ )
+            self._head = self._tail = None
+        return self._full
+
+    def __len__( self ) :
+        return len( self._indexes )
+
+    def __iter__( self ) :
+        return iter( self.complete() )
+
+    def __getitem__( self, n ) :
+
+        if self._full is not None :
+            return self._full[n]
+        if isinstance( n, slice ) :
+            return self.complete()[n]
+
+        size = len( self._indexes )
+        if n < 0 :
+            n += size
+        if n < 0 or n >= size :
+            raise IndexError( 'LazyOrder index out of range' )
+
+        if n < len( self._head ) :
+            return self._head[n]
+        m = size - n
+        if m <= len( self._tail ) :
+            return self._tail[-m]
+
+        if n < size // 8 :
+            self._head = self._select( max( n + 1, 2 * len( self._head ), self.page ), heapq.nsmallest )
+            return self._head[n]
+        if m <= size // 8 :
+            self._tail = self._select( max( m, 2 * len( self._tail ), self.page ), heapq.nlargest )[::-1]
+            return self._tail[-m]
+        return self.complete()[n]
+
+    """
+    Picks the k first ( or last ) rows, ties broken by index like a stable sort.
+    """
+    def _select( self, k, select ) :
+        keys = self._keys
+        return select( k, self._indexes, key=lambda i: ( keys[i], i ) )
+
+
+"""
+Returns a single sort key per row, combining the ranks of every rule.
+Use DataStore.sort_keys(), which caches the result.
+"""
+def combine_ranks( store, rules ) :
+
+    keys = None
+    for name, mode in rules :
+
+        ranks = store.ranks( name )
+        size  = max( ranks ) + 1 if len( ranks ) > 0 else 1
+        if mode != 'asc' :
+            ranks = [ size - 1 - r for r in ranks ]
+
+        if keys is None :
+            keys = ranks
+        else :
+            keys = [ k * size + r for k, r in zip( keys, ranks ) ]
+
+    return keys
+
+"""
+Sort key of a single row, computed from its values instead of ranks.
+Keys of different rows compare like their ranks, ties are broken by row index.
+Used to place a few changed rows without ranking the whole store again.
+"""
+def row_key( store, i, rules ) :
+    key = []
+    for name, mode in rules :
+        k = _safe_key( store.typed_value( i, name ) )
+        key.append( k if mode == 'asc' else _Reversed( k ) )
+    key.append( i )
+    return tuple( key )
+
+
+# Garbage used here and there
+
+"""
+Inverts the order of a key, for descending rules.
+"""
+class _Reversed( object ) :
+
+    __slots__ = ( 'key', )
+
+    def __init__( self, key ) :
+        self.key = key
+
+    def __eq__( self, other ) :
+        return self.key == other.key
+
+    def __ne__( self, other ) :
+        return self.key != other.key
+
+    def __lt__( self, other ) :
+        return other.key < self.key
+
+"""
+Key used when values of different types can't be compared.
+None first, then numbers, then other values grouped by type.
+Python 2 str and unicode are the same type here, they compare as text.
+"""
+def _safe_key( v ) :
+    if v is None :
+        return ( 0, '', 0 )
+    if isinstance( v, _number_types ) :
+        return ( 1, '', v )
+    if isinstance( v, _text_types ) :
+        return ( 2, 'str', v )
+    return ( 2, type(v).__name__, v )
+
+try :
+    _number_types = ( bool, int, long, float )
+    _text_types   = ( str, unicode )
+except NameError :
+    _number_types = ( bool, int, float )
+    _text_types   = ( str, )
+
+"""
+Ranks for columns holding unhashable values, like lists.
+"""
+def _rank_unhashable( values ) :
+
+    order = sorted( range( len(values) ), key=lambda i: _safe_key( values[i] ) )
+    ranks = array( 'l', [0] * len( values ) )
+
+    rank = 0
+    for n, i in enumerate( order ) :
+        if n > 0 and values[i] != values[ order[n-1] ] :
+            rank += 1
+        ranks[i] = rank
+
+    return ranks
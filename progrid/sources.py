@@ -0,0 +1,529 @@
+# -*- coding: utf-8 -*-
+__all__ = [ 'DataSource', 'GeneratorSource', 'MemorySource', 'SQLiteSource', 'SourceStore' ]
+
+import sqlite3
+import threading
+
+from collections import OrderedDict
+from itertools import islice
+
+from .coltypes import TEXT, DateType
+from .columnar import DataStore
+
+"""
+Data sources, read lazily by ProGrid.
+
+A source tells how many rows it has and fetches them by range,
+so the grid only reads the rows being shown while the user scrolls.
+Sources able to filter and sort by themselves ( like databases ) do it
+through query(), the grid does the rest on the columns it needs.
+
+Example :
+
+    source = SQLiteSource( 'people.db', 'people' )
+    grid   = ProGrid( source=source, ... )
+"""
+
+
+"""
+Base class of data sources.
+"""
+class DataSource( object ) :
+
+    """
+    True once count() is the final number of rows.
+    Sources reading a stream grow while the user scrolls, see load_more().
+    """
+    complete = True
+
+    """
+    Number of rows.
+    """
+    def count( self ) :
+        raise NotImplementedError()
+
+    """
+    Names of the available columns.
+    """
+    def keys( self ) :
+        raise NotImplementedError()
+
+    """
+    Rows from start to stop ( excluded ), as dictionaries.
+    """
+    def fetch( self, start, stop ) :
+        raise NotImplementedError()
+
+    """
+    Values of a single column, indexed by row.
+    Used when filtering or sorting is done by the grid.
+    Reads every row, sources should do better.
+    """
+    def column( self, name ) :
+        return [ row.get( name ) for row in self.fetch( 0, self.count() ) ]
+
+    """
+    Up to n values of a column, used to infer its type.
+    Reads the first rows, sources should read them at once.
+    """
+    def sample( self, name, n ) :
+        return [ row.get( name ) for row in self.fetch( 0, min( n, self.count() ) ) ]
+
+    """
+    Asks the source to filter and sort rows by itself.
+    Returns a tuple :
+
+        ( source, filters, sorting )
+
+    where source gives the rows accepted by the filters it could apply, sorted if it could,
+    and filters and sorting are the ones left to the grid.
+    Must not read any data, rows are fetched later.
+
+    types
+        Column type of the filtered and sorted columns, see coltypes module.
+        The grid compares and sorts values converted to them, sources must
+        leave to the grid what they would do differently.
+    """
+    def query( self, filters, sorting, types=None ) :
+        return self, filters, sorting
+
+    """
+    Reads up to n more rows, for sources that are not complete yet.
+    Returns the number of rows read.
+    """
+    def load_more( self, n ) :
+        return 0
+
+    """
+    Replaces a single row.
+    Sources are read only unless they say otherwise.
+    """
+    def set_row( self, i, row ) :
+        raise NotImplementedError()
+
+    """
+    Adds a row at the end of the source.
+    """
+    def append( self, row ) :
+        raise NotImplementedError()
+
+    """
+    Removes the rows with the given indexes, following rows shift back.
+    """
+    def delete( self, indexes ) :
+        raise NotImplementedError()
+
+
+"""
+Source wrapping a list of dictionaries.
+"""
+class MemorySource( DataSource ) :
+
+    def __init__( self, rows ) :
+        self.rows = rows
+
+    def count( self ) :
+        return len( self.rows )
+
+    def keys( self ) :
+        return list( self.rows[0].keys() ) if len( self.rows ) > 0 else []
+
+    def fetch( self, start, stop ) :
+        return self.rows[start:stop]
+
+    def column( self, name ) :
+        return [ row.get( name ) for row in self.rows ]
+
+    """
+    Values are picked evenly from the whole list.
+    """
+    def sample( self, name, n ) :
+        step = max( 1, len( self.rows ) // max( 1, n ) )
+        return [ row.get( name ) for row in self.rows[::step][:n] ]
+
+    def set_row( self, i, row ) :
+        self.rows[i] = row
+
+    def append( self, row ) :
+        self.rows.append( row )
+
+    def delete( self, indexes ) :
+        deleted = set( indexes )
+        self.rows[:] = [ row for i, row in enumerate( self.rows ) if i not in deleted ]
+
+
+"""
+Source reading rows from an iterable, like a generator or a file being parsed.
+Rows are read a page at a time, when the user scrolls to the last ones.
+Filters and sorting apply to the rows read so far.
+"""
+class GeneratorSource( MemorySource ) :
+
+    """
+    iterable
+        Gives rows as dictionaries.
+
+    preload
+        Rows read at once, so the grid has something to show.
+    """
+    def __init__( self, iterable, preload=100 ) :
+        super( GeneratorSource, self ).__init__( [] )
+        self.complete = False
+        self._iterator = iter( iterable )
+        self.load_more( preload )
+
+    def load_more( self, n ) :
+        if self.complete :
+            return 0
+        rows = list( islice( self._iterator, n ) )
+        if len( rows ) < n :
+            self.complete = True
+        self.rows.extend( rows )
+        return len( rows )
+
+
+"""
+Source reading rows from a SQLite table.
+
+Nothing is loaded up front : rows are counted with count(*), then
+fetched a page at a time with LIMIT and OFFSET, so showing the first
+rows of a query reads only them. Ties of the ORDER BY are broken by row
+id, so pages and whole columns agree. Views have no row id : give a key
+column, otherwise ties are broken by every column.
+
+Sorting is done with ORDER BY, filters are translated to WHERE conditions
+( see filters.Filter.to_sql() ), so SQLite can use indexes when comparing 
+numeric columns or sorting. Filters that can't be translated are left to the grid,
+as are sorting and comparisons on columns SQLite orders unlike their type,
+like dates stored as '15/01/1999'.
+
+database
+    Path of the database file, or an open connection.
+
+table
+    Name of the table ( or view ) to read.
+
+columns
+    Columns to read, default is every column of the table.
+
+key
+    Column with a unique value per row, used instead of the row id.
+"""
+class SQLiteSource( DataSource ) :
+
+    def __init__( self, database, table, columns=None, where=None, params=(), order_by=None, key=None ) :
+
+        if isinstance( database, sqlite3.Connection ) :
+            self.connection = database
+        else :
+            self.connection = sqlite3.connect( database, check_same_thread=False )
+
+        self.table    = table
+        self.where    = where
+        self.params   = tuple( params )
+        self.order_by = order_by
+        self.key      = key
+
+        self._columns = list( columns ) if columns is not None else None
+        self._types   = None
+        self._count   = None
+        self._has_rowid = None
+        self._query   = None
+        self._lock    = threading.RLock()
+
+    def count( self ) :
+        if self._count is None :
+            sql = 'SELECT count(*) FROM %s%s' % ( _quote( self.table ), self._where_clause() )
+            self._count = self._execute( sql, self.params )[0][0]
+        return self._count
+
+    def keys( self ) :
+        if self._columns is None :
+            self._columns = [ name for name in self._get_types().keys() ]
+        return list( self._columns )
+
+    """
+    Affinity of a column : 'integer', 'text', 'blob', 'real' or 'numeric'.
+    See https://www.sqlite.org/datatype3.html
+    """
+    def affinity( self, name ) :
+        declared = self._get_types().get( name, '' ).upper()
+        if 'INT' in declared :
+            return 'integer'
+        if any( t in declared for t in ( 'CHAR', 'CLOB', 'TEXT' ) ) :
+            return 'text'
+        if 'BLOB' in declared or declared == '' :
+            return 'blob'
+        if any( t in declared for t in ( 'REAL', 'FLOA', 'DOUB' ) ) :
+            return 'real'
+        return 'numeric'
+
+    """
+    OFFSET still steps over the previous rows, in SQLite : pages far from
+    the top cost more, the store keeps the last ones read.
+    """
+    def fetch( self, start, stop ) :
+        keys = self.keys()
+        sql  = 'SELECT %s FROM %s%s%s LIMIT ? OFFSET ?' % (
+            _select( keys ), _quote( self.table ), self._where_clause(), self._order_clause()
+        )
+        return [ dict( zip( keys, line ) ) for line in self._execute( sql, self.params + ( max( 0, stop - start ), start ) ) ]
+
+    def column( self, name ) :
+        sql = 'SELECT %s FROM %s%s%s' % ( _quote( name ), _quote( self.table ), self._where_clause(), self._order_clause() )
+        return [ line[0] for line in self._execute( sql, self.params ) ]
+
+    """
+    A single query, reading the first n rows matching the query.
+    """
+    def sample( self, name, n ) :
+        sql = 'SELECT %s FROM %s%s LIMIT ?' % ( _quote( name ), _quote( self.table ), self._where_clause() )
+        return [ line[0] for line in self._execute( sql, self.params + ( n, ) ) ]
+
+    """
+    Queries are cached, asking twice for the same one gives the same source.
+    """
+    def query( self, filters, sorting, types=None ) :
+
+        keys, types = self.keys(), types or {}
+        where, params, left = [], [], {}
+        if self.where :
+            where.append( '( %s )' % self.where )
+            params.extend( self.params )
+
+        for name in filters.keys() :
+            condition = self._translate( name, filters[name], types.get( name ) ) if name in keys else None
+            if condition is None :
+                left[name] = filters[name]
+            else :
+                where.append( '( %s )' % condition[0] )
+                params.extend( condition[1] )
+
+        order_by = self.order_by
+        if len( sorting ) > 0 and all( name in keys and self._sql_ordered( name, types.get( name ) ) for name, mode in sorting ) :
+            order_by = ', '.join(
+                '%s %s' % ( _quote( name ), 'ASC' if mode == 'asc' else 'DESC' )
+                for name, mode in sorting
+            )
+            sorting = []
+
+        if len( left ) == len( filters ) and order_by == self.order_by :
+            return self, filters, sorting
+
+        return self._derive( ' AND '.join( where ), params, order_by ), left, sorting
+
+    """
+    Returns the SQL condition of a filter, None if it must be applied by the grid.
+    Text filters look at text only, comparisons need SQL to order values like their type.
+    """
+    def _translate( self, name, test, coltype ) :
+        if not hasattr( test, 'to_sql' ) :
+            return None
+        if getattr( test, 'kind', None ) != 'text' and not self._sql_ordered( name, coltype, True ) :
+            return None
+        return test.to_sql( _quote( name ), self.affinity( name ) in _NUMERIC )
+
+    """
+    True if SQLite orders the values of a column like the grid, once converted to its type.
+    Columns of unknown type are left to the grid.
+
+      - numbers, in columns storing them as numbers
+      - text, in columns storing it as text ( or any column, if only comparing normalized text )
+      - dates, if written year first
+    """
+    def _sql_ordered( self, name, coltype, comparing=False ) :
+        if coltype is None :
+            return False
+        affinity = self.affinity( name )
+        if coltype.kind in ( int, float ) :
+            return affinity in _NUMERIC
+        if coltype.kind is TEXT.kind :
+            return comparing or affinity == 'text'
+        if isinstance( coltype, DateType ) :
+            return coltype.date_format in _ISO_DATES
+        return False
+
+    """
+    Returns a source reading the same table with another query, cached.
+    """
+    def _derive( self, where, params, order_by ) :
+
+        key = ( where, tuple( params ), order_by )
+        if self._query is not None and self._query[0] == key :
+            return self._query[1]
+
+        source = SQLiteSource(
+            self.connection, self.table, self._columns, where=where, params=params, order_by=order_by, key=self.key
+        )
+        source._lock  = self._lock
+        source._types = self._types
+        source._has_rowid = self._has_rowid
+        self._query   = ( key, source )
+        return source
+
+    """
+    SQL expression identifying rows : the key column or the row id.
+    None for views and tables without row id, if no key was given.
+    """
+    def _row_id( self ) :
+        if self.key is not None :
+            return _quote( self.key )
+        if self._has_rowid is None :
+            try :
+                lines = self._execute( 'SELECT rowid FROM %s LIMIT 1' % _quote( self.table ) )
+                self._has_rowid = len( lines ) == 0 or lines[0][0] is not None
+            except sqlite3.OperationalError :
+                self._has_rowid = False
+        return 'rowid' if self._has_rowid else None
+
+    """
+    Order of the rows, the same for every statement : ties are broken by the
+    key or the row id, or by every column if there's none.
+    """
+    def _order_clause( self ) :
+        row_id = self._row_id()
+        order  = [ row_id ] if row_id is not None else [ _quote( name ) for name in self.keys() ]
+        if self.order_by :
+            order.insert( 0, self.order_by )
+        return ' ORDER BY %s' % ', '.join( order )
+
+    """
+    Declared type of every column, by name.
+    """
+    def _get_types( self ) :
+        if self._types is None :
+            info = self._execute( 'PRAGMA table_info(%s)' % _quote( self.table ) )
+            self._types = OrderedDict( ( line[1], line[2] or '' ) for line in info )
+        return self._types
+
+    def _where_clause( self ) :
+        return ' WHERE %s' % self.where if self.where else ''
+
+    """
+    Connections are shared with derived sources, and maybe with the render thread.
+    """
+    def _execute( self, sql, params=() ) :
+        with self._lock :
+            return self.connection.execute( sql, params ).fetchall()
+
+
+"""
+Store reading rows from a data source, used by ProGrid.
+Rows are fetched a page at a time and the last pages read are kept.
+Columns are read only when filtered or sorted by the grid.
+"""
+class SourceStore( DataStore ) :
+
+    """
+    source
+        See DataSource.
+
+    page_size
+        Rows fetched at once.
+
+    max_pages
+        Pages kept in memory.
+    """
+    def __init__( self, source, page_size=200, max_pages=20 ) :
+        super( SourceStore, self ).__init__()
+        self.source    = source
+        self.page_size = max( 1, int( page_size ) )
+        self.max_pages = max( 1, int( max_pages ) )
+        self._pages    = OrderedDict()
+        self._columns  = {}
+
+    def __len__( self ) :
+        return self.source.count()
+
+    def keys( self ) :
+        return self.source.keys()
+
+    def column( self, name ) :
+        if name not in self._columns :
+            self._columns[name] = self.source.column( name )
+        return self._columns[name]
+
+    """
+    Asks the source, see DataSource.sample().
+    """
+    def sample( self, name, n ) :
+        if name in self._columns :
+            return super( SourceStore, self ).sample( name, n )
+        return self.source.sample( name, n )
+
+    def row( self, i ) :
+        n = i // self.page_size
+        page = self._pages.pop( n, None )
+        if page is None :
+            start = n * self.page_size
+            page  = self.source.fetch( start, start + self.page_size )
+        self._pages[n] = page
+        if len( self._pages ) > self.max_pages :
+            self._pages.popitem( last=False )
+        return page[ i % self.page_size ]
+
+    def value( self, i, name ) :
+        if name in self._columns :
+            return self._columns[name][i]
+        return self.row( i ).get( name )
+
+    """
+    True if the source can give more rows.
+    """
+    def can_load_more( self ) :
+        return not self.source.complete
+
+    """
+    Reads up to n more rows from the source, see DataSource.load_more().
+    """
+    def load_more( self, n ) :
+        first = len( self )
+        count = self.source.load_more( n )
+        if count > 0 :
+            self._pages.pop( first // self.page_size, None )
+            for i, row in enumerate( self.source.fetch( first, first + count ) ) :
+                self._added( first + i, row )
+        return count
+
+    def set_row( self, i, row ) :
+        self.source.set_row( i, row )
+        self._pages.pop( i // self.page_size, None )
+        for name in self._columns.keys() :
+            self._columns[name][i] = row.get( name )
+        self._row_changed( i, row )
+
+    def append( self, row ) :
+        self.source.append( row )
+        self._added( len( self ) - 1, row )
+
+    def delete( self, indexes ) :
+        deleted = set( indexes )
+        self.source.delete( deleted )
+        self._pages.clear()
+        self._columns.clear()
+        self._rows_deleted( deleted )
+
+    def _added( self, i, row ) :
+        self._pages.pop( i // self.page_size, None )
+        for name in self._columns.keys() :
+            self._columns[name].append( row.get( name ) )
+        self._row_changed( i, row )
+
+
+# Garbage used here and there
+
+"""
+Affinities whose values are stored as numbers, when they look like numbers.
+"""
+_NUMERIC = ( 'integer', 'real', 'numeric' )
+
+"""
+Date formats whose text sorts like the dates.
+"""
+_ISO_DATES = ( '%Y-%m-%d', '%Y/%m/%d' )
+
+def _quote( name ) :
+    return '"%s"' % name.replace( '"', '""' )
+
+def _select( names ) :
+    return ', '.join( _quote( name ) for name in names )
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+__all__ = [ 'TextureCache' ]
+
+from collections import OrderedDict
+
+"""
+Textures of cell texts, shared by cells showing the same text.
+
+Rendering a label means laying out its text on the CPU and uploading
+a texture to the GPU. Columns like names or statuses repeat a handful of
+values over thousands of rows, so each one is rendered once and reused.
+"""
+
+
+"""
+Bounded LRU cache of text textures.
+
+max_size
+    Textures kept, the least recently used ones are dropped first.
+"""
+class TextureCache( object ) :
+
+    def __init__( self, max_size=1000 ) :
+        self.max_size = max( 1, int( max_size ) )
+        self.hits = 0
+        self.misses = 0
+        self._textures = OrderedDict()
+
+    """
+    Returns the texture of the text, rendered with the given style.
+    Returns None for empty texts.
+    An empty font name means the default font.
+    """
+    def get( self, text, font_name='', font_size=15, color=( 1, 1, 1, 1 ), halign='left' ) :
+
+        if not text :
+            return None
+
+        key = ( text, font_name, font_size, tuple( color ), halign )
+        texture = self._textures.pop( key, None )
+        if texture is not None :
+            self.hits += 1
+        else :
+            self.misses += 1
+            texture = self._render( text, font_name, font_size, color, halign )
+            while len( self._textures ) >= self.max_size :
+                self._textures.popitem( last=False )
+
+        self._textures[key] = texture
+        return texture
+
+    """
+    Hits, misses and size of the cache.
+    """
+    def stats( self ) :
+        return { 'hits':self.hits, 'misses':self.misses, 'size':len( self._textures ) }
+
+    def clear( self ) :
+        self._textures.clear()
+
+    def _render( self, text, font_name, font_size, color, halign ) :
+        from kivy.core.text import Label as CoreLabel
+        kargs = { 'text':text, 'font_size':font_size, 'color':list( color ), 'halign':halign }
+        if font_name : kargs['font_name'] = font_name
+        label = CoreLabel( **kargs )
+        label.refresh()
+        return label.texture
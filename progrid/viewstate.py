@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+__all__ = [ 'VERSION', 'ViewState', 'ViewStateError', 'ViewStateStore', 'filter_sources', 'parse_state' ]
+
+import json
+import os
+import tempfile
+
+from datetime import date, datetime
+
+from .filters import compile_filter
+
+"""
+View settings of a grid, saved to and read from JSON files.
+
+A view state tells what a grid shows and how, not its data : columns
+and their widths, sorting, filters, grouping and scroll position.
+Filters are saved as the text they were compiled from, and compiled
+again when the state is applied.
+
+Files carry the version of their schema, older ones are migrated
+when read. Settings files written by ProGrid.save_settings() are
+read as version 0.
+
+Example :
+
+    store = ViewStateStore( 'people.view' )
+    store.save( grid.get_view_state() )
+    ...
+    grid.set_view_state( store.load() )
+"""
+
+"""
+Version of the schema written by this module.
+"""
+VERSION = 1
+
+
+class ViewStateError( ValueError ) :
+    pass
+
+
+"""
+Settings of a grid view, any of :
+
+  columns           columns shown
+  col_order         every column, ordered
+  col_sizes         relative column sizes
+  col_widths        widths of the columns resized by the user, in pixels
+  row_sorting       sort rules, see ProGrid.row_sorting
+  row_filters       filters by column, as typed by the user
+  row_grouping      grouping columns
+  collapsed_groups  keys of the collapsed groups
+  scroll_y          scroll position, 1 is the top
+
+Settings not given are left as they are when the state is applied.
+"""
+class ViewState( object ) :
+
+    FIELDS = (
+        'columns',
+        'col_order',
+        'col_sizes',
+        'col_widths',
+        'row_sorting',
+        'row_filters',
+        'row_grouping',
+        'collapsed_groups',
+        'scroll_y',
+    )
+
+    def __init__( self, **values ) :
+        unknown = [ key for key in values.keys() if key not in self.FIELDS ]
+        if len( unknown ) > 0 :
+            raise ViewStateError( 'Unknown view settings %s' % ', '.join( sorted( unknown ) ) )
+        self.values = values
+
+    """
+    Compiled filters, by column.
+    Raises filters.FilterError if an expression is not valid.
+    """
+    def filters( self ) :
+        return dict( ( column, compile_filter( text ) ) for column, text in self.values.get( 'row_filters', {} ).items() )
+
+    """
+    Returns the state as a JSON string, with the schema version.
+    """
+    def to_json( self ) :
+        values = dict( self.values )
+        if 'collapsed_groups' in values :
+            values['collapsed_groups'] = [ [ _encode( v ) for v in key ] for key in values['collapsed_groups'] ]
+        return json.dumps( { 'version':VERSION, 'state':values }, sort_keys=True, indent=1 )
+
+    def __eq__( self, other ) :
+        return isinstance( other, ViewState ) and self.values == other.values
+
+    def __ne__( self, other ) :
+        return not self == other
+
+    def __repr__( self ) :
+        return '<ViewState %r>' % ( self.values, )
+
+
+"""
+View state saved in a file.
+The file is read the first time the state is asked, and written atomically :
+a crash while saving leaves the previous state in place.
+"""
+class ViewStateStore( object ) :
+
+    def __init__( self, path ) :
+        self.path = path
+        self._state = None
+
+    """
+    Returns the saved state, None if nothing was saved.
+    Raises ViewStateError if the file is not valid.
+    """
+    def load( self ) :
+        if self._state is None and os.path.exists( self.path ) :
+            f = open( self.path )
+            try :
+                self._state = parse_state( f.read() )
+            finally :
+                f.close()
+        return self._state
+
+    """
+    Saves the state, replacing the previous one.
+    """
+    def save( self, state ) :
+        text = state.to_json()
+        fd, temp = tempfile.mkstemp( prefix='.view-', dir=os.path.dirname( os.path.abspath( self.path ) ) )
+        try :
+            f = os.fdopen( fd, 'w' )
+            try :
+                f.write( text )
+                f.flush()
+                os.fsync( f.fileno() )
+            finally :
+                f.close()
+            _replace( temp, self.path )
+        except :
+            os.remove( temp )
+            raise
+        self._state = state
+
+
+"""
+Returns the ViewState of a JSON string, migrating older versions.
+Raises ViewStateError if the string is not a valid state.
+"""
+def parse_state( text ) :
+
+    try :
+        content = json.loads( text )
+    except ValueError as e :
+        raise ViewStateError( 'Invalid view state: %s' % e )
+    if not isinstance( content, dict ) :
+        raise ViewStateError( 'Invalid view state: %r' % ( content, ) )
+
+    version = content.get( 'version', 0 )
+    if not isinstance( version, int ) or version > VERSION :
+        raise ViewStateError( 'Unsupported view state version %r, latest is %d' % ( version, VERSION ) )
+
+    while version < VERSION :
+        content = _MIGRATIONS[version]( content )
+        version += 1
+
+    values = dict( ( str( key ), value ) for key, value in content['state'].items() )
+    if 'collapsed_groups' in values :
+        values['collapsed_groups'] = [ tuple( _decode( v ) for v in key ) for key in values['collapsed_groups'] ]
+    return ViewState( **values )
+
+
+"""
+Returns the text of each filter, by column.
+Compiled filters know their text, other callables are looked up in names
+( like ProGrid.row_filters_names ) and skipped if not there.
+"""
+def filter_sources( filters, names=None ) :
+    result = {}
+    for column, f in filters.items() :
+        if getattr( f, 'source', None ) :
+            result[column] = f.source
+        elif names and names.get( column ) :
+            result[column] = names[column]
+    return result
+
+
+# Garbage used here and there
+
+"""
+Version 0 is the flat dictionary of properties written by ProGrid.json_settings(),
+filters are taken from row_filters_names.
+"""
+def _from_settings( content ) :
+    state = dict( ( key, content[key] ) for key in ViewState.FIELDS if key in content and key != 'row_filters' )
+    filters = content.get( 'row_filters_names' ) or content.get( 'row_filters' ) or {}
+    state['row_filters'] = dict( ( column, text ) for column, text in filters.items() if isinstance( text, ( type( u'' ), str ) ) )
+    return { 'version':1, 'state':state }
+
+"""
+Upgrades a state of version n to version n+1.
+"""
+_MIGRATIONS = {
+    0 : _from_settings,
+}
+
+"""
+Group keys may hold dates, saved as tagged ISO strings.
+"""
+def _encode( v ) :
+    if isinstance( v, datetime ) :
+        return { 'datetime':v.strftime( _DATETIME_FORMAT ) }
+    if isinstance( v, date ) :
+        return { 'date':v.strftime( '%Y-%m-%d' ) }
+    return v
+
+def _decode( v ) :
+    if isinstance( v, dict ) and 'datetime' in v :
+        return datetime.strptime( v['datetime'], _DATETIME_FORMAT )
+    if isinstance( v, dict ) and 'date' in v :
+        return datetime.strptime( v['date'], '%Y-%m-%d' ).date()
+    return v
+
+_DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+"""
+Moves a file over another one, in a single step where the system allows it.
+"""
+def _replace( source, destination ) :
+    if hasattr( os, 'replace' ) :
+        os.replace( source, destination )
+    else :
+        if os.name == 'nt' and os.path.exists( destination ) :
+            os.remove( destination )
+        os.rename( source, destination )
@@ -10,4 +10,5 @@ setup(
     packages    =['progrid'],
     zip_safe    =False,
     include_package_data=True,
+    extras_require={ 'numpy':[ 'numpy' ] },
 )
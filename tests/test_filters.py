@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Filter tests, no display needed :
+
+    python -m unittest discover -s tests -t .
+"""
+import sqlite3
+import unittest
+
+from progrid.columnar import RowStore, filter_indexes
+from progrid.filters import FilterError, TextFilter, compile_filter
+
+
+"""
+Indexes of the rows passing the filter of a single column.
+"""
+def select( rows, name, expression ) :
+    return list( filter_indexes( RowStore( rows ), { name:compile_filter( expression ) } ) )
+
+
+class CompileTest( unittest.TestCase ) :
+
+    def test_kinds( self ) :
+        self.assertEqual( compile_filter( 'ar' ).kind, 'text' )
+        self.assertEqual( compile_filter( ' >= 14 ' ).kind, 'comparison' )
+        self.assertEqual( compile_filter( 'or $VAL == "x"' ).kind, 'comparison' )
+        self.assertEqual( compile_filter( '$VAL.startswith( "m" )' ).kind, 'expression' )
+
+    def test_words_starting_like_operators_are_text( self ) :
+        for text in ( 'orange', 'order', 'android', 'or', 'and' ) :
+            self.assertTrue( isinstance( compile_filter( text ), TextFilter ), text )
+            self.assertEqual( compile_filter( text ).source, text )
+
+    def test_parse_errors( self ) :
+        for expression in ( '> ', '== 3 +', '$VAL.__class__', '$VAL.upper()', 'open( $VAL )', '$VAL == x', '$VAL( 1 )' ) :
+            self.assertRaises( FilterError, compile_filter, expression )
+
+    def test_precedence( self ) :
+        test = compile_filter( '$VAL == "a" or $VAL == "b" and $VAL == "c"' )
+        self.assertEqual( [ test( v ) for v in ( 'a', 'b', 'c' ) ], [ True, False, False ] )
+        test = compile_filter( '== 2 + 3 * 4' )
+        self.assertEqual( [ test( v ) for v in ( 14, 20, '14' ) ], [ True, False, True ] )
+        test = compile_filter( '$VAL != "a" and not ( $VAL == "b" or $VAL == "c" )' )
+        self.assertEqual( [ test( v ) for v in ( 'a', 'b', 'c', 'd' ) ], [ False, False, False, True ] )
+
+    def test_values_are_normalized( self ) :
+        self.assertTrue( compile_filter( 'MAR' )( ' Mario ' ) )
+        self.assertTrue( compile_filter( '$VAL == "MARIO"' )( 'mario ' ) )
+        self.assertFalse( compile_filter( '> 14' )( 'abc' ) )
+
+
+class ToSqlTest( unittest.TestCase ) :
+
+    rows = [ ( 'Mario', 5 ), ( ' oscar', 40 ), ( 'MARIA', 14 ), ( None, None ), ( 'ugo', 300 ) ]
+
+    """
+    Rows passing the filter, selected by SQLite and by the grid.
+    """
+    def both( self, expression, column ) :
+        test = compile_filter( expression )
+        sql  = test.to_sql( '"%s"' % column, numeric=column == 'age' )
+        self.assertNotEqual( sql, None, expression )
+
+        connection = sqlite3.connect( ':memory:' )
+        connection.execute( 'CREATE TABLE people ( name TEXT, age INTEGER )' )
+        connection.executemany( 'INSERT INTO people VALUES ( ?, ? )', self.rows )
+        lines = connection.execute( 'SELECT rowid - 1 FROM people WHERE %s ORDER BY rowid' % sql[0], sql[1] )
+
+        store = RowStore( [ { 'name':name, 'age':age } for name, age in self.rows ] )
+        return [ line[0] for line in lines ], list( filter_indexes( store, { column:test } ) )
+
+    def test_same_rows( self ) :
+        for expression, column in [
+            ( 'mar', 'name' ),
+            ( '== "oscar"', 'name' ),
+            ( '> "m"', 'name' ),
+            ( '$VAL.startswith( "ma" )', 'name' ),
+            ( '$VAL.endswith( "io" ) or $VAL == "ugo"', 'name' ),
+            ( '$VAL in ( "ugo", "maria" )', 'name' ),
+            ( 'len( $VAL ) > 4', 'name' ),
+            ( '> 14', 'age' ),
+            ( '!= 40', 'age' ),
+            ( '5 < $VAL and $VAL <= 300', 'age' ),
+            ( 'not ( $VAL == 5 )', 'age' ),
+        ] :
+            sql, python = self.both( expression, column )
+            self.assertEqual( sql, python, expression )
+
+    def test_not_translated( self ) :
+        self.assertEqual( compile_filter( u'm\xe0r' ).to_sql( '"name"' ), None )
+        self.assertEqual( compile_filter( '> 14' ).to_sql( '"name"', numeric=False ), None )
+        self.assertEqual( compile_filter( '$VAL.count( "a" ) > 1' ).to_sql( '"name"' ), None )
+
+    def test_parameters( self ) :
+        sql, params = compile_filter( '$VAL in ( "a", "b" ) or $VAL > "c"' ).to_sql( '"name"' )
+        self.assertEqual( params, [ 'a', 'b', 'c' ] )
+        self.assertEqual( sql.count( '?' ), 3 )
+
+
+class TypedComparisonTest( unittest.TestCase ) :
+
+    rows = [ { 'birth':'01/02/2000' }, { 'birth':'15/01/1999' }, { 'birth':'03/03/1998' }, { 'birth':None } ]
+
+    def test_dates_compare_as_dates( self ) :
+        self.assertEqual( select( self.rows, 'birth', '> "01/01/1999"' ), [ 0, 1 ] )
+        self.assertEqual( select( self.rows, 'birth', '"01/01/1999" < $VAL' ), [ 0, 1 ] )
+        self.assertEqual( select( self.rows, 'birth', '$VAL >= "15/01/1999" and $VAL < "01/02/2000"' ), [ 1 ] )
+
+    def test_empty_values_only_differ( self ) :
+        self.assertEqual( select( self.rows, 'birth', '!= "15/01/1999"' ), [ 0, 2, 3 ] )
+
+    def test_text_methods_see_text( self ) :
+        self.assertEqual( select( self.rows, 'birth', '$VAL.endswith( "1999" )' ), [ 1 ] )
+
+    def test_numbers( self ) :
+        rows = [ { 'n':n } for n in ( 5, 40, 300 ) ]
+        self.assertEqual( select( rows, 'n', '> 14' ), [ 1, 2 ] )
+        self.assertEqual( select( rows, 'n', '== "40"' ), [ 1 ] )
+
+
+if __name__ == '__main__' :
+    unittest.main()
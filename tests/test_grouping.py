@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Grouping tests, no display needed :
+
+    python -m unittest discover -s tests -t .
+"""
+import unittest
+
+from progrid.columnar import RowStore
+from progrid.grouping import Group, GroupIndex
+from progrid.sorting import sort_indexes
+
+
+class GroupIndexTest( unittest.TestCase ) :
+
+    def setUp( self ) :
+        self.rows = [
+            { 'city':'Rome',  'name':'Mario', 'age':30 },
+            { 'city':'Milan', 'name':'Ugo',   'age':20 },
+            { 'city':'Rome',  'name':'Oscar', 'age':50 },
+            { 'city':'Rome',  'name':'Mario', 'age':10 },
+        ]
+        self.store = RowStore( self.rows )
+        self.index = GroupIndex( self.store, range( 4 ), [ 'city', 'name' ], [ 'age' ] )
+
+    def group( self, *key ) :
+        return self.index.groups[ tuple( key ) ]
+
+    def test_groups( self ) :
+        self.assertEqual( len( self.index.groups ), 5 )
+        self.assertEqual( self.group( u'Rome' ).rows, set( [ 0, 2, 3 ] ) )
+        self.assertEqual( self.group( u'Rome', u'Mario' ).rows, set( [ 0, 3 ] ) )
+        self.assertEqual( self.group( u'Rome' ).label, 'Rome' )
+
+    def test_aggregates( self ) :
+        rome = self.group( u'Rome' )
+        values = [ self.index.aggregate( rome, 'age', name ) for name in ( 'count', 'sum', 'min', 'max', 'avg' ) ]
+        self.assertEqual( values, [ 3, 90, 10, 50, 30 ] )
+
+    def test_update( self ) :
+        rows = list( range( 4 ) )
+        self.store.set_row( 2, { 'city':'Milan', 'name':'Oscar', 'age':50 } )
+        self.index.update( [ 2 ], set( [ 2 ] ), [ 2 ], rows )
+        rome, milan = self.group( u'Rome' ), self.group( u'Milan' )
+        self.assertEqual( self.index.aggregate( rome, 'age', 'max' ), 30 )
+        self.assertEqual( self.index.aggregate( milan, 'age', 'sum' ), 70 )
+        self.assertEqual( sorted( self.index.groups ), [ ( u'Milan', ), ( u'Milan', u'Oscar' ), ( u'Milan', u'Ugo' ), ( u'Rome', ), ( u'Rome', u'Mario' ) ] )
+        self.assertTrue( self.index.is_current( self.store, rows, [ 'city', 'name' ], [ 'age' ] ) )
+
+    def test_lines( self ) :
+        order = sort_indexes( self.store, range( 4 ), [ [ 'city', 'asc' ], [ 'name', 'asc' ] ] )
+        lines = self.index.lines( order )
+        self.assertEqual( [ line.key if isinstance( line, Group ) else line for line in lines ], [
+            ( u'Milan', ), ( u'Milan', u'Ugo' ), 1,
+            ( u'Rome', ), ( u'Rome', u'Mario' ), 0, 3, ( u'Rome', u'Oscar' ), 2,
+        ] )
+        lines = self.index.lines( order, collapsed=[ ( u'Rome', ) ] )
+        self.assertEqual( [ line.key if isinstance( line, Group ) else line for line in lines ], [
+            ( u'Milan', ), ( u'Milan', u'Ugo' ), 1, ( u'Rome', ),
+        ] )
+
+
+if __name__ == '__main__' :
+    unittest.main()
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+View pipeline tests, no display needed :
+
+    python -m unittest discover -s tests -t .
+"""
+import unittest
+
+from random import Random
+
+from progrid.columnar import RowStore
+from progrid.filters import compile_filter
+from progrid.pipeline import ViewPipeline
+from progrid.sorting import sort_indexes
+
+
+class StagesTest( unittest.TestCase ) :
+
+    def setUp( self ) :
+        rows = [ { 'name':name, 'age':age } for name, age in ( ( 'Mario', 5 ), ( 'Oscar', 40 ), ( 'Maria', 14 ), ( 'Ugo', 30 ) ) ]
+        self.store = RowStore( rows )
+        self.rendered = []
+        self.pipeline = ViewPipeline()
+
+    """
+    Runs the pipeline, returns the stages computed.
+    """
+    def run_stages( self ) :
+        self.pipeline.run( source=lambda : self.store, render=lambda order : self.rendered.append( list( order ) ) )
+        return sorted( self.pipeline.timings.keys() )
+
+    def test_first_run( self ) :
+        self.assertEqual( self.run_stages(), [ 'filter', 'render', 'sort', 'source' ] )
+        self.assertEqual( self.rendered, [ [ 0, 1, 2, 3 ] ] )
+        self.assertTrue( self.pipeline.is_clean() )
+        self.assertEqual( self.run_stages(), [] )
+
+    def test_sort_does_not_filter( self ) :
+        self.pipeline.filters = { 'name':compile_filter( 'mar' ) }
+        self.run_stages()
+        self.pipeline.sorting = [ [ 'age', 'desc' ] ]
+        self.pipeline.invalidate( 'sort' )
+        self.assertEqual( self.run_stages(), [ 'render', 'sort' ] )
+        self.assertEqual( self.rendered[-1], [ 2, 0 ] )
+
+    def test_filter_reuses_sort( self ) :
+        self.pipeline.sorting = [ [ 'age', 'asc' ] ]
+        self.run_stages()
+        self.pipeline.filters = { 'age':compile_filter( '> 10' ) }
+        self.pipeline.invalidate( 'filter' )
+        self.assertEqual( self.run_stages(), [ 'filter', 'render', 'sort' ] )
+        self.assertEqual( self.rendered[-1], [ 2, 3, 1 ] )
+
+    def test_render_only( self ) :
+        self.run_stages()
+        self.pipeline.invalidate( 'render' )
+        self.assertEqual( self.run_stages(), [ 'render' ] )
+
+    def test_failed_stage_runs_again( self ) :
+        self.pipeline.filters = { 'age':lambda v: 1 / 0 }
+        self.assertRaises( ZeroDivisionError, self.run_stages )
+        self.assertTrue( self.pipeline.is_dirty( 'filter' ) )
+        self.pipeline.filters = {}
+        self.assertEqual( self.run_stages(), [ 'filter', 'render', 'sort' ] )
+
+
+class IncrementalSortTest( unittest.TestCase ) :
+
+    """
+    Changes and deletes random rows, updating the pipeline row by row,
+    then checks its order against a fresh sort of the store.
+    """
+    def check( self, pool, runs=100 ) :
+
+        for seed in range( runs ) :
+            rnd  = Random( seed )
+            make = lambda : { 'a':rnd.choice( pool ), 'b':rnd.choice( pool ) }
+            rows = [ make() for i in range( 30 ) ]
+
+            store = RowStore( rows )
+            pipeline = ViewPipeline()
+            pipeline.sorting = [ [ 'a', rnd.choice( [ 'asc', 'desc' ] ) ], [ 'b', 'asc' ] ]
+            pipeline.prepare( lambda : store )
+
+            for step in range( 5 ) :
+                if rnd.random() < .5 :
+                    changed = rnd.sample( range( len( rows ) ), 3 )
+                    for i in changed :
+                        store.set_row( i, make() )
+                    pipeline.update_rows( changed )
+                else :
+                    deleted, size = rnd.sample( range( len( rows ) ), 2 ), len( rows )
+                    store.delete( deleted )
+                    pipeline.delete_rows( deleted, size )
+
+            fresh = sort_indexes( store, range( len( store ) ), pipeline.sorting )
+            self.assertEqual( list( pipeline.ordered ), fresh, 'seed %d' % seed )
+
+    def test_text_and_none( self ) :
+        self.check( [ None, 'b', 'a', u'c', u'' ] )
+
+    def test_str_and_unicode( self ) :
+        self.check( [ 'x', u'a', 'b', u'y' ] )
+
+    def test_numbers_and_none( self ) :
+        self.check( [ None, 1, 2.5, 0, -3 ] )
+
+
+if __name__ == '__main__' :
+    unittest.main()
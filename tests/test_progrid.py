@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+ProGrid tests, run headless from the folder holding the progrid package :
+
+    python -m unittest discover -s tests -t .
+"""
+import time
+import unittest
+
+from benchmarks import headless
+
+from kivy.factory import Factory
+
+from progrid import progrid
+from progrid.filters import compile_filter, normalize
+from progrid.progrid import ProGrid
+from progrid.viewstate import ViewState
+
+
+"""
+Builds a laid out grid of n rows.
+"""
+def build_grid( n=20, **kargs ) :
+    rows = [ { 'name':'Name %d' % i, 'surname':'Surname %d' % ( i % 7 ), 'age':20 + i % 50 } for i in range( n ) ]
+    grid = ProGrid(
+        data    = rows,
+        columns = [ 'name', 'surname', 'age' ],
+        headers = { 'name':'Name', 'surname':'Surname', 'age':'Age' },
+        size    = ( 800, 600 ),
+        **kargs
+    )
+    headless.settle()
+    return grid
+
+"""
+Runs Kivy callbacks until asynchronous renders are done.
+"""
+def wait_render( grid, timeout=30 ) :
+    stop = time.time() + timeout
+    while grid.render_progress < 1 or grid._preparing > 0 :
+        if time.time() > stop :
+            raise AssertionError( 'Render not done after %d seconds' % timeout )
+        time.sleep( .01 )
+        headless.settle( 1 )
+
+
+class LazyClassesTest( unittest.TestCase ) :
+
+    def test_customizator_is_its_class( self ) :
+        from progrid.customizator import ProGridCustomizator
+        self.assertTrue( progrid.ProGridCustomizator is ProGridCustomizator )
+        self.assertTrue( Factory.ProGridCustomizator is ProGridCustomizator )
+
+        class Customizator( progrid.ProGridCustomizator ) :
+            pass
+        self.assertTrue( issubclass( Customizator, ProGridCustomizator ) )
+
+
+class ViewStateTest( unittest.TestCase ) :
+
+    def widths( self, box ) :
+        return [ round( cell.width ) for cell in box.cells ]
+
+    def test_col_widths_are_shown( self ) :
+        grid = build_grid()
+        grid.set_view_state( ViewState( col_widths={ 'name':300 } ) )
+        headless.settle()
+        self.assertEqual( self.widths( grid.header ), [ 300, 250, 250 ] )
+        self.assertEqual( self.widths( grid._rows[0] )[0], 300 )
+
+    def test_col_sizes_are_shown( self ) :
+        grid = build_grid()
+        grid.set_view_state( ViewState( col_sizes={ 'name':1, 'surname':2, 'age':1 } ) )
+        headless.settle()
+        self.assertEqual( self.widths( grid.header ), [ 200, 400, 200 ] )
+        cells = [ cell.width for cell in grid._rows[0].cells ]
+        self.assertAlmostEqual( cells[1], 2 * cells[0] )
+
+    def test_col_sizes_changed_by_hand( self ) :
+        grid = build_grid()
+        grid.col_sizes = { 'name':2, 'surname':1, 'age':1 }
+        headless.settle()
+        self.assertEqual( self.widths( grid.header ), [ 400, 200, 200 ] )
+        self.assertTrue( grid._pipeline.is_clean() )
+
+
+class AsyncRenderTest( unittest.TestCase ) :
+
+    def shown( self, grid ) :
+        return [ grid._data.store.value( i, 'name' ) for i in grid._order ]
+
+    def test_rows_changed_while_preparing( self ) :
+
+        grid = build_grid( 20000, async_render=True, virtualized=True )
+        wait_render( grid )
+
+        grid.row_filters = { 'name':compile_filter( 'Name 1' ) }
+        self.assertTrue( grid._preparing > 0 )
+        grid.update_rows( dict( ( i, { 'name':'Name 1 changed', 'surname':'', 'age':0 } ) for i in range( 2, 20000, 2 ) ) )
+        grid.insert_rows( [ { 'name':'Name 1 new', 'surname':'', 'age':0 } ] )
+        grid.delete_rows( [ 1 ] )
+        wait_render( grid )
+
+        store = grid.get_store()
+        names = [ row['name'] for row in grid.data ]
+        self.assertEqual( len( store ), 20000 )
+        self.assertEqual( store.normalized( 'name' ), [ normalize( name ) for name in names ] )
+        self.assertEqual( sorted( self.shown( grid ) ), sorted( name for name in names if 'name 1' in name.lower() ) )
+        self.assertEqual( names[-1], 'Name 1 new' )
+
+
+if __name__ == '__main__' :
+    unittest.main()
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Data source tests, no display needed :
+
+    python -m unittest discover -s tests -t .
+"""
+import sqlite3
+import unittest
+
+from progrid.coltypes import INT
+from progrid.filters import compile_filter
+from progrid.sources import SQLiteSource, SourceStore
+
+
+"""
+Builds an in memory table, with a view on it.
+"""
+def connect() :
+    connection = sqlite3.connect( ':memory:' )
+    connection.execute( 'CREATE TABLE people ( name TEXT, birth TEXT, age INTEGER, day DATE )' )
+    connection.executemany( 'INSERT INTO people VALUES ( ?, ?, ?, ? )', [
+        ( 'Oscar', '01/02/2000', 30, '2000-02-01' ),
+        ( None,    '15/01/1999', 20, '1999-01-15' ),
+        ( 'Mario', '03/03/1998', 40, '1998-03-03' ),
+    ] )
+    connection.execute( 'CREATE VIEW adults AS SELECT name, age FROM people WHERE age > 25' )
+    return connection
+
+
+"""
+Counts the pages fetched.
+"""
+class CountingSource( SQLiteSource ) :
+
+    fetched = 0
+
+    def fetch( self, start, stop ) :
+        self.fetched += 1
+        return super( CountingSource, self ).fetch( start, stop )
+
+
+class SQLiteSourceTest( unittest.TestCase ) :
+
+    def test_pages_follow_the_query( self ) :
+        source = SQLiteSource( connect(), 'people', columns=[ 'name', 'age' ] )
+        query, filters, sorting = source.query( { 'age':compile_filter( '> 25' ) }, [ [ 'age', 'desc' ] ], { 'age':INT } )
+        self.assertEqual( ( filters, sorting ), ( {}, [] ) )
+        self.assertEqual( query.count(), 2 )
+        self.assertEqual( query.fetch( 1, 10 ), [ { 'name':'Oscar', 'age':30 } ] )
+        self.assertEqual( query.column( 'name' ), [ 'Mario', 'Oscar' ] )
+
+    def test_view( self ) :
+        source = SQLiteSource( connect(), 'adults' )
+        self.assertEqual( source.count(), 2 )
+        self.assertEqual( source.fetch( 0, 5 ), [ { 'name':'Mario', 'age':40 }, { 'name':'Oscar', 'age':30 } ] )
+        self.assertEqual( source.fetch( 1, 2 ), [ { 'name':'Oscar', 'age':30 } ] )
+        self.assertEqual( source.column( 'age' ), [ 40, 30 ] )
+
+    def test_view_query( self ) :
+        source = SQLiteSource( connect(), 'adults' )
+        query, filters, sorting = source.query( { 'name':compile_filter( 'osc' ) }, [] )
+        self.assertEqual( query.count(), 1 )
+        self.assertEqual( query.fetch( 0, 1 ), [ { 'name':'Oscar', 'age':30 } ] )
+
+    def test_view_key( self ) :
+        source = SQLiteSource( connect(), 'adults', key='name' )
+        self.assertEqual( source.count(), 2 )
+        self.assertEqual( source.fetch( 0, 2 ), [ { 'name':'Mario', 'age':40 }, { 'name':'Oscar', 'age':30 } ] )
+
+    def test_types_are_sampled_at_once( self ) :
+        source = CountingSource( connect(), 'people' )
+        store  = SourceStore( source )
+        self.assertEqual( store.column_type( 'age' ).name, 'int' )
+        self.assertEqual( source.fetched, 0 )
+
+
+class TypedQueryTest( unittest.TestCase ) :
+
+    def setUp( self ) :
+        self.source = SQLiteSource( connect(), 'people' )
+        store = SourceStore( self.source )
+        store.set_types()
+        self.types = dict( ( name, store.column_type( name ) ) for name in self.source.keys() )
+
+    def query( self, filters, sorting ) :
+        return self.source.query( filters, sorting, self.types )
+
+    def test_text_is_not_none( self ) :
+        store = SourceStore( self.source )
+        self.assertEqual( [ store.typed_value( i, 'name' ) for i in range( 3 ) ], [ u'Oscar', None, u'Mario' ] )
+
+    def test_order_by_matches_types( self ) :
+        for name in ( 'name', 'age', 'day' ) :
+            query, filters, sorting = self.query( {}, [ [ name, 'asc' ] ] )
+            self.assertEqual( sorting, [], name )
+            self.assertNotEqual( query.order_by, None, name )
+
+    def test_dates_as_text_are_sorted_by_the_grid( self ) :
+        query, filters, sorting = self.query( {}, [ [ 'birth', 'asc' ] ] )
+        self.assertEqual( sorting, [ [ 'birth', 'asc' ] ] )
+        self.assertEqual( query.order_by, None )
+
+    def test_comparisons_need_sql_order( self ) :
+        wanted = { 'birth':compile_filter( '> "01/01/1999"' ), 'age':compile_filter( '> 25' ), 'name':compile_filter( 'ar' ) }
+        query, filters, sorting = self.query( wanted, [] )
+        self.assertEqual( sorted( filters.keys() ), [ 'birth' ] )
+        self.assertEqual( query.count(), 2 )
+
+    def test_unknown_types_are_left_to_the_grid( self ) :
+        query, filters, sorting = self.source.query( { 'age':compile_filter( '> 25' ) }, [ [ 'age', 'asc' ] ] )
+        self.assertEqual( sorted( filters.keys() ), [ 'age' ] )
+        self.assertEqual( sorting, [ [ 'age', 'asc' ] ] )
+
+
+if __name__ == '__main__' :
+    unittest.main()